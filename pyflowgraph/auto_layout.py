@@ -0,0 +1,390 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+
+from qtpy import QtCore
+
+
+_numpy = None
+
+
+def numpyModule():
+    """Imports NumPy on first use.
+
+    Returns:
+        module: numpy, or None if it is not installed, in which case the layout runs in pure Python.
+
+    """
+
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+
+# ========
+# Layering
+# ========
+def acyclicEdges(count, edges):
+    """Reverses the edges closing a cycle, found by a depth first search.
+
+    Args:
+        count (int): Number of nodes.
+        edges (list): (source, target) node index pairs, without self loops.
+
+    Returns:
+        list: The edges, with back edges reversed.
+
+    """
+
+    successors = [[] for i in range(count)]
+    for source, target in edges:
+        successors[source].append(target)
+
+    # 0: not visited, 1: on the stack, 2: done.
+    state = [0] * count
+    backEdges = set()
+    for root in range(count):
+        if state[root]:
+            continue
+        state[root] = 1
+        stack = [(root, iter(successors[root]))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if state[child] == 0:
+                    state[child] = 1
+                    stack.append((child, iter(successors[child])))
+                    break
+                if state[child] == 1:
+                    backEdges.add((node, child))
+            else:
+                state[node] = 2
+                stack.pop()
+
+    return [(target, source) if (source, target) in backEdges else (source, target) for source, target in edges]
+
+
+def assignLayers(count, edges):
+    """Assigns each node the length of the longest path leading to it.
+
+    Returns:
+        tuple: The layer of each node, and the nodes in the order they were layered.
+
+    """
+
+    successors = [[] for i in range(count)]
+    inDegree = [0] * count
+    for source, target in edges:
+        successors[source].append(target)
+        inDegree[target] += 1
+
+    layers = [0] * count
+    queue = [node for node in range(count) if inDegree[node] == 0]
+    index = 0
+    while index < len(queue):
+        node = queue[index]
+        index += 1
+        layer = layers[node] + 1
+        for child in successors[node]:
+            if layers[child] < layer:
+                layers[child] = layer
+            inDegree[child] -= 1
+            if inDegree[child] == 0:
+                queue.append(child)
+    return layers, queue
+
+
+class SugiyamaLayout(object):
+    """Arranges the nodes of a GraphView in layers, following the direction of their wires.
+
+    The layout runs the steps of a Sugiyama layout:
+
+    - cycles are broken by reversing the wires closing them,
+    - each node goes into the layer after the longest chain of wires leading
+      to it, so wires run left to right, from outputs to inputs,
+    - the order within the layers is improved with alternating barycenter
+      sweeps to reduce crossings,
+    - nodes are stacked in their layer, then pulled towards the nodes they are
+      wired to without overlapping or changing their order.
+
+    Wires spanning several layers are not split into dummy nodes; their ends
+    are ordered against each other directly, which keeps large graphs fast.
+
+    With NumPy installed the sweeps and the coordinate passes run over all
+    layers at once; without it the same steps run layer by layer in Python.
+
+    Args:
+        graph (GraphView): The graph.
+        layerSpacing (float): Horizontal gap between layers.
+        nodeSpacing (float): Vertical gap between the nodes of a layer.
+        sweeps (int): Number of crossing reduction sweeps.
+        passes (int): Number of coordinate refinement passes.
+
+    """
+
+    def __init__(self, graph, layerSpacing=120.0, nodeSpacing=30.0, sweeps=8, passes=4):
+        self.__graph = graph
+        self.layerSpacing = layerSpacing
+        self.nodeSpacing = nodeSpacing
+        self.sweeps = sweeps
+        self.passes = passes
+
+    # ====
+    # API
+    # ====
+    def layout(self, nodes=None):
+        """Computes the positions of nodes.
+
+        When only some of the graph's nodes are laid out, the others are left
+        where they are: only the wires between the given nodes are followed,
+        and the result is placed at the top left corner of the area the nodes
+        covered before.
+
+        Args:
+            nodes (list): The nodes to lay out; all nodes of the graph by default.
+
+        Returns:
+            dict: Node to its new position.
+
+        """
+
+        if nodes is None:
+            nodes = list(self.__graph.getNodes().values())
+        else:
+            nodes = list(nodes)
+        if not nodes:
+            return {}
+
+        index = dict((node, i) for i, node in enumerate(nodes))
+        edges = set()
+        for connection in self.__graph.getConnections():
+            source = index.get(connection.getSrcPort().getNode())
+            target = index.get(connection.getDstPort().getNode())
+            if source is not None and target is not None and source != target:
+                edges.add((source, target))
+
+        # Lay out the nodes with their ports and glands, which may stick out of the node rect.
+        itemRects = []
+        oldLeft = oldTop = None
+        for node in nodes:
+            rect = node.rect().united(node.childrenBoundingRect())
+            itemRects.append(rect)
+            topLeft = node.mapToScene(rect.topLeft())
+            oldLeft = topLeft.x() if oldLeft is None else min(oldLeft, topLeft.x())
+            oldTop = topLeft.y() if oldTop is None else min(oldTop, topLeft.y())
+
+        sizes = [(rect.width(), rect.height()) for rect in itemRects]
+        positions = self.computePositions(sizes, sorted(edges))
+
+        left = min(x for x, y in positions)
+        top = min(y for x, y in positions)
+        result = {}
+        for node, rect, (x, y) in zip(nodes, itemRects, positions):
+            result[node] = QtCore.QPointF(x - left + oldLeft - rect.left(), y - top + oldTop - rect.top())
+        return result
+
+    def apply(self, nodes=None):
+        """Lays out nodes and moves them, as a single batch of scene changes.
+
+        Args:
+            nodes (list): The nodes to lay out; all nodes of the graph by default.
+
+        Returns:
+            dict: Node to its new position.
+
+        """
+
+        positions = self.layout(nodes)
+        graph = self.__graph
+        graph.beginBatch()
+        try:
+            for node, pos in positions.items():
+                node.setPos(pos)
+        finally:
+            graph.endBatch()
+        return positions
+
+    def computePositions(self, sizes, edges):
+        """Lays out abstract nodes.
+
+        Args:
+            sizes (list): (width, height) of each node.
+            edges (list): (source, target) node index pairs.
+
+        Returns:
+            list: The (x, y) top left corner of each node.
+
+        """
+
+        count = len(sizes)
+        edges = acyclicEdges(count, edges)
+        layers, order = assignLayers(count, edges)
+
+        np = numpyModule()
+        if np is not None:
+            return self.__computeNumpy(np, sizes, edges, layers, order)
+        return self.__computePython(sizes, edges, layers, order)
+
+    # =============
+    # Pure Python
+    # =============
+    def __computePython(self, sizes, edges, layers, order):
+        count = len(sizes)
+        layerCount = max(layers) + 1
+
+        layerNodes = [[] for i in range(layerCount)]
+        for node in order:
+            layerNodes[layers[node]].append(node)
+
+        predecessors = [[] for i in range(count)]
+        successors = [[] for i in range(count)]
+        for source, target in edges:
+            predecessors[target].append(source)
+            successors[source].append(target)
+
+        # Ranks are normalized by the layer size, so wires spanning layers of different sizes compare.
+        rank = [0.0] * count
+
+        def normalize(layer):
+            members = layerNodes[layer]
+            size = float(len(members))
+            for i, node in enumerate(members):
+                rank[node] = i / size
+
+        for layer in range(layerCount):
+            normalize(layer)
+
+        for sweep in range(self.sweeps):
+            if sweep % 2 == 0:
+                layerRange, neighbors = range(1, layerCount), predecessors
+            else:
+                layerRange, neighbors = range(layerCount - 2, -1, -1), successors
+            for layer in layerRange:
+                keys = {}
+                for node in layerNodes[layer]:
+                    adjacent = neighbors[node]
+                    if adjacent:
+                        keys[node] = (sum(rank[other] for other in adjacent) / len(adjacent), rank[node])
+                    else:
+                        keys[node] = (rank[node], rank[node])
+                layerNodes[layer].sort(key=keys.__getitem__)
+                normalize(layer)
+
+        # Coordinates.
+        layerX = []
+        x = 0.0
+        for layer in range(layerCount):
+            layerX.append(x)
+            x += max(sizes[node][0] for node in layerNodes[layer]) + self.layerSpacing
+
+        gap = self.nodeSpacing
+        ys = [0.0] * count
+        for layer in range(layerCount):
+            members = layerNodes[layer]
+            height = sum(sizes[node][1] for node in members) + gap * (len(members) - 1)
+            y = -height * 0.5
+            for node in members:
+                ys[node] = y
+                y += sizes[node][1] + gap
+
+        for refinement in range(self.passes):
+            neighbors = predecessors if refinement % 2 == 0 else successors
+            for layer in range(layerCount):
+                previousBottom = None
+                for node in layerNodes[layer]:
+                    adjacent = neighbors[node]
+                    target = ys[node]
+                    if adjacent:
+                        center = sum(ys[other] + sizes[other][1] * 0.5 for other in adjacent) / len(adjacent)
+                        target = center - sizes[node][1] * 0.5
+                    if previousBottom is not None and target < previousBottom + gap:
+                        target = previousBottom + gap
+                    ys[node] = target
+                    previousBottom = target + sizes[node][1]
+
+        return [(layerX[layers[node]], ys[node]) for node in range(count)]
+
+    # ======
+    # NumPy
+    # ======
+    def __computeNumpy(self, np, sizes, edges, layers, order):
+        count = len(sizes)
+        layer = np.asarray(layers, dtype=np.int64)
+        layerCount = int(layer.max()) + 1
+        widths = np.asarray([size[0] for size in sizes], dtype=np.float64)
+        heights = np.asarray([size[1] for size in sizes], dtype=np.float64)
+
+        if edges:
+            edgeArray = np.asarray(edges, dtype=np.int64)
+            sources, targets = edgeArray[:, 0], edgeArray[:, 1]
+        else:
+            sources = targets = np.zeros(0, dtype=np.int64)
+
+        layerSizes = np.bincount(layer, minlength=layerCount)
+        layerStarts = np.concatenate(([0], np.cumsum(layerSizes)[:-1]))
+
+        def ranksOf(sortedNodes):
+            rank = np.empty(count, dtype=np.float64)
+            positions = np.arange(count) - layerStarts[layer[sortedNodes]]
+            rank[sortedNodes] = positions / layerSizes[layer[sortedNodes]].astype(np.float64)
+            return rank
+
+        def barycenters(values, fromNodes, toNodes, fallback):
+            sums = np.bincount(toNodes, weights=values[fromNodes], minlength=count)
+            counts = np.bincount(toNodes, minlength=count)
+            return np.where(counts > 0, sums / np.maximum(counts, 1), fallback)
+
+        # Start from the order the nodes were layered in; a stable sort keeps it within layers.
+        sortedNodes = np.asarray(order, dtype=np.int64)
+        sortedNodes = sortedNodes[np.argsort(layer[sortedNodes], kind='stable')]
+        rank = ranksOf(sortedNodes)
+
+        # All layers are swept at once, against the previous ordering of their neighbors.
+        for sweep in range(self.sweeps):
+            if sweep % 2 == 0:
+                bary = barycenters(rank, sources, targets, rank)
+            else:
+                bary = barycenters(rank, targets, sources, rank)
+            sortedNodes = np.lexsort((rank, bary, layer))
+            rank = ranksOf(sortedNodes)
+
+        # Coordinates.
+        layerWidths = np.zeros(layerCount, dtype=np.float64)
+        np.maximum.at(layerWidths, layer, widths)
+        layerX = np.concatenate(([0.0], np.cumsum(layerWidths + self.layerSpacing)[:-1]))
+
+        gap = self.nodeSpacing
+        sortedLayers = layer[sortedNodes]
+        sortedHeights = heights[sortedNodes]
+        # Offset of each node from the top of its layer when stacked.
+        steps = sortedHeights + gap
+        cumulative = np.cumsum(steps) - steps
+        offsets = cumulative - cumulative[layerStarts[sortedLayers]]
+
+        layerHeights = np.bincount(sortedLayers, weights=steps, minlength=layerCount) - gap
+        ys = np.empty(count, dtype=np.float64)
+        ys[sortedNodes] = offsets - layerHeights[sortedLayers] * 0.5
+
+        for refinement in range(self.passes):
+            centers = ys + heights * 0.5
+            if refinement % 2 == 0:
+                target = barycenters(centers, sources, targets, centers) - heights * 0.5
+            else:
+                target = barycenters(centers, targets, sources, centers) - heights * 0.5
+
+            # Keep the order and the gaps: y = offset + running max of (target - offset) within each layer.
+            # Each layer is lifted above the previous one so the running max does not leak across layers.
+            values = target[sortedNodes] - offsets
+            span = float(values.max() - values.min()) + 1.0
+            lifted = values + sortedLayers * span
+            running = np.maximum.accumulate(lifted) - sortedLayers * span
+            ys[sortedNodes] = running + offsets
+
+        xs = layerX[layer]
+        return list(zip(xs.tolist(), ys.tolist()))
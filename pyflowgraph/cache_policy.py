@@ -0,0 +1,197 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+
+from collections import OrderedDict
+
+from qtpy import QtGui, QtWidgets, QtCore
+
+
+class CachePolicy(object):
+    """Manages the QGraphicsItem cache modes of the nodes of a graph.
+
+    Nodes which are visible and idle get a DeviceCoordinateCache, so repaints
+    blit a pixmap instead of running Node.paint and painting the child items.
+    Caching is turned off for nodes which are dragged or animated. The pixmaps
+    of all cached nodes are kept within a memory budget by evicting the least
+    recently visible nodes first.
+
+    The cache only covers Node.paint; the child ports and labels still paint
+    on their own. The policy learns about new nodes through notePaint. A paint
+    of a cached node means its pixmap had to be (re)built and counts as a
+    miss. A cached node in the repainted area that did not paint counts as a
+    hit; those are looked up in the scene index, so the work per frame follows
+    the repainted area rather than the number of cached nodes.
+
+    When the nodes painted in one frame do not fit in the budget together,
+    caching them would evict nodes still on screen in every frame. The cache
+    modes are then left as they are.
+
+    """
+
+    def __init__(self, graph, budgetBytes=64 * 1024 * 1024):
+        self.__graph = graph
+        self.__budgetBytes = budgetBytes
+        self.__cached = OrderedDict()
+        self.__cachedBytes = 0
+        self.__suspended = set()
+        self.__painted = set()
+
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.__overBudgetFrames = 0
+
+        self.__applyPixmapCacheLimit()
+
+    def __applyPixmapCacheLimit(self):
+        # Item caches live in the global QPixmapCache; make sure it can hold our budget.
+        budgetKb = int(self.__budgetBytes / 1024)
+        if QtGui.QPixmapCache.cacheLimit() < budgetKb:
+            QtGui.QPixmapCache.setCacheLimit(budgetKb)
+
+    # =======
+    # Budget
+    # =======
+    def getBudget(self):
+        return self.__budgetBytes
+
+    def setBudget(self, budgetBytes):
+        """Sets the pixmap memory budget shared by all cached nodes.
+
+        Args:
+            budgetBytes (int): Maximum estimated bytes of cached pixmaps.
+
+        """
+
+        self.__budgetBytes = budgetBytes
+        self.__applyPixmapCacheLimit()
+        self.__enforceBudget()
+
+    def __estimateBytes(self, node):
+        deviceRect = self.__graph.transform().mapRect(node.boundingRect())
+        return int(deviceRect.width() + 1) * int(deviceRect.height() + 1) * 4
+
+    def __enforceBudget(self):
+        while self.__cachedBytes > self.__budgetBytes and len(self.__cached) > 0:
+            node, size = self.__cached.popitem(last=False)
+            self.__cachedBytes -= size
+            node.setCacheMode(QtWidgets.QGraphicsItem.NoCache)
+            self.__evictions += 1
+
+    # ==========
+    # Item State
+    # ==========
+    def __uncache(self, node):
+        size = self.__cached.pop(node, None)
+        if size is not None:
+            self.__cachedBytes -= size
+            node.setCacheMode(QtWidgets.QGraphicsItem.NoCache)
+
+    def suspend(self, nodes):
+        """Turns caching off for nodes which are about to be dragged or animated."""
+
+        for node in nodes:
+            self.__suspended.add(node)
+            self.__uncache(node)
+
+    def resume(self, nodes):
+        """Allows caching again for nodes which are idle; they are cached once visible."""
+
+        for node in nodes:
+            self.__suspended.discard(node)
+
+    def forget(self, node):
+        self.__suspended.discard(node)
+        self.__painted.discard(node)
+        size = self.__cached.pop(node, None)
+        if size is not None:
+            self.__cachedBytes -= size
+
+    def clear(self):
+        for node in self.__cached:
+            node.setCacheMode(QtWidgets.QGraphicsItem.NoCache)
+        self.__cached.clear()
+        self.__cachedBytes = 0
+        self.__suspended.clear()
+        self.__painted.clear()
+
+    # =======
+    # Frames
+    # =======
+    def notePaint(self, node):
+        self.__painted.add(node)
+
+    def endFrame(self, exposedRect):
+        """Updates the cache state after the view painted a frame.
+
+        Args:
+            exposedRect (QRectF): Scene rect the view repainted.
+
+        """
+
+        cached = self.__cached
+        painted = self.__painted
+        self.__painted = set()
+
+        # Cached nodes drawn from their pixmap do not call paint, find them in the repainted area.
+        for item in self.__graph.scene().items(exposedRect, QtCore.Qt.IntersectsItemBoundingRect):
+            if item in cached and item not in painted:
+                self.__hits += 1
+                cached.move_to_end(item)
+
+        newNodes = []
+        paintedBytes = 0
+        for node in painted:
+            if node in self.__suspended:
+                continue
+
+            size = self.__estimateBytes(node)
+            paintedBytes += size
+            oldSize = cached.get(node)
+            if oldSize is not None:
+                self.__misses += 1
+                cached.move_to_end(node)
+                cached[node] = size
+                self.__cachedBytes += size - oldSize
+            else:
+                newNodes.append((node, size))
+
+        if paintedBytes > self.__budgetBytes:
+            self.__overBudgetFrames += 1
+        else:
+            for node, size in newNodes:
+                node.setCacheMode(QtWidgets.QGraphicsItem.DeviceCoordinateCache)
+                cached[node] = size
+                self.__cachedBytes += size
+        self.__enforceBudget()
+
+    # ======
+    # Stats
+    # ======
+    def stats(self):
+        """Gets the cache counters.
+
+        Returns:
+            dict: hits, misses, hitRate, evictions, overBudgetFrames, cachedItems, cachedBytes and budgetBytes.
+
+        """
+
+        total = self.__hits + self.__misses
+        return {
+            'hits': self.__hits,
+            'misses': self.__misses,
+            'hitRate': float(self.__hits) / total if total else 0.0,
+            'evictions': self.__evictions,
+            'overBudgetFrames': self.__overBudgetFrames,
+            'cachedItems': len(self.__cached),
+            'cachedBytes': self.__cachedBytes,
+            'budgetBytes': self.__budgetBytes,
+            }
+
+    def resetStats(self):
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.__overBudgetFrames = 0
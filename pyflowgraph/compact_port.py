@@ -0,0 +1,320 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+
+from qtpy import QtCore
+
+from . import static_text
+from . import style
+
+
+CIRCLE_RADIUS = 6
+CIRCLE_DIAMETER = 2 * CIRCLE_RADIUS
+CIRCLE_OFFSET = CIRCLE_DIAMETER / 2.0 - CIRCLE_RADIUS / 4.0 + 1
+CIRCLE_HIGHLIGHT_SCALE = 1.3
+OUT_LABEL_MARGIN = 30
+
+CIRCLE_DEFAULT = 0
+CIRCLE_HIGHLIGHT = 1
+CIRCLE_MOVE = 2
+
+_labelFont = None
+
+
+
+def labelFont():
+    global _labelFont
+    if _labelFont is None:
+        _labelFont = style.registry.font('Decorative', 12)
+    return _labelFont
+
+
+def labelMetrics():
+    return static_text.fontMetrics(labelFont())
+
+
+def labelWidth(text):
+    return static_text.textSize(text, labelFont()).width()
+
+
+class CompactPortCircle(object):
+    """Connection point of a CompactPort.
+
+    Implements the part of the PortCircle interface used by connections and the
+    mouse grabber, without being a QGraphicsItem. The owning node paints it and
+    hit tests it.
+
+    """
+
+    __slots__ = ('_port', '_connectionPointType', '_connections', '_supportsOnlySingleConnections', '_state')
+
+    def __init__(self, port, connectionPointType):
+        self._port = port
+        self._connectionPointType = connectionPointType
+        self._connections = set()
+        self._supportsOnlySingleConnections = False
+        self._state = CIRCLE_DEFAULT
+
+    def getPort(self):
+        return self._port
+
+    def getColor(self):
+        return self._port.getColor()
+
+    def centerInSceneCoords(self):
+        port = self._port
+        return port._node.mapToScene(port.circleX, port.circleY)
+
+    def state(self):
+        return self._state
+
+    def __setState(self, state):
+        if self._state != state:
+            self._state = state
+            self._port._node.update()
+
+    def highlight(self):
+        self.__setState(CIRCLE_HIGHLIGHT)
+
+    def highlight2(self):
+        self.__setState(CIRCLE_MOVE)
+
+    def unhighlight(self):
+        self.__setState(CIRCLE_DEFAULT)
+
+    # ===================
+    # Connection Methods
+    # ===================
+    def connectionPointType(self):
+        return self._connectionPointType
+
+    def isInConnectionPoint(self):
+        return self._connectionPointType == 'In'
+
+    def isOutConnectionPoint(self):
+        return self._connectionPointType == 'Out'
+
+    def isGlandConnectionPoint(self):
+        return self._connectionPointType == 'Gland'
+
+    def supportsOnlySingleConnections(self):
+        return self._supportsOnlySingleConnections
+
+    def setSupportsOnlySingleConnections(self, value):
+        self._supportsOnlySingleConnections = value
+
+    def canConnectTo(self, otherPortCircle):
+
+        if self.connectionPointType() == otherPortCircle.connectionPointType():
+            return False
+
+        if self.getPort().getDataType() != otherPortCircle.getPort().getDataType():
+            return False
+
+        if otherPortCircle.getPort().getNode() == self.getPort().getNode():
+            return False
+
+        return True
+
+    def addConnection(self, connection):
+        if self._supportsOnlySingleConnections and len(self._connections) != 0:
+            for c in list(self._connections):
+                self._port._graph.removeConnection(c)
+
+        self._connections.add(connection)
+        return True
+
+    def removeConnection(self, connection):
+        self._connections.remove(connection)
+        return True
+
+    def getConnections(self):
+        return self._connections
+
+    # ======
+    # Events
+    # ======
+    def startConnection(self, scenePos):
+        """Starts dragging a new wire from this connection point."""
+
+        self.unhighlight()
+
+        from .mouse_grabber import MouseGrabber
+        graph = self._port._graph
+        if self.isInConnectionPoint():
+            MouseGrabber(graph, scenePos, self, 'Out')
+        elif self.isOutConnectionPoint():
+            MouseGrabber(graph, scenePos, self, 'In')
+        elif self.isGlandConnectionPoint():
+            MouseGrabber(graph, scenePos, self, 'Gland')
+
+
+class CompactPort(object):
+    """A port record painted and hit tested by its node.
+
+    Compact ports replace the BasePort widget tree (layouts, item holders, a
+    PortCircle with its rect item and a PortLabel with its text document) with
+    a flat record. They implement the BasePort interface used by the graph, the
+    connections and the mouse grabber.
+
+    """
+
+    __slots__ = (
+        '_node', '_graph', '_name', '_dataType', '_connectionPointType', '_color',
+        '_inCircle', '_outCircle', '_labelHighlighted',
+        'x', 'y', 'circleX', 'circleY', 'labelX', 'labelY', 'labelWidth', 'labelHeight'
+        )
+
+    def __init__(self, node, graph, name, color, dataType, connectionPointType, x=0, y=0):
+        self._node = node
+        self._graph = graph
+        self._name = name
+        self._dataType = dataType
+        self._connectionPointType = connectionPointType
+        self._color = color
+        self._labelHighlighted = False
+
+        self._inCircle = None
+        self._outCircle = None
+        if connectionPointType == 'Out':
+            self._outCircle = CompactPortCircle(self, connectionPointType)
+        else:
+            self._inCircle = CompactPortCircle(self, connectionPointType)
+
+        self.setPos(x, y)
+
+    def setPos(self, x, y):
+        self.x = float(x)
+        self.y = float(y)
+
+        metrics = labelMetrics()
+        self.labelWidth = labelWidth(self._name)
+        self.labelHeight = metrics.height()
+        rowCenter = self.y + max(CIRCLE_DIAMETER, self.labelHeight) * 0.5
+
+        self.circleY = rowCenter
+        self.labelY = rowCenter - self.labelHeight * 0.5
+        if self._connectionPointType == 'Out':
+            self.labelX = self.x + OUT_LABEL_MARGIN
+            self.circleX = self.labelX + self.labelWidth + CIRCLE_OFFSET
+        elif self._connectionPointType == 'Gland':
+            self.circleX = self.x + CIRCLE_OFFSET
+            self.labelX = self.x + CIRCLE_DIAMETER - 20
+            self.labelY = self.y - 10
+        else:
+            self.circleX = self.x + CIRCLE_OFFSET
+            self.labelX = self.x + CIRCLE_DIAMETER
+
+    def pos(self):
+        return QtCore.QPointF(self.x, self.y)
+
+    def getName(self):
+        return self._name
+
+    def getDataType(self):
+        return self._dataType
+
+    def getNode(self):
+        return self._node
+
+    def getGraph(self):
+        return self._graph
+
+    def getColor(self):
+        return self._color
+
+    def setColor(self, color):
+        self._color = color
+        self._node.update()
+
+    def inCircle(self):
+        return self._inCircle
+
+    def outCircle(self):
+        return self._outCircle
+
+    def circle(self):
+        if self._inCircle is not None:
+            return self._inCircle
+        return self._outCircle
+
+    def connectionPointType(self):
+        return self._connectionPointType
+
+    # ======
+    # Label
+    # ======
+    def labelItem(self):
+        # The label is painted by the node; the port itself takes the highlight calls.
+        return self
+
+    def text(self):
+        return self._name
+
+    def highlight(self):
+        if not self._labelHighlighted:
+            self._labelHighlighted = True
+            self._node.update()
+
+    def unhighlight(self):
+        if self._labelHighlighted:
+            self._labelHighlighted = False
+            self._node.update()
+
+    # =========
+    # Geometry
+    # =========
+    def circleRect(self):
+        r = CIRCLE_RADIUS * CIRCLE_HIGHLIGHT_SCALE
+        return QtCore.QRectF(self.circleX - r, self.circleY - r, 2 * r, 2 * r)
+
+    def labelRect(self):
+        return QtCore.QRectF(self.labelX, self.labelY, self.labelWidth, self.labelHeight)
+
+    def boundingRect(self):
+        return self.circleRect().united(self.labelRect())
+
+    def hitTest(self, x, y):
+        """Tests a point in node coordinates against the port.
+
+        Returns:
+            CompactPortCircle: The port's circle if the circle or label was hit, else None.
+
+        """
+
+        r = CIRCLE_RADIUS * CIRCLE_HIGHLIGHT_SCALE
+        if abs(x - self.circleX) <= r and abs(y - self.circleY) <= r:
+            return self.circle()
+        if self.labelX <= x <= self.labelX + self.labelWidth and self.labelY <= y <= self.labelY + self.labelHeight:
+            return self.circle()
+        return None
+
+
+def paintCompactPorts(painter, ports):
+    """Paints a node's compact ports in a single pass."""
+
+    registry = style.registry
+    font = labelFont()
+    painter.setFont(font)
+
+    painter.setPen(registry.pen('portCircle', 1.0))
+    for port in ports:
+        circle = port.circle()
+        state = circle._state
+        if state == CIRCLE_DEFAULT:
+            painter.setBrush(registry.brush(port._color))
+            r = CIRCLE_RADIUS
+        elif state == CIRCLE_HIGHLIGHT:
+            painter.setBrush(registry.brush(port._color.lighter()))
+            r = CIRCLE_RADIUS * CIRCLE_HIGHLIGHT_SCALE
+        else:
+            painter.setBrush(registry.brush('portCircleMove'))
+            r = CIRCLE_RADIUS * CIRCLE_HIGHLIGHT_SCALE
+        painter.drawRect(QtCore.QRectF(port.circleX - r, port.circleY - r, 2 * r, 2 * r))
+
+    labelPen = registry.pen('portLabel')
+    labelHighlightPen = registry.pen('portLabelHighlight')
+    for port in ports:
+        painter.setPen(labelHighlightPen if port._labelHighlighted else labelPen)
+        painter.drawStaticText(QtCore.QPointF(port.labelX, port.labelY), static_text.staticText(port._name, font))
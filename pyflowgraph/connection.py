@@ -2,12 +2,31 @@
 from qtpy.QtCore import QPointF
 from qtpy import QtGui, QtWidgets, QtCore
 
+from . import diagnostics
+from . import static_text
+from . import style
+
+
+def labelPositions(points):
+    """Gets where the labels of a wire are drawn: the middle of its first and of its last segment.
+
+    Args:
+        points (list): QPointF points of the wire.
+
+    Returns:
+        list: The position of each label; on a straight wire, at one and two thirds of its length.
+
+    """
+
+    if len(points) == 2:
+        delta = points[1] - points[0]
+        return [points[0] + delta / 3.0, points[0] + delta * (2.0 / 3.0)]
+    return [(points[0] + points[1]) * 0.5, (points[-2] + points[-1]) * 0.5]
+
 
 class Connection(QtWidgets.QGraphicsPathItem):
-    __defaultPen = QtGui.QPen(QtGui.QColor(168, 134, 3), 1.5)
-    __whitePen = QtGui.QPen(QtGui.QColor(255, 255, 255), 0.5)
-    __smallFont = QtGui.QFont('Helvetica', 6)
-    __medFont = QtGui.QFont('Helvetica', 8)
+    __dashPattern = (1, 2, 2, 1)
+    __pickTolerance = 4.0
 
     def __init__(self, graph, srcPortCircle, dstPortCircle):
         super(Connection, self).__init__()
@@ -15,38 +34,107 @@ class Connection(QtWidgets.QGraphicsPathItem):
         self.__graph = graph
         self.__srcPortCircle = srcPortCircle
         self.__dstPortCircle = dstPortCircle
-        penStyle = QtCore.Qt.DashLine
+        self.__penStyle = QtCore.Qt.DashLine
+        self.__penWidth = 1.5
+        self.__wireLayer = None
+        self.__geometryKey = None
 
-        self.__connectionColor = QtGui.QColor(0, 0, 0)
-        self.__connectionColor.setRgbF(*self.__srcPortCircle.getColor().getRgbF())
-        self.__connectionColor.setAlpha(125)
-
-        self.__defaultPen = QtGui.QPen(self.__connectionColor, 1.5, style=penStyle)
-        self.__defaultPen.setDashPattern([1, 2, 2, 1])
-
-        self.__connectionHoverColor = QtGui.QColor(0, 0, 0)
-        self.__connectionHoverColor.setRgbF(*self.__srcPortCircle.getColor().getRgbF())
-        self.__connectionHoverColor.setAlpha(255)
-
-        self.__hoverPen = QtGui.QPen(self.__connectionHoverColor, 1.5, style=penStyle)
-        self.__hoverPen.setDashPattern([1, 2, 2, 1])
-        self.setPen(self.__defaultPen)
+        self.applyStyle()
         self.setZValue(-1)
 
         self.setAcceptHoverEvents(True)
         self.connect()
 
 
+    def applyStyle(self):
+        """Fetches the pens and fonts of the connection from the style registry."""
+
+        rgba = self.__srcPortCircle.getColor().rgba()
+        dashPattern = self.__dashPattern if self.__penStyle == QtCore.Qt.DashLine else None
+
+        connectionColor = QtGui.QColor.fromRgba(rgba)
+        connectionColor.setAlpha(125)
+        self.__defaultPen = style.registry.pen(connectionColor, self.__penWidth, self.__penStyle, dashPattern)
+
+        connectionHoverColor = QtGui.QColor.fromRgba(rgba)
+        connectionHoverColor.setAlpha(255)
+        self.__hoverPen = style.registry.pen(connectionHoverColor, self.__penWidth, self.__penStyle, dashPattern)
+
+        self.__whitePen = style.registry.pen('connectionLabel', 0.5)
+        self.__smallFont = style.registry.font('Helvetica', 6)
+        self.__medFont = style.registry.font('Helvetica', 8)
+
+        self.setPen(self.__defaultPen)
+
+
     def setPenStyle(self, penStyle):
-        self.__defaultPen.setStyle(penStyle)
-        self.__hoverPen.setStyle(penStyle)
-        self.setPen(self.__defaultPen) # Force a redraw
+        self.__penStyle = penStyle
+        self.applyStyle() # Force a redraw
 
 
     def setPenWidth(self, width):
-        self.__defaultPen.setWidthF(width)
-        self.__hoverPen.setWidthF(width)
-        self.setPen(self.__defaultPen) # Force a redraw
+        self.__penWidth = width
+        self.applyStyle() # Force a redraw
+
+
+    def getPen(self):
+        return self.__defaultPen
+
+
+    def getHoverPen(self):
+        return self.__hoverPen
+
+
+    def getLabelPen(self):
+        return self.__whitePen
+
+
+    def getLabels(self):
+        """Gets the texts drawn along the wire with their fonts, in polyline order."""
+
+        return (("0001", self.__smallFont), ("WireMark", self.__medFont))
+
+
+    def scenePolyline(self):
+        """Gets the points of the wire in scene coordinates.
+
+        Returns:
+            list: The route around the nodes when the graph routes its wires and the route is ready;
+                otherwise the source point, the two bends through the midpoint x, and the target point.
+
+        """
+
+        srcPoint = self.__srcPortCircle.centerInSceneCoords()
+        dstPoint = self.__dstPortCircle.centerInSceneCoords()
+        router = self.__graph.getWireRouter()
+        if router is not None:
+            route = router.getRoute(self, srcPoint, dstPoint)
+            if route is not None:
+                return route
+        midX = (srcPoint.x() + dstPoint.x()) / 2
+        return [srcPoint, QPointF(midX, srcPoint.y()), QPointF(midX, dstPoint.y()), dstPoint]
+
+
+    # ===========
+    # Wire Layer
+    # ===========
+    def getWireLayer(self):
+        return self.__wireLayer
+
+
+    def setWireLayer(self, wireLayer):
+        # Connections drawn by a wire layer are not scene items, only handles.
+        self.__wireLayer = wireLayer
+
+
+    def invalidateGeometry(self):
+        """Notifies the connection that one of its end points, or its route, is about to change."""
+
+        if self.__wireLayer is not None:
+            self.__wireLayer.invalidate(self)
+        else:
+            self.prepareGeometryChange()
+            self.__geometryKey = None
 
 
     def getSrcPortCircle(self):
@@ -65,85 +153,97 @@ class Connection(QtWidgets.QGraphicsPathItem):
         return self.__dstPortCircle.getPort()
 
 
-    def boundingRect(self):
-        srcPoint = self.mapFromScene(self.__srcPortCircle.centerInSceneCoords())
-        dstPoint = self.mapFromScene(self.__dstPortCircle.centerInSceneCoords())
-        #penWidth = self.__defaultPen.width()
-        penWidth = 20
-
-        return QtCore.QRectF(
-            min(srcPoint.x(), dstPoint.x()),
-            min(srcPoint.y(), dstPoint.y()),
-            abs(dstPoint.x() - srcPoint.x()),
-            abs(dstPoint.y() - srcPoint.y()),
-            ).adjusted(-penWidth/2, -penWidth/2, +penWidth/2, +penWidth/2)
-
-
-    def paint(self, painter, option, widget):
-        srcPoint = self.mapFromScene(self.__srcPortCircle.centerInSceneCoords())
-        dstPoint = self.mapFromScene(self.__dstPortCircle.centerInSceneCoords())
+    # =========
+    # Geometry
+    # =========
+    def __updateGeometry(self):
+        # The geometry only depends on the end points, so it is rebuilt when one of them moved.
+        srcPoint = self.__srcPortCircle.centerInSceneCoords()
+        dstPoint = self.__dstPortCircle.centerInSceneCoords()
+        if self.__geometryKey is not None and self.__geometryKey == (srcPoint, dstPoint):
+            return
+        self.__geometryKey = (srcPoint, dstPoint)
+
+        points = [self.mapFromScene(point) for point in self.scenePolyline()]
+        self.__polyline = points
+
+        path = QtGui.QPainterPath()
+        path.moveTo(points[0])
+        for point in points[1:]:
+            path.lineTo(point)
+        self.__path = path
+
+        # The labels are drawn along the first and last segments, with their baseline on the wire.
+        labelRects = []
+        for point, (text, font) in zip(labelPositions(points), self.getLabels()):
+            size = static_text.textSize(text, font)
+            ascent = static_text.fontMetrics(font).ascent()
+            labelRects.append(QtCore.QRectF(point.x(), point.y() - ascent, size.width(), size.height()))
+        self.__labelRects = labelRects
+
+        stroker = QtGui.QPainterPathStroker()
+        stroker.setWidth(2 * self.__pickTolerance)
+        shape = stroker.createStroke(path)
+        labelsPath = QtGui.QPainterPath()
+        for rect in labelRects:
+            labelsPath.addRect(rect)
+        self.__shape = shape.united(labelsPath)
+
+        self.__boundingRect = self.__shape.boundingRect()
 
-        dist_between = dstPoint - srcPoint
 
-        #self.painter = QtGui.QPainter()
-
-        srcPort = self.__srcPortCircle.getPort()
-        dstPort = self.__dstPortCircle.getPort()
-
-        self.__path = QtGui.QPainterPath()
+    def boundingRect(self):
+        self.__updateGeometry()
+        return self.__boundingRect
 
-        self.setPen(self.__defaultPen)
-        self.__path.moveTo(srcPoint)
 
-        if dstPort and srcPort:
-            if dstPort._connectionPointType == "Gland" and srcPort._connectionPointType == 'Gland':
-                self.__path.lineTo((dstPoint.x()+srcPoint.x())/2, srcPoint.y())
-                self.__path.lineTo((dstPoint.x() + srcPoint.x()) / 2, dstPoint.y())
-                self.__path.lineTo(dstPoint.x(), dstPoint.y())
+    def shape(self):
+        self.__updateGeometry()
+        return self.__shape
 
-        self.setPen(self.__whitePen)
-        textPoint1 = QPointF((srcPoint.x() + dstPoint.x()) / 2, (srcPoint.y()))
-        textPoint2 = QPointF((srcPoint.x() + dstPoint.x()) / 2, (dstPoint.y()))
 
-        if dstPort and srcPort:
-            if dstPort._connectionPointType == "Gland" and srcPort._connectionPointType == 'Out':
-                textPoint1 = QPointF((srcPoint.x() + dstPoint.x())/2, (srcPoint.y()))
-                textPoint2 = QPointF((srcPoint.x() + dstPoint.x())/2, (dstPoint.y()))
+    def contains(self, point):
+        # Point picks, e.g. hover and itemAt, test the segments and label rects directly.
+        self.__updateGeometry()
 
-        if dstPort and srcPort:
-            if dstPort._connectionPointType == "Gland" and srcPort._connectionPointType == 'In':
-                textPoint1 = QPointF((srcPoint.x() + dstPoint.x())/2, (srcPoint.y()))
-                textPoint2 = QPointF((srcPoint.x() + dstPoint.x())/2, (dstPoint.y()))
+        for rect in self.__labelRects:
+            if rect.contains(point):
+                return True
 
-        if dstPort and srcPort:
-            if dstPort._connectionPointType == "Gland" and srcPort._connectionPointType == 'Out':
-                textPoint1 = QPointF((srcPoint.x() + dstPoint.x())/2, (srcPoint.y()))
-                textPoint2 = QPointF((srcPoint.x() + dstPoint.x())/2, (dstPoint.y()))
+        x = point.x()
+        y = point.y()
+        tolerance = self.__pickTolerance
+        points = self.__polyline
+        for a, b in zip(points[:-1], points[1:]):
+            # The segments are axis aligned.
+            dx = max(min(a.x(), b.x()) - x, 0.0, x - max(a.x(), b.x()))
+            dy = max(min(a.y(), b.y()) - y, 0.0, y - max(a.y(), b.y()))
+            if dx <= tolerance and dy <= tolerance:
+                return True
+        return False
 
-        if dstPort and srcPort:
-            if dstPort._connectionPointType == "Gland" and srcPort._connectionPointType == 'In':
-                textPoint1 = QPointF((srcPoint.x() + dstPoint.x())/2, (srcPoint.y()))
-                textPoint2 = QPointF((srcPoint.x() + dstPoint.x())/2, (dstPoint.y()))
 
-        if dstPort and srcPort:
-            if dstPort._connectionPointType == "Out" and srcPort._connectionPointType == 'In':
-                textPoint1 = QPointF((srcPoint.x() + dstPoint.x())/2, (srcPoint.y()))
-                textPoint2 = QPointF((srcPoint.x() + dstPoint.x())/2, (dstPoint.y()))
+    def getLabelRects(self):
+        """Gets the rects of the labels drawn along the wire, in item coordinates."""
 
-            if dstPort._connectionPointType == "in" and srcPort._connectionPointType == 'Out':
-                textPoint1 = QPointF((srcPoint.x() + dstPoint.x())/2, (srcPoint.y()))
-                textPoint2 = QPointF((srcPoint.x() + dstPoint.x())/2, (dstPoint.y()))
+        self.__updateGeometry()
+        return list(self.__labelRects)
 
-        self.__path.lineTo(textPoint1)
-        self.__path.lineTo(textPoint2)
-        self.__path.lineTo(dstPoint.x(), dstPoint.y())
 
-        self.__path.addText(textPoint1,self.__smallFont, "0001")
-        self.__path.addText(textPoint2, self.__medFont, "WireMark")
-        self.setPath(self.__path)
+    def paint(self, painter, option, widget):
+        if diagnostics.collector is not None:
+            diagnostics.collector.count('Connection')
+        self.__updateGeometry()
 
+        painter.setBrush(QtCore.Qt.NoBrush)
+        painter.setPen(self.pen())
+        painter.drawPath(self.__path)
 
-        super(Connection, self).paint(painter, option, widget)
+        painter.setPen(self.__whitePen)
+        points = self.__polyline
+        for point, (text, font) in zip(labelPositions(points), self.getLabels()):
+            painter.setFont(font)
+            painter.drawText(point, text)
 
 
     def hoverEnterEvent(self, event):
@@ -170,17 +270,22 @@ class Connection(QtWidgets.QGraphicsPathItem):
             pos = self.mapToScene(event.pos())
             delta = pos - self._lastDragPoint
             if delta.x() != 0:
+                self.detach(pos, delta)
 
-                self.__graph.removeConnection(self)
+        else:
+            super(Connection, self).mouseMoveEvent(event)
 
-                from . import mouse_grabber
-                if delta.x() < 0:
-                    mouse_grabber.MouseGrabber(self.__graph, pos, self.__srcPortCircle, 'In')
-                else:
-                    mouse_grabber.MouseGrabber(self.__graph, pos, self.__dstPortCircle, 'Out')
 
+    def detach(self, pos, delta):
+        """Removes the connection and starts re-wiring it from the end opposite to the drag direction."""
+
+        self.__graph.removeConnection(self)
+
+        from . import mouse_grabber
+        if delta.x() < 0:
+            mouse_grabber.MouseGrabber(self.__graph, pos, self.__srcPortCircle, 'In')
         else:
-            super(Connection, self).mouseMoveEvent(event)
+            mouse_grabber.MouseGrabber(self.__graph, pos, self.__dstPortCircle, 'Out')
 
 
     def disconnect(self):
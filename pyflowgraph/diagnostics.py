@@ -0,0 +1,238 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+
+import collections
+import csv
+import os
+import time
+
+from qtpy import QtGui, QtCore
+
+from . import style
+
+
+# The diagnostics of the view currently painting a frame, or None. Item paint
+# methods count themselves through it, so counting costs a single check when
+# diagnostics are off.
+collector = None
+
+
+PAINT_KINDS = ('Node', 'Connection', 'PortCircle', 'PortLabel')
+
+CSV_FIELDS = ('time', 'frameMs', 'backgroundMs') + PAINT_KINDS + ('sceneItems', 'lod', 'scale')
+
+
+class PaintDiagnostics(object):
+    """Collects per frame paint statistics of a GraphView.
+
+    For each frame painted by the view it records the frame time, the time
+    spent in drawBackground, the number of Node, Connection, PortCircle and
+    PortLabel paints, the scene item count and the level of detail. The last
+    frames are kept in memory, can be appended to a rolling CSV log, and are
+    drawn as an overlay in the top left corner of the view.
+
+    The overlay is drawn while a frame is painted, so it shows the statistics
+    of the previous frame. It is refreshed twice a second even if nothing else
+    in the view is repainted.
+
+    """
+
+    __overlayRect = QtCore.QRect(8, 8, 230, 8 * 16 + 8)
+    __refreshInterval = 500
+    __flushRows = 60
+
+    def __init__(self, graph, historySize=300):
+        self.__graph = graph
+        self.__history = collections.deque(maxlen=historySize)
+
+        self.__counts = dict.fromkeys(PAINT_KINDS, 0)
+        self.__frameStart = None
+        self.__backgroundSeconds = 0.0
+
+        self.__logPath = None
+        self.__logFile = None
+        self.__logWriter = None
+        self.__logRows = 0
+        self.__maxLogRows = 0
+        self.__unflushedRows = 0
+
+        self.__font = style.registry.font('Courier', 8)
+        self.__refreshTimer = QtCore.QTimer()
+        self.__refreshTimer.setInterval(self.__refreshInterval)
+        self.__refreshTimer.timeout.connect(self.__refreshOverlay)
+        self.__refreshTimer.start()
+
+    def close(self):
+        global collector
+        if collector is self:
+            collector = None
+        self.__refreshTimer.stop()
+        self.setLogFile(None)
+        self.__graph.viewport().update(self.__overlayRect)
+
+    # =======
+    # Frames
+    # =======
+    def count(self, kind, paints=1):
+        self.__counts[kind] += paints
+
+    def beginFrame(self, exposedRect):
+        """Starts collecting a frame.
+
+        Args:
+            exposedRect (QRect): The viewport area repainted in the frame.
+
+        """
+
+        global collector
+        # Repaints of the overlay alone would hide the frames worth looking at.
+        if self.__overlayRect.contains(exposedRect):
+            return
+
+        collector = self
+        for kind in PAINT_KINDS:
+            self.__counts[kind] = 0
+        self.__backgroundSeconds = 0.0
+        self.__frameStart = time.perf_counter()
+
+    def addBackgroundTime(self, seconds):
+        if self.__frameStart is not None:
+            self.__backgroundSeconds += seconds
+
+    def endFrame(self, sceneItems, lod, scale):
+        global collector
+        if collector is self:
+            collector = None
+        if self.__frameStart is None:
+            return
+
+        stats = {
+            'time': time.time(),
+            'frameMs': (time.perf_counter() - self.__frameStart) * 1000.0,
+            'backgroundMs': self.__backgroundSeconds * 1000.0,
+            'sceneItems': sceneItems,
+            'lod': lod,
+            'scale': scale,
+            }
+        stats.update(self.__counts)
+        self.__frameStart = None
+
+        self.__history.append(stats)
+        if self.__logWriter is not None:
+            self.__writeRow(stats)
+
+    # ====
+    # API
+    # ====
+    def getStats(self):
+        """Gets the statistics of the last painted frame.
+
+        Returns:
+            dict: The CSV_FIELDS of the frame, or None if no frame was painted yet.
+
+        """
+
+        if not self.__history:
+            return None
+        return dict(self.__history[-1])
+
+    def getHistory(self):
+        """Gets the statistics of the last frames, oldest first.
+
+        Returns:
+            list: One dict per frame, see getStats.
+
+        """
+
+        return [dict(stats) for stats in self.__history]
+
+    def clearHistory(self):
+        self.__history.clear()
+
+    # ====
+    # Log
+    # ====
+    def setLogFile(self, path, maxRows=10000):
+        """Appends the statistics of every frame to a CSV file.
+
+        When the file holds maxRows frames it is moved to path + '.1', replacing
+        the previous one, and a new file is started.
+
+        Args:
+            path (str): Path of the CSV file, or None to stop logging.
+            maxRows (int): Number of frames per file.
+
+        """
+
+        if self.__logFile is not None:
+            self.__logFile.close()
+            self.__logFile = None
+            self.__logWriter = None
+
+        self.__logPath = path
+        self.__maxLogRows = maxRows
+        if path is not None:
+            self.__openLog()
+
+    def __openLog(self):
+        exists = os.path.exists(self.__logPath) and os.path.getsize(self.__logPath) > 0
+        self.__logFile = open(self.__logPath, 'a', newline='')
+        self.__logWriter = csv.DictWriter(self.__logFile, fieldnames=CSV_FIELDS)
+        self.__logRows = 0
+        if exists:
+            with open(self.__logPath, 'r') as existing:
+                self.__logRows = max(sum(1 for line in existing) - 1, 0)
+        else:
+            self.__logWriter.writeheader()
+        self.__unflushedRows = 0
+
+    def __writeRow(self, stats):
+        if self.__logRows >= self.__maxLogRows:
+            self.__logFile.close()
+            os.replace(self.__logPath, self.__logPath + '.1')
+            self.__openLog()
+
+        self.__logWriter.writerow(stats)
+        self.__logRows += 1
+        self.__unflushedRows += 1
+        if self.__unflushedRows >= self.__flushRows:
+            self.__logFile.flush()
+            self.__unflushedRows = 0
+
+    # ========
+    # Overlay
+    # ========
+    def __refreshOverlay(self):
+        self.__graph.viewport().update(self.__overlayRect)
+
+    def paintOverlay(self, painter):
+        """Draws the statistics of the last frame in the top left corner of the view."""
+
+        stats = self.getStats()
+        if stats is None:
+            return
+
+        lines = [
+            'frame       %.2f ms' % stats['frameMs'],
+            'background  %.2f ms' % stats['backgroundMs'],
+            ]
+        for kind in PAINT_KINDS:
+            lines.append('%-11s %d' % (kind, stats[kind]))
+        lines.append('items       %d' % stats['sceneItems'])
+        lines.append('lod         %d (scale %.3f)' % (stats['lod'], stats['scale']))
+
+        painter.save()
+        painter.resetTransform()
+        rect = QtCore.QRectF(self.__overlayRect)
+        painter.setPen(QtCore.Qt.NoPen)
+        painter.setBrush(style.registry.brush(QtGui.QColor(0, 0, 0, 160)))
+        painter.drawRect(rect)
+        painter.setPen(style.registry.pen(QtGui.QColor(225, 225, 225)))
+        painter.setFont(self.__font)
+        y = rect.top() + 16
+        for line in lines:
+            painter.drawText(QtCore.QPointF(rect.left() + 6, y), line)
+            y += 16
+        painter.restore()
@@ -0,0 +1,178 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+
+from qtpy import QtCore
+
+
+class GraphBounds(object):
+    """Incrementally maintained scene bounds of the nodes in a graph.
+
+    Each tracked node keeps its scene rect as a (left, top, right, bottom)
+    tuple. Growing the bounds is done in place; the full union is only
+    recomputed lazily when a node that was touching the boundary moves inward
+    or is removed.
+
+    """
+
+    def __init__(self):
+        self.__rects = {}
+        self.__bounds = None
+        self.__dirty = False
+
+    @staticmethod
+    def nodeSceneRect(node):
+        rect = node.mapRectToScene(node.rect())
+        return (rect.left(), rect.top(), rect.right(), rect.bottom())
+
+    def clear(self):
+        self.__rects.clear()
+        self.__bounds = None
+        self.__dirty = False
+
+    def __len__(self):
+        return len(self.__rects)
+
+    def __contains__(self, key):
+        return key in self.__rects
+
+    # ======
+    # Nodes
+    # ======
+    def addNode(self, node):
+        self.setRect(node, self.nodeSceneRect(node))
+
+    def updateNode(self, node):
+        if node in self.__rects:
+            self.setRect(node, self.nodeSceneRect(node))
+
+    def removeNode(self, node):
+        self.removeKey(node)
+
+    # ======
+    # Rects
+    # ======
+    def setRect(self, key, rect):
+        """Sets the scene rect stored for the given key.
+
+        Args:
+            key (object): Node (or node record) the rect belongs to.
+            rect (tuple): (left, top, right, bottom) in scene coordinates.
+
+        """
+
+        old = self.__rects.get(key)
+        self.__rects[key] = rect
+
+        if self.__dirty:
+            return
+
+        if self.__bounds is None:
+            self.__bounds = rect
+            return
+
+        left, top, right, bottom = self.__bounds
+        if old is not None:
+            # The old rect defined one of the edges; if the new rect no longer
+            # reaches that edge some other node may now define it.
+            if ((old[0] <= left and rect[0] > left) or
+                    (old[1] <= top and rect[1] > top) or
+                    (old[2] >= right and rect[2] < right) or
+                    (old[3] >= bottom and rect[3] < bottom)):
+                self.__dirty = True
+                return
+
+        self.__bounds = (
+            min(left, rect[0]),
+            min(top, rect[1]),
+            max(right, rect[2]),
+            max(bottom, rect[3])
+            )
+
+    def getRect(self, key):
+        return self.__rects.get(key)
+
+    def removeKey(self, key):
+        old = self.__rects.pop(key, None)
+        if old is None:
+            return
+
+        if len(self.__rects) == 0:
+            self.__bounds = None
+            self.__dirty = False
+            return
+
+        if self.__dirty or self.__bounds is None:
+            return
+
+        left, top, right, bottom = self.__bounds
+        if old[0] <= left or old[1] <= top or old[2] >= right or old[3] >= bottom:
+            self.__dirty = True
+
+    # =======
+    # Bounds
+    # =======
+    def __recompute(self):
+        if len(self.__rects) == 0:
+            self.__bounds = None
+        else:
+            lefts, tops, rights, bottoms = zip(*self.__rects.values())
+            self.__bounds = (min(lefts), min(tops), max(rights), max(bottoms))
+        self.__dirty = False
+
+    def bounds(self):
+        """Gets the bounds of all tracked nodes.
+
+        Returns:
+            tuple: (left, top, right, bottom), or None if nothing is tracked.
+
+        """
+
+        if self.__dirty:
+            self.__recompute()
+        return self.__bounds
+
+    def rect(self):
+        """Gets the bounds of all tracked nodes as a QRectF, or None."""
+
+        return self.toRectF(self.bounds())
+
+    def nodesRect(self, nodes):
+        """Gets the bounds of a subset of nodes, e.g. the selection.
+
+        Nodes which are not tracked have their rect computed directly.
+
+        Returns:
+            QRectF: United rect of the nodes, or None for an empty subset.
+
+        """
+
+        rects = self.__rects
+        left = top = right = bottom = None
+        for node in nodes:
+            r = rects.get(node)
+            if r is None:
+                r = self.nodeSceneRect(node)
+            if left is None:
+                left, top, right, bottom = r
+            else:
+                if r[0] < left:
+                    left = r[0]
+                if r[1] < top:
+                    top = r[1]
+                if r[2] > right:
+                    right = r[2]
+                if r[3] > bottom:
+                    bottom = r[3]
+
+        if left is None:
+            return None
+        return self.toRectF((left, top, right, bottom))
+
+    @staticmethod
+    def toRectF(bounds):
+        if bounds is None:
+            return None
+        left, top, right, bottom = bounds
+        return QtCore.QRectF(left, top, right - left, bottom - top)
@@ -3,23 +3,29 @@
 # Copyright 2015-2017 Eric Thivierge
 #
 
-import copy
 import json
-import re
+import time
 
-import dicttoxml as dicttoxml
-from PySide2.QtCore import QRectF, QPoint, QPointF
-from PySide2.QtWidgets import QMenu, QFileDialog
-from future.utils import iteritems
-from past.builtins import basestring
+from qtpy.QtCore import QRectF, QPoint, QPointF
+from qtpy.QtWidgets import QMenu, QFileDialog
+from qtpy import QtGui, QtWidgets, QtCore
 
-from qtpy import QtGui, QtWidgets, QtCore, PYQT5
-
-import pyflowgraph
-#from .graph_view_widget import GraphViewWidget
 from .node import Node
 from .connection import Connection
-from .port import InputPort, OutputPort
+from .port import InputPort, OutputPort, GlandPort
+from .graph_bounds import GraphBounds
+from .cache_policy import CachePolicy
+from .wire_layer import WireLayer
+from .overview import OverviewRenderer, LOD_DETAIL, LOD_OVERVIEW
+from .progressive import ProgressiveRenderer
+from .scene_index import SceneIndexPolicy
+from .diagnostics import PaintDiagnostics
+from .signal_profiler import SignalProfiler
+from .auto_layout import SugiyamaLayout
+from .virtual_scene import SceneVirtualizer
+from .wire_router import WireRouter
+from . import style
+from . import trace
 
 from .selection_rect import SelectionRect
 
@@ -28,6 +34,18 @@ MANIP_MODE_SELECT = 1
 MANIP_MODE_PAN = 2
 MANIP_MODE_MOVE = 3
 MANIP_MODE_ZOOM = 4
+MANIP_MODE_WIRE = 5
+
+
+def colorComponents(color):
+    """Gets the red, green, blue and alpha of a color as written to graph files.
+
+    Returns:
+        list: The components as strings of floats between 0 and 1.
+
+    """
+
+    return ['%f' % component for component in color.getRgbF()]
 
 
 class GraphView(QtWidgets.QGraphicsView):
@@ -35,6 +53,8 @@ class GraphView(QtWidgets.QGraphicsView):
     nodeAdded = QtCore.Signal(Node)
     nodeRemoved = QtCore.Signal(Node)
     nodeNameChanged = QtCore.Signal(str, str)
+    # Emitted whenever the position, transform or size of a node changed.
+    nodeGeometryChanged = QtCore.Signal(Node)
     beginDeleteSelection = QtCore.Signal()
     endDeleteSelection = QtCore.Signal()
 
@@ -53,20 +73,32 @@ class GraphView(QtWidgets.QGraphicsView):
     # After moving the nodes interactively, this signal is emitted with the final delta.
     endSelectionMoved = QtCore.Signal(set, QtCore.QPointF)
 
+    # Emitted after a frame was painted with a different visible scene rect.
+    viewRectChanged = QtCore.Signal(QtCore.QRectF)
+
+    # Emitted after reset() replaced the scene and dropped all nodes and connections.
+    graphReset = QtCore.Signal()
+
 
 
     _clipboardData = None
 
-    _backgroundColor = QtGui.QColor(50, 50, 50)
-    _gridPenS = QtGui.QPen(QtGui.QColor(25, 44, 44, 255), 0.5)
-    _gridPenL = QtGui.QPen(QtGui.QColor(25, 40, 240, 255), 1.0)
     _gridSizeFine = 30
     _gridSizeCourse = 300
 
     _mouseWheelZoomRate = 0.0005
 
+    # Wheel zoom and pan input is accumulated and applied once per display frame.
+    _inputFrameInterval = 16
+
+    # Below this view scale the graph is drawn by the overview renderer.
+    _overviewThreshold = 0.1
+
     _snapToGrid = False
 
+    _compactPorts = False
+    _fastLayout = False
+
     def __init__(self, parent=None):
         super(GraphView, self).__init__(parent)
         self.setObjectName('graphView')
@@ -86,6 +118,26 @@ class GraphView(QtWidgets.QGraphicsView):
         self.setSceneRect(QRectF(-size.width() * 0.5, -size.height() * 0.5, size.width(), size.height()))
 
         self.setAcceptDrops(True)
+        self.setViewportUpdateMode(QtWidgets.QGraphicsView.SmartViewportUpdate)
+
+        self.__pendingZoom = 1.0
+        self.__pendingPan = QtCore.QPointF()
+        self.__inputTimer = QtCore.QTimer(self)
+        self.__inputTimer.setSingleShot(True)
+        self.__inputTimer.setInterval(self._inputFrameInterval)
+        self.__inputTimer.timeout.connect(self.__applyPendingInput)
+
+        self.__cachePolicy = None
+        self.__wireLayer = None
+        self.__overview = OverviewRenderer(self)
+        self.__progressive = None
+        self.__virtualizer = None
+        self.__sceneIndex = SceneIndexPolicy(self)
+        self.__diagnostics = None
+        self.__signalProfiler = None
+        self.__wireRouter = None
+        self.__nodes = {}
+        self.__applyBackgroundStyle()
         self.reset()                    #set GraphicsScene in here
 
 
@@ -96,15 +148,36 @@ class GraphView(QtWidgets.QGraphicsView):
 
     ################################################
     ## Graph
+    @trace.traced('graph')
     def reset(self):
+        if self.__cachePolicy is not None:
+            self.__cachePolicy.clear()
+        self.__overview.clear()
+        if self.__virtualizer is not None:
+            self.__virtualizer.clear()
+        if self.__wireRouter is not None:
+            self.__wireRouter.clear()
         self.setScene(QtWidgets.QGraphicsScene())
-
+        self.__dragBatch = False
+        if self.__progressive is not None:
+            self.__progressive.setScene(self.scene())
+        if self.__wireLayer is not None:
+            self.__wireLayer = WireLayer(self)
+            self.scene().addItem(self.__wireLayer)
+
+        for node in self.__nodes.values():
+            node._setInGraph(False)
         self.__connections = set()
         self.__nodes = {}
         self.__selection = set()
+        self.__bounds = GraphBounds()
+        self.__sceneIndex.reset()
 
         self._manipulationMode = MANIP_MODE_NONE
         self._selectionRect = None
+        self.__lastViewRect = QtCore.QRectF()
+
+        self.__emit('graphReset')
 
     def getGridSize(self):
         """Gets the size of the grid of the graph.
@@ -136,28 +209,154 @@ QMouseEvent
 
         self._snapToGrid = snap
 
+    def getCompactPorts(self):
+        """Gets whether ports created by the graph are compact ports.
+
+        Returns:
+            Boolean: True if loaded nodes and glands use compact ports.
+
+        """
+
+        return self._compactPorts
+
+    def setCompactPorts(self, compact):
+        """Sets whether ports created by the graph are compact ports.
+
+        Compact ports are painted and hit tested by their node instead of being
+        a tree of widgets, which makes very large drawings feasible.
+
+        Args:
+            compact (Boolean): True to use compact ports, false not to.
+
+        """
+
+        self._compactPorts = compact
+
+    def getFastLayout(self):
+        """Gets whether new nodes use the fixed geometry fast layout.
+
+        Returns:
+            Boolean: True if new nodes skip Qt's layout engine.
+
+        """
+
+        return self._fastLayout
+
+    def setFastLayout(self, fastLayout):
+        """Sets whether new nodes use the fixed geometry fast layout.
+
+        Fast layout nodes compute their header and port geometry arithmetically and
+        apply it once, when the node is added to the graph.
+
+        Args:
+            fastLayout (Boolean): True to use the fast layout, false not to.
+
+        """
+
+        self._fastLayout = fastLayout
+
+
+    ################################################
+    ## Style
+
+    def __applyBackgroundStyle(self):
+        self._backgroundColor = style.registry.color('background')
+        self._gridPenS = style.registry.pen('gridFine', 0.5)
+        self._gridPenL = style.registry.pen('gridCoarse', 1.0)
+
+    def applyStyle(self):
+        """Restyles the background, nodes and connections from the style registry in one pass."""
+
+        self.__applyBackgroundStyle()
+        for node in self.__nodes.values():
+            node.applyStyle()
+        for connection in self.__connections:
+            connection.applyStyle()
+        self.scene().update()
+
+    def setTheme(self, theme):
+        """Switches the theme of the shared style registry and restyles the graph.
+
+        Args:
+            theme (dict): Role name to QColor, see style.DEFAULT_THEME.
+
+        """
+
+        style.registry.setTheme(theme)
+        self.applyStyle()
+
+
+    ################################################
+    ## Item Caching
+
+    def getCachePolicy(self):
+        """Gets the cache policy managing the node cache modes.
+
+        Returns:
+            CachePolicy: The policy, or None if item caching is disabled.
+
+        """
+
+        return self.__cachePolicy
+
+    def setItemCachingEnabled(self, enabled, budgetBytes=64 * 1024 * 1024):
+        """Enables caching of idle, visible nodes into device coordinate pixmaps.
+
+        Args:
+            enabled (Boolean): True to enable the cache policy, false to disable it.
+            budgetBytes (int): Pixmap memory budget shared by all cached nodes.
+
+        """
+
+        if enabled:
+            if self.__cachePolicy is None:
+                self.__cachePolicy = CachePolicy(self, budgetBytes)
+            else:
+                self.__cachePolicy.setBudget(budgetBytes)
+            self.viewport().update()
+        elif self.__cachePolicy is not None:
+            self.__cachePolicy.clear()
+            self.__cachePolicy = None
+
 
     ################################################
     ## Nodes
 
     def addNode(self, node, emitSignal=True):
-        self.scene().addItem(node)
+        node.finalizeLayout()
         self.__nodes[node.getName()] = node
+        node._setInGraph(True)
+        self.__addSceneItem(node)
+        self.__bounds.addNode(node)
+        if self.__wireRouter is not None:
+            self.__wireRouter.addNode(node)
+        if self.__overview.isActive():
+            node.setVisible(False)
+            self.__overview.updateNode(node)
         node.nameChanged.connect(self._onNodeNameChanged)
 
         if emitSignal:
-            self.nodeAdded.emit(node)
+            self.__emit('nodeAdded', node)
 
         return node
 
     def removeNode(self, node, emitSignal=True):
 
         del self.__nodes[node.getName()]
-        self.scene().removeItem(node)
+        node._setInGraph(False)
+        self.__bounds.removeNode(node)
+        if self.__wireRouter is not None:
+            self.__wireRouter.removeNode(node)
+        if self.__overview.isActive():
+            self.__overview.removeNode(node)
+            node.setVisible(True)
+        if self.__cachePolicy is not None:
+            self.__cachePolicy.forget(node)
+        self.__removeSceneItem(node)
         node.nameChanged.disconnect(self._onNodeNameChanged)
 
         if emitSignal:
-            self.nodeRemoved.emit(node)
+            self.__emit('nodeRemoved', node)
 
 
     def hasNode(self, name):
@@ -177,7 +376,183 @@ QMouseEvent
         node = self.__nodes[origName]
         self.__nodes[newName] = node
         del self.__nodes[origName]
-        self.nodeNameChanged.emit( origName, newName )
+        self.__emit('nodeNameChanged', origName, newName)
+
+    def _onNodeGeometryChanged(self, node):
+        # Called by the nodes whenever their position, transform or size changes.
+        # Nodes being built, or not in the graph, are handled when they are added.
+        if not node.isInGraph():
+            return
+        self.__bounds.updateNode(node)
+        self.__emit('nodeGeometryChanged', node)
+
+        if self.__virtualizer is not None:
+            self.__virtualizer.updateItem(node)
+
+        if self.__wireRouter is not None:
+            self.__wireRouter.nodeMoved(node, self.__nodeConnections(node))
+
+        if self.__wireLayer is not None:
+            for connection in self.__nodeConnections(node):
+                self.__wireLayer.invalidate(connection)
+        else:
+            # Moves through setPos do not go through prepareConnectionGeometryChange.
+            for connection in self.__nodeConnections(node):
+                connection.invalidateGeometry()
+                if self.__virtualizer is not None:
+                    self.__virtualizer.updateItem(connection)
+
+        if self.__overview.isActive():
+            self.__overview.updateNode(node)
+            for connection in self.__nodeConnections(node):
+                self.__overview.updateConnection(connection)
+
+    def _onConnectionGeometryChanged(self, connection):
+        # Called by the wire router when the route of a connection changed.
+        connection.invalidateGeometry()
+        if connection.getWireLayer() is None:
+            connection.update()
+            if self.__virtualizer is not None:
+                self.__virtualizer.updateItem(connection)
+        if self.__overview.isActive():
+            self.__overview.updateConnection(connection)
+
+    def __nodeConnections(self, node):
+        for port in node.getPorts():
+            for circle in (port.inCircle(), port.outCircle()):
+                if circle is not None:
+                    for connection in circle.getConnections():
+                        yield connection
+
+    ################################################
+    ## Scene Index
+
+    def getSceneIndexPolicy(self):
+        """Gets the policy managing the item index of the scene.
+
+        The policy is off by default; turn it on with setEnabled(True).
+
+        Returns:
+            SceneIndexPolicy: The scene index policy.
+
+        """
+
+        return self.__sceneIndex
+
+    def beginBatch(self):
+        """Starts a bulk change of the graph, e.g. building or deleting many nodes.
+
+        Calls nest and must be matched by endBatch. While a batch is open a managed
+        scene index is switched off.
+
+        """
+
+        self.__sceneIndex.beginBatch()
+
+    def endBatch(self):
+        self.__sceneIndex.endBatch()
+
+    ################################################
+    ## Virtualization
+
+    def __addSceneItem(self, item):
+        if self.__virtualizer is not None:
+            self.__virtualizer.addItem(item)
+        else:
+            self.scene().addItem(item)
+
+    def __removeSceneItem(self, item):
+        if self.__virtualizer is not None:
+            self.__virtualizer.removeItem(item)
+        else:
+            self.scene().removeItem(item)
+
+    def getVirtualizer(self):
+        """Gets the object keeping only the items near the visible area in the scene.
+
+        Returns:
+            SceneVirtualizer: The virtualizer, or None if all items are in the scene.
+
+        """
+
+        return self.__virtualizer
+
+    def setVirtualizationEnabled(self, enabled, margin=0.5):
+        """Sets whether only the nodes and connections near the visible area are kept in the scene.
+
+        Nodes outside of the scene are still part of the graph: the node, name,
+        selection and connection methods work for them as usual. Their items
+        stay alive, so this bounds the scene work but not the memory used.
+
+        Args:
+            enabled (Boolean): True to virtualize the scene.
+            margin (float): Margin kept around the visible rect, as a fraction of its size.
+
+        """
+
+        if enabled == (self.__virtualizer is not None):
+            if enabled:
+                self.__virtualizer.setMargin(margin)
+            return
+
+        items = list(self.__nodes.values())
+        if self.__wireLayer is None:
+            items.extend(self.__connections)
+
+        if enabled:
+            for item in items:
+                self.scene().removeItem(item)
+            self.__virtualizer = SceneVirtualizer(self, margin)
+            for item in items:
+                self.__virtualizer.addItem(item)
+            self.__virtualizer.update()
+        else:
+            self.__virtualizer.release()
+            self.__virtualizer = None
+
+    def getSceneItemCount(self):
+        """Gets the number of graph items in the scene, from the graph's own bookkeeping.
+
+        Counts the nodes and connections, or the wire layer drawing them, without
+        walking the scene; the ports and labels the nodes own are not counted.
+
+        Returns:
+            int: The item count.
+
+        """
+
+        if self.__virtualizer is not None:
+            count = self.__virtualizer.getResidentCount()
+        elif self.__wireLayer is not None:
+            count = len(self.__nodes)
+        else:
+            count = len(self.__nodes) + len(self.__connections)
+        if self.__wireLayer is not None:
+            count += 1
+        return count
+
+    def getGraphBounds(self):
+        """Gets the scene rect enclosing all the nodes of the graph.
+
+        Returns:
+            QRectF: Bounds of the graph, or None if the graph is empty.
+
+        """
+
+        return self.__bounds.rect()
+
+    def getNodesBounds(self, nodes):
+        """Gets the scene rect enclosing the given nodes.
+
+        Args:
+            nodes (iterable): Nodes to compute the bounds of.
+
+        Returns:
+            QRectF: Bounds of the nodes, or None if there are none.
+
+        """
+
+        return self.__bounds.nodesRect(nodes)
 
 
     def clearSelection(self, emitSignal=True):
@@ -192,7 +567,7 @@ QMouseEvent
         self.__selection.clear()
 
         if emitSignal and len(prevSelection) != 0:
-            self.selectionChanged.emit(prevSelection, [])
+            self.__emit('selectionChanged', prevSelection, [])
 
     def selectNode(self, node, clearSelection=False, emitSignal=True):
         prevSelection = []
@@ -215,7 +590,7 @@ QMouseEvent
             for n in self.__selection:
                 newSelection.append(n)
 
-            self.selectionChanged.emit(prevSelection, newSelection)
+            self.__emit('selectionChanged', prevSelection, newSelection)
 
 
     def deselectNode(self, node, emitSignal=True):
@@ -236,28 +611,56 @@ QMouseEvent
             for n in self.__selection:
                 newSelection.append(n)
 
-            self.selectionChanged.emit(prevSelection, newSelection)
+            self.__emit('selectionChanged', prevSelection, newSelection)
 
     def getSelectedNodes(self):
         return self.__selection
 
 
+    @trace.traced('graph')
     def deleteSelectedNodes(self):
-        self.beginDeleteSelection.emit()
+        self.__emit('beginDeleteSelection')
 
         selectedNodes = self.getSelectedNodes()
         names = ""
-        for node in selectedNodes:
-            node.disconnectAllPorts()
-            self.removeNode(node)
+        self.beginBatch()
+        try:
+            for node in selectedNodes:
+                node.disconnectAllPorts()
+                self.removeNode(node)
+        finally:
+            self.endBatch()
+
+        self.__emit('endDeleteSelection')
+
+
+    def autoLayout(self, nodes=None, **options):
+        """Arranges nodes in layers following their wires, see SugiyamaLayout.
+
+        Args:
+            nodes (list): The nodes to arrange, the others stay in place; all nodes by default.
+            options: Spacing and iteration options of SugiyamaLayout.
+
+        """
 
-        self.endDeleteSelection.emit()
+        SugiyamaLayout(self, **options).apply(nodes)
 
+    def autoLayoutSelectedNodes(self):
+        """Arranges the selected nodes, or all nodes if none are selected."""
+
+        selection = self.getSelectedNodes()
+        self.autoLayout(list(selection) if selection else None)
 
     def frameNodes(self, nodes):
         if len(nodes) == 0:
             return
 
+        self.frameRect(self.__bounds.nodesRect(nodes))
+
+    def frameRect(self, nodesRect):
+        if nodesRect is None:
+            return
+
         def computeWindowFrame():
             windowRect = self.rect()
             windowRect.setLeft(windowRect.left() + 16)
@@ -266,24 +669,16 @@ QMouseEvent
             windowRect.setBottom(windowRect.bottom() - 16)
             return windowRect
 
-        nodesRect = None
-        for node in nodes:
-            nodeRectF = node.transform().mapRect(node.rect())
-            nodeRect = QtCore.QRect(nodeRectF.x(), nodeRectF.y(), nodeRectF.width(), nodeRectF.height())
-            if nodesRect is None:
-                nodesRect = nodeRect
-            else:
-                nodesRect = nodesRect.united(nodeRect)
-
-
         windowRect = computeWindowFrame()
 
-        scaleX = float(windowRect.width()) / float(nodesRect.width())
-        scaleY = float(windowRect.height()) / float(nodesRect.height())
-        if scaleY > scaleX:
-            scale = scaleX
-        else:
-            scale = scaleY
+        scale = 1.0
+        if nodesRect.width() > 0 and nodesRect.height() > 0:
+            scaleX = float(windowRect.width()) / float(nodesRect.width())
+            scaleY = float(windowRect.height()) / float(nodesRect.height())
+            if scaleY > scaleX:
+                scale = scaleX
+            else:
+                scale = scaleY
 
         if scale < 1.0:
             self.setTransform(QtGui.QTransform.fromScale(scale, scale))
@@ -294,19 +689,30 @@ QMouseEvent
         pan = sceneRect.center() - nodesRect.center()
         sceneRect.translate(-pan.x(), -pan.y())
         self.setSceneRect(sceneRect)
+        self.__updateLevelOfDetail()
 
         # Update the main panel when reframing.
         self.update()
 
 
+    def panTo(self, scenePos):
+        """Pans the view, keeping the zoom, so that it is centered on a scene position.
+
+        Args:
+            scenePos (QPointF): The new center of the view in scene coordinates.
+
+        """
+
+        sceneRect = self.sceneRect()
+        sceneRect.moveCenter(scenePos)
+        self.setSceneRect(sceneRect)
+        self.update()
+
     def frameSelectedNodes(self):
         self.frameNodes(self.getSelectedNodes())
 
     def frameAllNodes(self):
-        allnodes = []
-        for name, node in iteritems(self.__nodes):
-            allnodes.append(node)
-        self.frameNodes(allnodes)
+        self.frameRect(self.__bounds.rect())
 
     def getSelectedNodesCentroid(self):
         selectedNodes = self.getSelectedNodes()
@@ -335,52 +741,160 @@ QMouseEvent
         return pos
 
 
+    # Called when an interactive move of the selection starts; endMoveSelectedNodes ends it.
+    def beginMoveSelectedNodes(self):
+        if self.__cachePolicy is not None:
+            self.__cachePolicy.suspend(self.__selection)
+        if not self.__dragBatch:
+            self.__dragBatch = True
+            self.beginBatch()
+
     def moveSelectedNodes(self, delta, emitSignal=True):
         for node in self.__selection:
             node.translate(delta.x(), delta.y())
 
         if emitSignal:
-            self.selectionMoved.emit(self.__selection, delta)
+            self.__emit('selectionMoved', self.__selection, delta)
 
     # After moving the nodes interactively, this signal is emitted with the final delta.
+    @trace.traced('graph')
     def endMoveSelectedNodes(self, delta):
-        self.endSelectionMoved.emit(self.__selection, delta)
+        if self.__cachePolicy is not None:
+            self.__cachePolicy.resume(self.__selection)
+        if self.__dragBatch:
+            self.__dragBatch = False
+            self.endBatch()
+        self.__emit('endSelectionMoved', self.__selection, delta)
 
     ################################################
     ## Connections
 
     def emitBeginConnectionManipulationSignal(self):
-        self.beginConnectionManipulation.emit()
+        self.__emit('beginConnectionManipulation')
 
 
     def emitEndConnectionManipulationSignal(self):
-        self.printConnections()
-        self.endConnectionManipulation.emit()
+        if trace.enabled('connection', trace.DEBUG):
+            connections = sorted((c.getSrcPort().getNode().getName(), c.getSrcPort().getName(),
+                                  c.getDstPort().getNode().getName(), c.getDstPort().getName())
+                                 for c in self.__connections)
+            trace.log('connection', trace.DEBUG, 'endConnectionManipulation', connections=connections)
+        self.__emit('endConnectionManipulation')
 
 
     def addConnection(self, connection, emitSignal=True):
 
         self.__connections.add(connection)
-        self.scene().addItem(connection)
+        if self.__wireLayer is not None:
+            self.__wireLayer.addConnection(connection)
+        else:
+            self.__addSceneItem(connection)
+        if self.__wireRouter is not None:
+            self.__wireRouter.addConnection(connection)
+        if self.__overview.isActive():
+            connection.setVisible(False)
+            self.__overview.updateConnection(connection)
         if emitSignal:
-            self.connectionAdded.emit(connection)
+            self.__emit('connectionAdded', connection)
         return connection
 
     def removeConnection(self, connection, emitSignal=True):
         connection.disconnect()
         if connection in self.__connections:
             self.__connections.remove(connection)
-        self.scene().removeItem(connection)
+        if connection.getWireLayer() is not None:
+            connection.getWireLayer().removeConnection(connection)
+        else:
+            self.__removeSceneItem(connection)
+        if self.__wireRouter is not None:
+            self.__wireRouter.removeConnection(connection)
+        if self.__overview.isActive():
+            self.__overview.removeConnection(connection)
+            connection.setVisible(True)
         if emitSignal:
-            self.connectionRemoved.emit(connection)
+            self.__emit('connectionRemoved', connection)
+
+    def getConnections(self):
+        return self.__connections
+
+    def getWireLayer(self):
+        """Gets the item drawing all the connections.
+
+        Returns:
+            WireLayer: The wire layer, or None if each connection is its own scene item.
+
+        """
+
+        return self.__wireLayer
+
+    def setWireLayerEnabled(self, enabled):
+        """Sets whether all connections are drawn by a single wire layer item.
+
+        In wire layer mode the Connection objects stay the public handles and all
+        signals are unchanged, but the connections are not scene items.
+
+        Args:
+            enabled (Boolean): True to draw the connections with a wire layer.
+
+        """
+
+        if enabled == (self.__wireLayer is not None):
+            return
+
+        if enabled:
+            self.__wireLayer = WireLayer(self)
+            self.scene().addItem(self.__wireLayer)
+            for connection in self.__connections:
+                self.__removeSceneItem(connection)
+                self.__wireLayer.addConnection(connection)
+        else:
+            for connection in self.__connections:
+                self.__wireLayer.removeConnection(connection)
+                self.__addSceneItem(connection)
+            self.scene().removeItem(self.__wireLayer)
+            self.__wireLayer = None
+
+    def getWireRouter(self):
+        """Gets the object routing the connections around the nodes.
+
+        Returns:
+            WireRouter: The router, or None if the connections take their default path.
+
+        """
+
+        return self.__wireRouter
+
+    def setWireRoutingEnabled(self, enabled, asynchronous=True):
+        """Sets whether the connections are routed around the nodes.
+
+        Args:
+            enabled (Boolean): True to route the connections.
+            asynchronous (Boolean): True to route in a worker thread, applying the routes as they are ready.
+
+        """
+
+        if enabled == (self.__wireRouter is not None):
+            return
+
+        if enabled:
+            self.__wireRouter = WireRouter(self, asynchronous=asynchronous)
+            for node in self.__nodes.values():
+                self.__wireRouter.addNode(node)
+            for connection in self.__connections:
+                self.__wireRouter.addConnection(connection)
+        else:
+            self.__wireRouter.close()
+            self.__wireRouter = None
+            for connection in self.__connections:
+                self._onConnectionGeometryChanged(connection)
 
     def printConnections(self):
         print("===Connections===")
         for c in self.__connections:
-            nodeFrom = c._Connection__srcPortCircle._PortCircle__port._node.getName()
-            nodeTo = c._Connection__dstPortCircle._PortCircle__port._node.getName()
-            termFrom = c._Connection__srcPortCircle._PortCircle__port._name
-            termTo = c._Connection__dstPortCircle._PortCircle__port._name
+            nodeFrom = c.getSrcPort().getNode().getName()
+            nodeTo = c.getDstPort().getNode().getName()
+            termFrom = c.getSrcPort().getName()
+            termTo = c.getDstPort().getName()
             print(nodeFrom, termFrom, nodeTo, termTo)
 
             #print(c, c._Connection__srcPortCircle._connectionPointType, c._Connection__dstPortCircle._connectionPointType, c._Connection__srcPortCircle._PortCircle__connections, c._Connection__dstPortCircle._PortCircle__connections )
@@ -390,7 +904,7 @@ QMouseEvent
         connection = None
         if isinstance(srcNode, Node):
             sourceNode = srcNode
-        elif isinstance(srcNode, basestring):
+        elif isinstance(srcNode, str):
             sourceNode = self.getNode(srcNode)
             if not sourceNode:
                 raise Exception("Node not found:" + str(srcNode))
@@ -405,7 +919,7 @@ QMouseEvent
 
         if isinstance(tgtNode, Node):
             targetNode = tgtNode
-        elif isinstance(tgtNode, basestring):
+        elif isinstance(tgtNode, str):
             targetNode = self.getNode(tgtNode)
             if not targetNode:
                 raise Exception("Node not found:" + str(tgtNode))
@@ -482,12 +996,13 @@ QMouseEvent
     ################################################
     ## Events
 
+    @trace.traced('io')
     def loadNodes(self, fileName, offsetPos):
-        from pyflowgraph.graph_view_widget import GraphViewWidget
-        graph = GraphViewWidget.getGraphView(GraphViewWidget.clsSelf[0])
+        graph = self
         in_file = open(fileName, 'r')
         graphD = json.load(in_file)
-        print(graphD)
+        if trace.enabled('io', trace.DEBUG):
+            trace.log('io', trace.DEBUG, 'loadNodes: parsed', fileName=fileName, graph=graphD)
         allConnections = []
         allConnections.clear()
         # self.prepareConnectionGeometryChange()
@@ -497,7 +1012,6 @@ QMouseEvent
             nameUpdate = {}
             node['oldName'] = None          #and keep a list so we can update connections
             name = str(node['name'])
-            print("name", name)
             newName = name[:]               #make sure to actually geta copy of the var
             seqNum = 1
             while self.getNode(newName):                  #name already exists, keep trying until newName is new
@@ -507,88 +1021,104 @@ QMouseEvent
                 else:
                     newName = name + '_' + str(seqNum).zfill(2)
                     seqNum = seqNum+1
-                print("newName", newName)
                 #node['oldName'] = name
                 node['name'] = str(newName)
+            if newName != name and trace.enabled('io', trace.DEBUG):
+                trace.log('io', trace.DEBUG, 'loadNodes: renamed', name=name, newName=newName)
             nameUpdate['oldName'] = name
             nameUpdate['name'] = newName
             names.append(nameUpdate)
 
-        for node in graphD['nodes']:
-            # node.prepareConnectionGeometryChange()
-
-            node1 = Node(graph, node['name'], xSize=float(node['width']), ySize=float(node['height']))
-            for p in node['ports']:
-                if p['connectionPointType'] == 'In':
-                    node1.addPort(InputPort(node1, graph, p['name'],
-                                            QtGui.QColor.fromRgbF(float(p['colorR']), float(p['colorB']),
-                                                                  float(p['colorG']), float(p['colorT'])),
-                                            dataType=p['dataType']), x=float(p['x']), y=float(p['y']))
-                if p['connectionPointType'] == 'Out':
-                    node1.addPort(OutputPort(node1, graph, p['name'],
-                                             QtGui.QColor.fromRgbF(float(p['colorR']), float(p['colorB']),
-                                                                   float(p['colorG']), float(p['colorT'])),
-                                             dataType=p['dataType']),
-                                  x=float(p['x']), y=float(p['y']))
-                d = p['connections']
-                if d:
-                    allConnections.append(d)
-            graph.addNode(node1)
-            node1.setPos(float(node['x'] + offsetPos.x()), float(node['y'] + offsetPos.y()))
-        print("names==>", names)
-
-        print("allConnections==>", allConnections)
-        print("\n\n")
-        for portConnections in allConnections:
-            for checkName in names:  # replace old block names with new
-                if portConnections[0]['nodeFrom'] in checkName['oldName']:
-                    portConnections[0]['nodeFrom'] = checkName['name']
-                if portConnections[0]['nodeTo'] in checkName['oldName']:
-                    portConnections[0]['nodeTo'] = checkName['name']
-
-        print("allConnections==>", allConnections)
-
-        for cc in allConnections:
-            c = cc[0]
-            self.connectPorts(c['nodeFrom'], c['termFrom'], c['nodeTo'], c['termTo'])
+        graph.beginBatch()
+        try:
+            for node in graphD['nodes']:
+                # node.prepareConnectionGeometryChange()
+
+                node1 = Node(graph, node['name'], xSize=float(node['width']), ySize=float(node['height']))
+                for p in node['ports']:
+                    color = QtGui.QColor.fromRgbF(float(p['colorR']), float(p['colorB']),
+                                                  float(p['colorG']), float(p['colorT']))
+                    if p['connectionPointType'] in ('In', 'Out') and graph.getCompactPorts():
+                        node1.addCompactPort(p['name'], color, p['dataType'], p['connectionPointType'],
+                                             float(p['x']), float(p['y']))
+                    elif p['connectionPointType'] == 'In':
+                        node1.addPort(InputPort(node1, graph, p['name'], color,
+                                                dataType=p['dataType']), x=float(p['x']), y=float(p['y']))
+                    elif p['connectionPointType'] == 'Out':
+                        node1.addPort(OutputPort(node1, graph, p['name'], color,
+                                                 dataType=p['dataType']),
+                                      x=float(p['x']), y=float(p['y']))
+                    elif p['connectionPointType'] == 'Gland':
+                        if graph.getCompactPorts():
+                            node1.addCompactPort(p['name'], color, p['dataType'], 'Gland',
+                                                 float(p['x']), float(p['y']))
+                        else:
+                            node1.addPort(GlandPort(node1, graph, p['name'], color, p['dataType']),
+                                          float(p['x']), float(p['y']))
+                    d = p['connections']
+                    if d:
+                        allConnections.append(d)
+                graph.addNode(node1)
+                node1.setPos(float(node['x'] + offsetPos.x()), float(node['y'] + offsetPos.y()))
+            newNames = dict((checkName['oldName'], checkName['name']) for checkName in names)
+            for portConnections in allConnections:
+                for c in portConnections:  # replace old block names with new
+                    if c:
+                        c['nodeFrom'] = newNames.get(c['nodeFrom'], c['nodeFrom'])
+                        c['nodeTo'] = newNames.get(c['nodeTo'], c['nodeTo'])
+
+            if trace.enabled('io', trace.DEBUG):
+                trace.log('io', trace.DEBUG, 'loadNodes: connections', connections=allConnections)
+
+            # A port lists all its connections, and files written by saveNodes record a
+            # connection at both of its ends, so each one is only made once.
+            madeConnections = set()
+            for cc in allConnections:
+                for c in cc:
+                    if not c:
+                        continue
+                    key = (c['nodeFrom'], c['termFrom'], c['nodeTo'], c['termTo'])
+                    if key in madeConnections:
+                        continue
+                    madeConnections.add(key)
+                    self.connectPorts(c['nodeFrom'], c['termFrom'], c['nodeTo'], c['termTo'])
+        finally:
+            graph.endBatch()
             # connection = Connection(graph, graph.getNode(c['nodeFrom']).getPort(c['termFrom']), graph.getNode(c['nodeTo']).getPort(c['termTo']))
             # graph.__connections.add(connection)
             # self.connectPorts(self.getNode(c['nodeFrom']), c['termFrom'], self.getNode(c['nodeTo']), c['termTo'])
 
+    @trace.traced('io')
     def saveNodes(self, nodes, fileName):
         graphD = {}
         graphD = {'nodes': []}
         for n in nodes.values():
             nodeD = {}
-            c1 = str(re.findall(r'\(.*?\)', str(n.getColor())))
-            c2 = c1[3:-4]
-            c3 = c2.split(',')  # TODO dodgy
+            c3 = colorComponents(n.getColor())
             nodeD = {
                 'width': str(n.getWidth()),
                 'height': str(n.getHeight()),
                 'x': n.pos().x(),
                 'y': n.pos().y(),
                 'name': str(n.getName()),
-                'colorR': c3[0],  # extract the color from inside the brackets
-                'colorG': c3[1],  # extract the color from inside the brackets
-                'colorB': c3[2],  # extract the color from inside the brackets
-                'colorT': c3[3],  # extract the color from inside the brackets
+                'colorR': c3[0],
+                'colorG': c3[1],
+                'colorB': c3[2],
+                'colorT': c3[3],
                 'ports': []
             }
             for p in n.getPorts():
                 portD = {}
-                c1 = str(re.findall(r'\(.*?\)', str(p.getColor())))
-                c2 = c1[3:-4]
-                c3 = c2.split(',')  # TODO another super dodgy
+                c3 = colorComponents(p.getColor())
                 portD = {
                     'x': str(p.pos().x()),
                     'y': str(p.pos().y()),
                     'connectionPointType': str(p.connectionPointType()),
                     'dataType': str(p.getDataType()),
-                    'colorR': c3[0],  # extract the color from inside the brackets
-                    'colorG': c3[1],  # extract the color from inside the brackets
-                    'colorB': c3[2],  # extract the color from inside the brackets
-                    'colorT': c3[3],  # extract the color from inside the brackets
+                    'colorR': c3[0],
+                    'colorG': c3[1],
+                    'colorB': c3[2],
+                    'colorT': c3[3],
                     'name': str(p.getName()),
                     'connections': []
                 }
@@ -599,17 +1129,17 @@ QMouseEvent
                     cc = p._outCircle.getConnections()
                 if cc:
                     for c in cc:
-                        nodeFrom = c._Connection__srcPortCircle._PortCircle__port._node.getName()
-                        nodeTo = c._Connection__dstPortCircle._PortCircle__port._node.getName()
-                        termFrom = c._Connection__srcPortCircle.getPort().getName(),
-                        termTo = c._Connection__dstPortCircle.getPort().getName()
+                        nodeFrom = c.getSrcPort().getNode().getName()
+                        nodeTo = c.getDstPort().getNode().getName()
+                        termFrom = c.getSrcPort().getName(),
+                        termTo = c.getDstPort().getName()
                         connectionsD = {
                             'nodeFrom': str(nodeFrom),
                             'nodeTo': str(nodeTo),
                             'termFrom': str(termFrom[0]),
                             'termTo': str(termTo),  # TODO TODO mega dodgy
-                            'srcPortCircle': str(c._Connection__srcPortCircle.getPort()),
-                            'dstPortCircle': str(c._Connection__dstPortCircle.getPort()),
+                            'srcPortCircle': str(c.getSrcPort()),
+                            'dstPortCircle': str(c.getDstPort()),
                             'node': []
                         }
                     portD['connections'].append(connectionsD)
@@ -625,41 +1155,38 @@ QMouseEvent
         #with open(fileName, 'w') as file_object:
         #    file_object.write(str(xml))
 
+    @trace.traced('io')
     def saveNodesCopy(self, nodes, fileName):
         graphD = {}
         graphD = {'nodes': []}
         copyNodes = nodes.values()
         for n in copyNodes:
             nodeD = {}
-            c1 = str(re.findall(r'\(.*?\)', str(n.getColor())))
-            c2 = c1[3:-4]
-            c3 = c2.split(',')  # TODO dodgy
+            c3 = colorComponents(n.getColor())
             nodeD = {
                 'width': str(n.getWidth()),
                 'height': str(n.getHeight()),
                 'x': n.pos().x(),
                 'y': n.pos().y(),
                 'name': str(n.getName()),
-                'colorR': c3[0],  # extract the color from inside the brackets
-                'colorG': c3[1],  # extract the color from inside the brackets
-                'colorB': c3[2],  # extract the color from inside the brackets
-                'colorT': c3[3],  # extract the color from inside the brackets
+                'colorR': c3[0],
+                'colorG': c3[1],
+                'colorB': c3[2],
+                'colorT': c3[3],
                 'ports': []
             }
             for p in n.getPorts():
                 portD = {}
-                c1 = str(re.findall(r'\(.*?\)', str(p.getColor())))
-                c2 = c1[3:-4]
-                c3 = c2.split(',')  # TODO another super dodgy
+                c3 = colorComponents(p.getColor())
                 portD = {
                     'x': str(p.pos().x()),
                     'y': str(p.pos().y()),
                     'connectionPointType': str(p.connectionPointType()),
                     'dataType': str(p.getDataType()),
-                    'colorR': c3[0],  # extract the color from inside the brackets
-                    'colorG': c3[1],  # extract the color from inside the brackets
-                    'colorB': c3[2],  # extract the color from inside the brackets
-                    'colorT': c3[3],  # extract the color from inside the brackets
+                    'colorR': c3[0],
+                    'colorG': c3[1],
+                    'colorB': c3[2],
+                    'colorT': c3[3],
                     'name': str(p.getName()),
                     'connections': []
                 }
@@ -670,20 +1197,20 @@ QMouseEvent
                 if p._outCircle:
                     connections = p._outCircle.getConnections()
                 for c in connections:
-                    nodeFromNode = c._Connection__srcPortCircle._PortCircle__port._node
-                    nodeToNode = c._Connection__dstPortCircle._PortCircle__port._node
+                    nodeFromNode = c.getSrcPort().getNode()
+                    nodeToNode = c.getDstPort().getNode()
                     if nodeFromNode in copyNodes and nodeToNode in copyNodes:
-                        nodeFrom = c._Connection__srcPortCircle._PortCircle__port._node.getName()
-                        nodeTo = c._Connection__dstPortCircle._PortCircle__port._node.getName()
-                        termFrom = c._Connection__srcPortCircle.getPort().getName(),
-                        termTo = c._Connection__dstPortCircle.getPort().getName()
+                        nodeFrom = c.getSrcPort().getNode().getName()
+                        nodeTo = c.getDstPort().getNode().getName()
+                        termFrom = c.getSrcPort().getName(),
+                        termTo = c.getDstPort().getName()
                         connectionsD = {
                             'nodeFrom': str(nodeFrom),
                             'nodeTo': str(nodeTo),
                             'termFrom': str(termFrom[0]),
                             'termTo': str(termTo),  # TODO TODO mega dodgy
-                            'srcPortCircle': str(c._Connection__srcPortCircle.getPort()),
-                            'dstPortCircle': str(c._Connection__dstPortCircle.getPort()),
+                            'srcPortCircle': str(c.getSrcPort()),
+                            'dstPortCircle': str(c.getDstPort()),
                             'node': []
                         }
                         portD['connections'].append(connectionsD)
@@ -701,17 +1228,28 @@ QMouseEvent
 
     def mousePressEvent(self, event):
 
+        if event.button() == QtCore.Qt.LeftButton and self.__wireLayer is not None and self.itemAt(event.pos()) is None:
+            scenePos = self.mapToScene(event.pos())
+            connection = self.__wireLayer.connectionAt(scenePos, 4.0 / max(self.transform().m11(), 0.01))
+            if connection is not None:
+                # Dragging a wire off a port, as Connection.mouseMoveEvent does for wire items.
+                self._manipulationMode = MANIP_MODE_WIRE
+                self._wireDragConnection = connection
+                self._lastDragPoint = scenePos
+                super(GraphView, self).mousePressEvent(event)
+                return
+
         if event.button() == QtCore.Qt.LeftButton and self.itemAt(event.pos()) is None:
-            self.beginNodeSelection.emit()
+            self.__emit('beginNodeSelection')
             self._manipulationMode = MANIP_MODE_SELECT
-            self._mouseDownSelection = copy.copy(self.getSelectedNodes())
+            self._mouseDownSelection = set(self.getSelectedNodes())
             self.clearSelection(emitSignal=False)
             self._selectionRect = SelectionRect(graph=self, mouseDownPos=self.mapToScene(event.pos()))
 
         if event.button() == QtCore.Qt.MidButton or event.button() == QtCore.Qt.MiddleButton and self.itemAt(event.pos()) is None:
             self.setCursor(QtCore.Qt.OpenHandCursor)
             self._manipulationMode = MANIP_MODE_PAN
-            self._lastPanPoint = self.mapToScene(event.pos())
+            self._lastPanPos = event.pos()
 
         if event.button() == QtCore.Qt.RightButton and self.itemAt(event.pos()) is None:
             self.setCursor(QtCore.Qt.SizeHorCursor)
@@ -736,7 +1274,7 @@ QMouseEvent
             # This logic allows users to use ctrl and shift with rectangle
             # select to add / remove nodes.
             if modifiers == QtCore.Qt.ControlModifier:
-                for name, node in iteritems(self.__nodes):
+                for name, node in self.__nodes.items():
 
                     if node in self._mouseDownSelection:
                         if node.isSelected() and self._selectionRect.collidesWithItem(node):
@@ -751,7 +1289,7 @@ QMouseEvent
                                 self.deselectNode(node, emitSignal=False)
 
             elif modifiers == QtCore.Qt.ShiftModifier:
-                for name, node in iteritems(self.__nodes):
+                for name, node in self.__nodes.items():
                     if not node.isSelected() and self._selectionRect.collidesWithItem(node):
                         self.selectNode(node, emitSignal=False)
                     elif node.isSelected() and not self._selectionRect.collidesWithItem(node):
@@ -761,20 +1299,18 @@ QMouseEvent
             else:
                 self.clearSelection(emitSignal=False)
 
-                for name, node in iteritems(self.__nodes):
+                for name, node in self.__nodes.items():
                     if not node.isSelected() and self._selectionRect.collidesWithItem(node):
                         self.selectNode(node, emitSignal=False)
                     elif node.isSelected() and not self._selectionRect.collidesWithItem(node):
                         self.deselectNode(node, emitSignal=False)
 
         elif self._manipulationMode == MANIP_MODE_PAN:
-            delta = self.mapToScene(event.pos()) - self._lastPanPoint
-
-            rect = self.sceneRect()
-            rect.translate(-delta.x(), -delta.y())
-            self.setSceneRect(rect)
-
-            self._lastPanPoint = self.mapToScene(event.pos())
+            # Pan deltas are kept in view pixels until the next frame applies them.
+            delta = event.pos() - self._lastPanPos
+            self.__pendingPan += QtCore.QPointF(delta)
+            self._lastPanPos = event.pos()
+            self.__scheduleInput()
 
         elif self._manipulationMode == MANIP_MODE_MOVE:
 
@@ -822,12 +1358,23 @@ QMouseEvent
             rect = self.sceneRect()
             rect.translate(-1 * newOffsetFromSceneCenter)
             self.setSceneRect(rect)
+            self.__updateLevelOfDetail()
 
             # Call udpate to redraw background
             self.update()
 
+        elif self._manipulationMode == MANIP_MODE_WIRE:
+            pos = self.mapToScene(event.pos())
+            delta = pos - self._lastDragPoint
+            if delta.x() != 0:
+                self._manipulationMode = MANIP_MODE_NONE
+                connection = self._wireDragConnection
+                self._wireDragConnection = None
+                connection.detach(pos, delta)
 
         else:
+            if self.__wireLayer is not None:
+                self.__wireLayer.setHoverPos(self.mapToScene(event.pos()))
             super(GraphView, self).mouseMoveEvent(event)
 
     def mouseReleaseEvent(self, event):
@@ -855,9 +1402,9 @@ QMouseEvent
                     selectedNodes.append(node)
 
             if selectedNodes != deselectedNodes:
-                self.selectionChanged.emit(deselectedNodes, selectedNodes)
+                self.__emit('selectionChanged', deselectedNodes, selectedNodes)
 
-            self.endNodeSelection.emit()
+            self.__emit('endNodeSelection')
 
         elif self._manipulationMode == MANIP_MODE_PAN:
             self.setCursor(QtCore.Qt.ArrowCursor)
@@ -868,6 +1415,10 @@ QMouseEvent
             self._manipulationMode = MANIP_MODE_NONE
             #self.setTransformationAnchor(self._lastAnchor)
 
+        elif self._manipulationMode == MANIP_MODE_WIRE:
+            self._wireDragConnection = None
+            self._manipulationMode = MANIP_MODE_NONE
+
         else:
             super(GraphView, self).mouseReleaseEvent(event)
 
@@ -878,51 +1429,248 @@ QMouseEvent
         bottomRight = xfo.map(self.rect().bottomRight())
         center = ( topLeft + bottomRight ) * 0.5
 
-        if PYQT5:
-            zoomFactor = 1.0 + event.angleDelta().y() * self._mouseWheelZoomRate
-        else:
-             zoomFactor = 1.0 + event.delta() * self._mouseWheelZoomRate
+        zoomFactor = 1.0 + event.angleDelta().y() * self._mouseWheelZoomRate
 
         transform = self.transform()
 
         # Limit zoom to 3x
-        if transform.m22() * zoomFactor >= 2.0:
+        if transform.m22() * self.__pendingZoom * zoomFactor >= 2.0:
             return
 
-        self.scale(zoomFactor, zoomFactor)
+        self.__pendingZoom *= zoomFactor
+        self.__scheduleInput()
+
+    def __scheduleInput(self):
+        if not self.__inputTimer.isActive():
+            self.__inputTimer.start()
+
+    def __applyPendingInput(self):
+        pan = self.__pendingPan
+        zoom = self.__pendingZoom
+        self.__pendingPan = QtCore.QPointF()
+        self.__pendingZoom = 1.0
+
+        if not pan.isNull():
+            scale = self.transform().m11()
+            rect = self.sceneRect()
+            rect.translate(-pan.x() / scale, -pan.y() / scale)
+            self.setSceneRect(rect)
+
+        if zoom != 1.0:
+            self.scale(zoom, zoom)
+            self.__updateLevelOfDetail()
 
         # Call udpate to redraw background
         self.update()
 
+    ################################################
+    ## Level Of Detail
+
+    def getOverviewThreshold(self):
+        return self._overviewThreshold
+
+    def setOverviewThreshold(self, threshold):
+        """Sets the view scale below which the graph is drawn as an overview.
+
+        Args:
+            threshold (float): View scale, or None to never switch to the overview.
+
+        """
+
+        self._overviewThreshold = threshold
+        self.__updateLevelOfDetail()
+
+    def getLevelOfDetail(self):
+        """Gets how the graph is currently drawn.
+
+        Returns:
+            int: LOD_OVERVIEW while the overview renderer is active, else LOD_DETAIL.
+
+        """
+
+        if self.__overview.isActive():
+            return LOD_OVERVIEW
+        return LOD_DETAIL
+
+    def __updateLevelOfDetail(self):
+        threshold = self._overviewThreshold
+        overview = threshold is not None and self.transform().m11() < threshold
+        if overview == self.__overview.isActive():
+            return
+
+        if overview:
+            self.__overview.activate(self.__nodes.values(), self.__connections)
+        else:
+            self.__overview.deactivate()
+
+        # The detailed items are hidden rather than removed, so the scene index,
+        # selection and item state survive the switch.
+        for node in self.__nodes.values():
+            node.setVisible(not overview)
+        if self.__wireLayer is not None:
+            self.__wireLayer.setVisible(not overview)
+        else:
+            for connection in self.__connections:
+                connection.setVisible(not overview)
+
+        self.viewport().update()
 
     ################################################
     ## Painting
 
+    def getProgressiveRenderer(self):
+        """Gets the renderer painting the view over several event loop ticks.
+
+        Returns:
+            ProgressiveRenderer: The renderer, or None if the view paints each frame in one pass.
+
+        """
+
+        return self.__progressive
+
+    def setProgressiveRenderingEnabled(self, enabled, budgetMs=8):
+        """Sets whether frames are rendered progressively.
+
+        In progressive mode nodes are painted first and wires and labels after,
+        spread over event loop ticks, and a pan or zoom cancels the frame in
+        progress. This keeps input responsive when a frame takes longer to paint
+        than the budget. The foreground, e.g. the diagnostics overlay, is drawn
+        over the frame on every paint.
+
+        Args:
+            enabled (Boolean): True to render frames progressively.
+            budgetMs (int): Milliseconds spent painting per event loop tick.
+
+        """
+
+        if enabled:
+            if self.__progressive is None:
+                self.__progressive = ProgressiveRenderer(self, budgetMs)
+                self.__progressive.setScene(self.scene())
+            else:
+                self.__progressive.setBudget(budgetMs)
+        elif self.__progressive is not None:
+            self.__progressive.clear()
+            self.__progressive = None
+        self.viewport().update()
+
+    def getDiagnostics(self):
+        """Gets the paint statistics collector.
+
+        Returns:
+            PaintDiagnostics: The collector, or None if diagnostics are off.
+
+        """
+
+        return self.__diagnostics
+
+    def setDiagnosticsEnabled(self, enabled, logFile=None):
+        """Sets whether paint statistics are collected and shown over the view.
+
+        Args:
+            enabled (Boolean): True to collect the statistics and draw the overlay.
+            logFile (str): Optional CSV file the statistics of every frame are appended to.
+
+        """
+
+        if self.__diagnostics is not None:
+            self.__diagnostics.close()
+            self.__diagnostics = None
+        if enabled:
+            self.__diagnostics = PaintDiagnostics(self)
+            if logFile is not None:
+                self.__diagnostics.setLogFile(logFile)
+        self.viewport().update()
+
+    def getSignalProfiler(self):
+        """Gets the signal emission profiler.
+
+        Returns:
+            SignalProfiler: The profiler, or None if signals are not profiled.
+
+        """
+
+        return self.__signalProfiler
+
+    def setSignalProfilingEnabled(self, enabled):
+        """Sets whether the emissions of the graph's signals are counted and timed.
+
+        Args:
+            enabled (Boolean): True to profile the signals; False drops the collected statistics.
+
+        """
+
+        if self.__signalProfiler is not None:
+            self.__signalProfiler.close()
+            self.__signalProfiler = None
+        if enabled:
+            self.__signalProfiler = SignalProfiler(self)
+
+    def __emit(self, name, *args):
+        if self.__signalProfiler is None:
+            getattr(self, name).emit(*args)
+        else:
+            self.__signalProfiler.emit(name, args)
+
+    def paintEvent(self, event):
+        # The overview draws every node anyway, so the scene is left as it is while it is shown.
+        if self.__virtualizer is not None and not self.__overview.isActive():
+            self.__virtualizer.check()
+
+        visibleRect = self.mapToScene(self.viewport().rect()).boundingRect()
+        if visibleRect != self.__lastViewRect:
+            self.__lastViewRect = visibleRect
+            self.__emit('viewRectChanged', visibleRect)
+
+        if self.__diagnostics is not None:
+            self.__diagnostics.beginFrame(event.rect())
+
+        # The overview is cheap enough to paint in one pass.
+        if self.__progressive is not None and not self.__overview.isActive():
+            painter = QtGui.QPainter(self.viewport())
+            self.__progressive.paint(painter)
+            # The frame image holds the background; the foreground is drawn over it, as the view would.
+            painter.setWorldTransform(self.viewportTransform())
+            self.drawForeground(painter, self.mapToScene(event.rect()).boundingRect())
+            painter.end()
+        else:
+            super(GraphView, self).paintEvent(event)
+
+            if self.__cachePolicy is not None:
+                self.__cachePolicy.endFrame(self.mapToScene(event.rect()).boundingRect())
+
+        if self.__diagnostics is not None:
+            self.__diagnostics.endFrame(self.getSceneItemCount(), self.getLevelOfDetail(), self.transform().m11())
+
     def drawBackground(self, painter, rect):
+        if self.__diagnostics is not None:
+            start = time.perf_counter()
 
         oldTransform = painter.transform()
         painter.fillRect(rect, self._backgroundColor)
 
-        left = int(rect.left()) - (int(rect.left()) % self._gridSizeFine)
-        top = int(rect.top()) - (int(rect.top()) % self._gridSizeFine)
-
-        # Draw horizontal fine lines
-        gridLines = []
-        painter.setPen(self._gridPenS)
-        y = float(top)
-        while y < float(rect.bottom()):
-            gridLines.append(QtCore.QLineF( rect.left(), y, rect.right(), y ))
-            y += self._gridSizeFine
-        painter.drawLines(gridLines)
-
-        # Draw vertical fine lines
-        gridLines = []
-        painter.setPen(self._gridPenS)
-        x = float(left)
-        while x < float(rect.right()):
-            gridLines.append(QtCore.QLineF( x, rect.top(), x, rect.bottom()))
-            x += self._gridSizeFine
-        painter.drawLines(gridLines)
+        # At overview scales the fine grid would be a solid fill of lines.
+        if not self.__overview.isActive():
+            left = int(rect.left()) - (int(rect.left()) % self._gridSizeFine)
+            top = int(rect.top()) - (int(rect.top()) % self._gridSizeFine)
+
+            # Draw horizontal fine lines
+            gridLines = []
+            painter.setPen(self._gridPenS)
+            y = float(top)
+            while y < float(rect.bottom()):
+                gridLines.append(QtCore.QLineF( rect.left(), y, rect.right(), y ))
+                y += self._gridSizeFine
+            painter.drawLines(gridLines)
+
+            # Draw vertical fine lines
+            gridLines = []
+            painter.setPen(self._gridPenS)
+            x = float(left)
+            while x < float(rect.right()):
+                gridLines.append(QtCore.QLineF( x, rect.top(), x, rect.bottom()))
+                x += self._gridSizeFine
+            painter.drawLines(gridLines)
 
         # Draw thick grid
         left = int(rect.left()) - (int(rect.left()) % self._gridSizeCourse)
@@ -946,4 +1694,17 @@ QMouseEvent
             y += self._gridSizeCourse
         painter.drawLines(gridLines)
 
-        return super(GraphView, self).drawBackground(painter, rect)
+        result = super(GraphView, self).drawBackground(painter, rect)
+
+        if self.__diagnostics is not None:
+            self.__diagnostics.addBackgroundTime(time.perf_counter() - start)
+        return result
+
+    def drawForeground(self, painter, rect):
+        if self.__overview.isActive():
+            self.__overview.paint(painter)
+
+        if self.__diagnostics is not None:
+            self.__diagnostics.paintOverlay(painter)
+
+        return super(GraphView, self).drawForeground(painter, rect)
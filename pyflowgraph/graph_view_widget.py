@@ -7,11 +7,11 @@ import sys
 from qtpy import QtGui, QtWidgets, QtCore
 
 from .graph_view import GraphView
+from .minimap import Minimap
 
 class GraphViewWidget(QtWidgets.QWidget):
 
     rigNameChanged = QtCore.Signal()
-    clsSelf = []
 
     def __init__(self, parent=None):
 
@@ -20,7 +20,7 @@ class GraphViewWidget(QtWidgets.QWidget):
         self.openedFile = None
         self.setObjectName('graphViewWidget')
         self.setAttribute(QtCore.Qt.WA_WindowPropagation, True)
-        self.clsSelf.append(self)                               #TODO - this is super dodgy
+        self.__minimap = None
 
     def setGraphView(self, graphView):
 
@@ -42,11 +42,39 @@ class GraphViewWidget(QtWidgets.QWidget):
         frameShortcut = QtWidgets.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key_A), self)
         frameShortcut.activated.connect(self.graphView.frameAllNodes)
 
+        layoutShortcut = QtWidgets.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key_L), self)
+        layoutShortcut.activated.connect(self.graphView.autoLayoutSelectedNodes)
+
+        minimapShortcut = QtWidgets.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key_M), self)
+        minimapShortcut.activated.connect(self.toggleMinimap)
+
 
     def getGraphView(self):
         return self.graphView
 
 
+    def getMinimap(self):
+        return self.__minimap
+
+
+    def setMinimapVisible(self, visible):
+        """Shows or hides the minimap overlaid in the bottom right corner of the graph view.
+
+        Args:
+            visible (Boolean): True to show the minimap.
+
+        """
+
+        if visible and self.__minimap is None:
+            self.__minimap = Minimap(self.graphView)
+        if self.__minimap is not None:
+            self.__minimap.setVisible(visible)
+
+
+    def toggleMinimap(self):
+        self.setMinimapVisible(self.__minimap is None or not self.__minimap.isVisible())
+
+
 '''
 if __name__ == "__main__":
     app = QtWidgets.QApplication(sys.argv)
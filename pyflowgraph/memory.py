@@ -0,0 +1,188 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+
+import ast
+import gc
+import os
+import tracemalloc
+
+from .node import Node
+from .port import BasePort, PortCircle, PortLabel, ItemHolder
+from .connection import Connection
+
+
+# The item classes memory is reported for. Subclasses count as their base, so
+# an InputPort is a BasePort.
+ITEM_CLASSES = (Node, BasePort, PortCircle, PortLabel, ItemHolder, Connection)
+
+_packageDir = os.path.dirname(os.path.abspath(__file__))
+
+
+def liveItems():
+    """Counts the live Python objects of the item classes.
+
+    Returns:
+        dict: Item class name to the number of instances the garbage collector knows of.
+
+    """
+
+    gc.collect()
+    counts = dict.fromkeys((cls.__name__ for cls in ITEM_CLASSES), 0)
+    for obj in gc.get_objects():
+        for cls in ITEM_CLASSES:
+            if isinstance(obj, cls):
+                counts[cls.__name__] += 1
+                break
+    return counts
+
+
+def sceneItemCounts(graph):
+    """Counts the items in the scene of a graph by their class.
+
+    Returns:
+        dict: Class name to item count, with the total under 'total'.
+
+    """
+
+    counts = {}
+    items = graph.scene().items()
+    for item in items:
+        name = type(item).__name__
+        counts[name] = counts.get(name, 0) + 1
+    counts['total'] = len(items)
+    return counts
+
+
+def residentBytes():
+    """Gets the resident set size of the process.
+
+    Returns:
+        int: The size in bytes, or None where /proc is not available.
+
+    """
+
+    try:
+        with open('/proc/self/statm', 'r') as statm:
+            pages = int(statm.read().split()[1])
+    except (IOError, OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE')
+
+
+def findLeaks(graph):
+    """Finds item objects still alive which no longer belong to the graph.
+
+    A node is leaked when it is alive but not one of the graph's nodes, and a
+    port, port part or connection when it is alive but not in the graph's
+    scene. Call it after removeNode, removeConnection or reset; anything it
+    returns is kept alive by a reference the removal missed.
+
+    Returns:
+        list: The leaked objects.
+
+    """
+
+    gc.collect()
+    nodes = set(graph.getNodes().values())
+    sceneItems = set(graph.scene().items())
+
+    wireLayer = graph.getWireLayer()
+    if wireLayer is not None:
+        sceneItems.update(wireLayer.getConnections())
+
+    leaks = []
+    for obj in gc.get_objects():
+        if isinstance(obj, Node):
+            if obj not in nodes:
+                leaks.append(obj)
+        elif isinstance(obj, ITEM_CLASSES):
+            if obj not in sceneItems:
+                leaks.append(obj)
+    return leaks
+
+
+class MemoryTracker(object):
+    """Attributes Python heap allocations to the classes of the package.
+
+    Uses tracemalloc: each allocation is charged to the innermost frame of
+    the call stack which is inside a class of the package, so e.g. the title
+    a node creates is charged to NodeTitle, and a pen cached by the style
+    registry to StyleRegistry. Allocations made outside of any such class are
+    charged to 'other'.
+
+    Only memory allocated through the Python allocator is seen, which
+    includes the Python wrappers of Qt objects but not the C++ objects
+    themselves; residentBytes covers those.
+
+    """
+
+    def __init__(self, frames=30):
+        self.__frames = frames
+        self.__classLines = {}
+        self.__startedTracing = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.__frames)
+            self.__startedTracing = True
+
+    def stop(self):
+        if self.__startedTracing:
+            tracemalloc.stop()
+            self.__startedTracing = False
+
+    def snapshot(self):
+        gc.collect()
+        return tracemalloc.take_snapshot()
+
+    def bytesByClass(self, before, after):
+        """Gets the memory allocated between two snapshots, by class.
+
+        Args:
+            before (Snapshot): Snapshot taken with snapshot.
+            after (Snapshot): A later snapshot.
+
+        Returns:
+            dict: Class name to the bytes allocated and not freed between the snapshots.
+
+        """
+
+        result = {}
+        for stat in after.compare_to(before, 'traceback'):
+            if stat.size_diff == 0:
+                continue
+            name = self.__classOf(stat.traceback)
+            result[name] = result.get(name, 0) + stat.size_diff
+        return result
+
+    def __classOf(self, traceback):
+        # Frames are ordered from the innermost call outwards.
+        for frame in traceback:
+            if not frame.filename.startswith(_packageDir):
+                continue
+            name = self.__classAt(frame.filename, frame.lineno)
+            if name is not None:
+                return name
+        return 'other'
+
+    def __classAt(self, fileName, line):
+        classes = self.__classLines.get(fileName)
+        if classes is None:
+            classes = []
+            try:
+                with open(fileName, 'r') as source:
+                    tree = ast.parse(source.read())
+            except (IOError, OSError, SyntaxError):
+                tree = None
+            if tree is not None:
+                for node in tree.body:
+                    if isinstance(node, ast.ClassDef):
+                        classes.append((node.lineno, node.end_lineno, node.name))
+            self.__classLines[fileName] = classes
+
+        for first, last, name in classes:
+            if first <= line <= last:
+                return name
+        return None
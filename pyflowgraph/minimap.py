@@ -0,0 +1,262 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+
+import math
+
+from qtpy import QtGui, QtWidgets, QtCore
+
+from .graph_bounds import GraphBounds
+from . import style
+
+
+class Minimap(QtWidgets.QWidget):
+    """A thumbnail of the whole graph overlaid in a corner of a GraphView.
+
+    The thumbnail is a small image kept up to date from the graph's node
+    signals: when a node is added, removed or moved only the thumbnail pixels
+    it covered and covers are redrawn, from cached node rects found through a
+    grid of thumbnail cells. The whole image is only redrawn when the graph
+    grows out of the area it shows. Painting the widget blits the image and
+    draws the main view's visible rect, so its cost does not depend on the
+    size of the graph.
+
+    Clicking or dragging in the minimap centers the main view on that point.
+
+    """
+
+    _size = QtCore.QSize(200, 150)
+    _margin = 10
+
+    __cellSize = 16
+    __worldMargin = 0.25
+
+    def __init__(self, graph, parent=None):
+        super(Minimap, self).__init__(parent if parent is not None else graph)
+
+        self.__graph = graph
+
+        self.__nodeRects = {}
+        self.__nodeCells = {}
+        self.__cells = {}
+        self.__worldRect = None
+        self.__viewRect = QtCore.QRectF()
+
+        self.__image = QtGui.QImage(self._size, QtGui.QImage.Format_ARGB32_Premultiplied)
+        self.__fullRedraw = True
+        self.__dirtyRect = None
+        self.__flushPending = False
+
+        self.setFixedSize(self._size)
+        self.setCursor(QtCore.Qt.PointingHandCursor)
+
+        graph.nodeAdded.connect(self.__onNodeChanged)
+        graph.nodeRemoved.connect(self.__onNodeRemoved)
+        graph.nodeGeometryChanged.connect(self.__onNodeChanged)
+        graph.viewRectChanged.connect(self.__onViewRectChanged)
+        graph.graphReset.connect(self.rebuild)
+        graph.installEventFilter(self)
+
+        self.rebuild()
+        self.__reposition()
+
+    # ==========
+    # Placement
+    # ==========
+    def __reposition(self):
+        parent = self.parentWidget()
+        if parent is None:
+            return
+        self.move(parent.width() - self.width() - self._margin, parent.height() - self.height() - self._margin)
+
+    def eventFilter(self, watched, event):
+        if watched is self.__graph and event.type() == QtCore.QEvent.Resize:
+            self.__reposition()
+        return super(Minimap, self).eventFilter(watched, event)
+
+    # ======
+    # Nodes
+    # ======
+    def rebuild(self):
+        """Re-reads all nodes of the graph and redraws the thumbnail."""
+
+        self.__nodeRects.clear()
+        self.__nodeCells.clear()
+        self.__cells.clear()
+        self.__worldRect = None
+        for node in self.__graph.getNodes().values():
+            self.__nodeRects[node] = (GraphBounds.toRectF(GraphBounds.nodeSceneRect(node)), node.getColor().rgba())
+        self.__invalidateAll()
+
+    def __onNodeChanged(self, node):
+        old = self.__nodeRects.get(node)
+        rect = GraphBounds.toRectF(GraphBounds.nodeSceneRect(node))
+        self.__nodeRects[node] = (rect, node.getColor().rgba())
+
+        if self.__fullRedraw:
+            return
+        if not self.__worldRect.contains(rect):
+            self.__invalidateAll()
+            return
+
+        if old is not None:
+            self.__invalidate(self.__toImage(old[0]))
+            self.__unindex(node)
+        self.__index(node)
+        self.__invalidate(self.__toImage(rect))
+
+    def __onNodeRemoved(self, node):
+        old = self.__nodeRects.pop(node, None)
+        if old is None or self.__fullRedraw:
+            return
+        self.__unindex(node)
+        self.__invalidate(self.__toImage(old[0]))
+
+    def __index(self, node):
+        cellSize = self.__cellSize
+        rect = self.__toImage(self.__nodeRects[node][0])
+        cells = []
+        for cx in range(int(math.floor(rect.left() / cellSize)), int(math.floor(rect.right() / cellSize)) + 1):
+            for cy in range(int(math.floor(rect.top() / cellSize)), int(math.floor(rect.bottom() / cellSize)) + 1):
+                nodes = self.__cells.get((cx, cy))
+                if nodes is None:
+                    self.__cells[(cx, cy)] = set([node])
+                else:
+                    nodes.add(node)
+                cells.append((cx, cy))
+        self.__nodeCells[node] = cells
+
+    def __unindex(self, node):
+        for cell in self.__nodeCells.pop(node, ()):
+            nodes = self.__cells.get(cell)
+            if nodes is not None:
+                nodes.discard(node)
+                if not nodes:
+                    del self.__cells[cell]
+
+    # ==========
+    # Thumbnail
+    # ==========
+    def __toImage(self, rect):
+        world = self.__worldRect
+        sx = self._size.width() / world.width()
+        sy = self._size.height() / world.height()
+        return QtCore.QRectF((rect.left() - world.left()) * sx, (rect.top() - world.top()) * sy,
+                             rect.width() * sx, rect.height() * sy)
+
+    def __toScene(self, pos):
+        world = self.__worldRect
+        return QtCore.QPointF(world.left() + pos.x() * world.width() / self._size.width(),
+                              world.top() + pos.y() * world.height() / self._size.height())
+
+    def __invalidateAll(self):
+        self.__fullRedraw = True
+        self.__dirtyRect = None
+        self.__scheduleFlush()
+
+    def __invalidate(self, rect):
+        rect = rect.adjusted(-1, -1, 1, 1)
+        if self.__dirtyRect is None:
+            self.__dirtyRect = rect
+        else:
+            self.__dirtyRect = self.__dirtyRect.united(rect)
+        self.__scheduleFlush()
+
+    def __scheduleFlush(self):
+        if not self.__flushPending:
+            self.__flushPending = True
+            QtCore.QTimer.singleShot(0, self.__flush)
+
+    def __computeWorldRect(self):
+        bounds = self.__graph.getGraphBounds()
+        if bounds is None:
+            bounds = QtCore.QRectF(-500, -500, 1000, 1000)
+
+        # Grow to the aspect ratio of the thumbnail, plus room for the graph to grow into.
+        aspect = float(self._size.width()) / self._size.height()
+        width = max(bounds.width(), bounds.height() * aspect, 1.0) * (1.0 + 2 * self.__worldMargin)
+        height = width / aspect
+        world = QtCore.QRectF(0, 0, width, height)
+        world.moveCenter(bounds.center())
+        return world
+
+    def __flush(self):
+        self.__flushPending = False
+
+        painter = QtGui.QPainter(self.__image)
+        background = style.registry.color('background')
+        painter.setPen(QtCore.Qt.NoPen)
+
+        if self.__fullRedraw:
+            self.__fullRedraw = False
+            self.__worldRect = self.__computeWorldRect()
+            self.__nodeCells.clear()
+            self.__cells.clear()
+            for node in self.__nodeRects:
+                self.__index(node)
+
+            painter.fillRect(self.__image.rect(), background)
+            nodes = self.__nodeRects.keys()
+        elif self.__dirtyRect is not None:
+            dirty = self.__dirtyRect
+            painter.setClipRect(dirty)
+            painter.fillRect(dirty, background)
+
+            cellSize = self.__cellSize
+            nodes = set()
+            for cx in range(int(math.floor(dirty.left() / cellSize)), int(math.floor(dirty.right() / cellSize)) + 1):
+                for cy in range(int(math.floor(dirty.top() / cellSize)), int(math.floor(dirty.bottom() / cellSize)) + 1):
+                    cellNodes = self.__cells.get((cx, cy))
+                    if cellNodes is not None:
+                        nodes.update(cellNodes)
+        else:
+            nodes = ()
+        self.__dirtyRect = None
+
+        for node in nodes:
+            rect, rgba = self.__nodeRects[node]
+            painter.setBrush(style.registry.brush(QtGui.QColor.fromRgba(rgba)))
+            # Keep tiny nodes visible as a pixel.
+            imageRect = self.__toImage(rect)
+            if imageRect.width() < 1.0:
+                imageRect.setWidth(1.0)
+            if imageRect.height() < 1.0:
+                imageRect.setHeight(1.0)
+            painter.drawRect(imageRect)
+        painter.end()
+
+        self.update()
+
+    # =====
+    # View
+    # =====
+    def __onViewRectChanged(self, rect):
+        self.__viewRect = rect
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.drawImage(0, 0, self.__image)
+
+        if self.__worldRect is not None and not self.__viewRect.isNull():
+            painter.setBrush(QtCore.Qt.NoBrush)
+            painter.setPen(style.registry.pen('minimapViewRect', 1.0))
+            painter.drawRect(self.__toImage(self.__viewRect).intersected(QtCore.QRectF(self.rect())))
+
+        painter.setPen(style.registry.pen('minimapViewRect', 1.0))
+        painter.drawRect(QtCore.QRectF(self.rect()).adjusted(0.5, 0.5, -0.5, -0.5))
+
+    def mousePressEvent(self, event):
+        if event.button() == QtCore.Qt.LeftButton and self.__worldRect is not None:
+            self.__graph.panTo(self.__toScene(event.pos()))
+            event.accept()
+        else:
+            super(Minimap, self).mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() & QtCore.Qt.LeftButton and self.__worldRect is not None:
+            self.__graph.panTo(self.__toScene(event.pos()))
+            event.accept()
+        else:
+            super(Minimap, self).mouseMoveEvent(event)
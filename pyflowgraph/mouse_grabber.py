@@ -6,6 +6,7 @@
 from qtpy import QtGui, QtCore
 from .port import PortCircle, PortLabel
 from .connection import Connection
+from .node import Node
 
 from .port import OutputPort, InputPort
 
@@ -47,13 +48,17 @@ class MouseGrabber(PortCircle):
         scenePos = self.mapToScene(event.pos())
 
         for connection in self.getConnections():
-            connection.prepareGeometryChange()
+            connection.invalidateGeometry()
 
         self.setTransform(QtGui.QTransform.fromTranslate(scenePos.x(), scenePos.y()), False)
 
 
         collidingItems = self.collidingItems(QtCore.Qt.IntersectsItemBoundingRect)
         collidingPortCircleItems = list(filter(lambda item: isinstance(item, PortCircle), collidingItems))
+        if len(collidingPortCircleItems) == 0:
+            compactPortCircle = self.compactPortCircleAt(scenePos)
+            if compactPortCircle is not None and compactPortCircle is not self.__otherPortItem:
+                collidingPortCircleItems = [compactPortCircle]
 
 
         #def canConnect(item):
@@ -107,6 +112,15 @@ class MouseGrabber(PortCircle):
             self.setMouseOverPortCircle(None)
         """
 
+    def compactPortCircleAt(self, scenePos):
+        # Compact ports are not scene items, so ask the nodes under the cursor.
+        for item in self.scene().items(scenePos):
+            if isinstance(item, Node) and item.getCompactPorts():
+                portCircle = item.compactPortAt(item.mapFromScene(scenePos))
+                if portCircle is not None:
+                    return portCircle
+        return None
+
     def mouseReleaseEvent(self, event):
 
         # Destroy the temporary connection.
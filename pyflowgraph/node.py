@@ -6,20 +6,25 @@
 import math
 import json
 
-from PySide2.QtCore import QPointF, Qt, QPoint
-from PySide2.QtWidgets import QMenu
-from PySide2 import QtGui, QtWidgets, QtCore
+from qtpy.QtCore import QPointF, Qt, QPoint
+from qtpy.QtWidgets import QMenu
+from qtpy import QtGui, QtWidgets, QtCore
 
 from . import port
 from .port import InputPort, OutputPort, GlandPort
 from .port import BasePort
+from . import diagnostics
+from . import style
+from . import trace
+from .static_text import StaticTextItem
+from . import compact_port
+from .compact_port import CompactPort, paintCompactPorts
 
 class NodeTitle(QtWidgets.QGraphicsWidget):
 
-    __color = QtGui.QColor(25, 25, 25)
-    __font = QtGui.QFont('Decorative', 12)
-    __font.setLetterSpacing(QtGui.QFont.PercentageSpacing, 115)
+    __font = style.registry.font('Decorative', 12, letterSpacing=115)
     __labelBottomSpacing = 12
+    __textMargin = 4
 
     def __init__(self, text, parent=None):
         super(NodeTitle, self).__init__(parent)
@@ -27,27 +32,23 @@ class NodeTitle(QtWidgets.QGraphicsWidget):
         #self.setSizePolicy(QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Fixed))
         self.setSizePolicy(QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Expanding)
 
-        self.__textItem = QtWidgets.QGraphicsTextItem(text, self)
-        self.__textItem.setDefaultTextColor(self.__color)
-        self.__textItem.setFont(self.__font)
-        self.__textItem.setPos(QPointF(0, -2))
-        option = self.__textItem.document().defaultTextOption()
-        option.setWrapMode(QtGui.QTextOption.NoWrap)
-        self.__textItem.document().setDefaultTextOption(option)
-        self.__textItem.adjustSize()
+        self.__textItem = StaticTextItem(text, self.__font, style.registry.color('nodeTitle'), parent=self)
+        self.__textItem.setPos(QPointF(self.__textMargin, self.__textMargin - 2))
 
         self.setPreferredSize(self.textSize())
 
 
 
     def setText(self, text):
-        self.__textItem.setPlainText(text)
-        self.__textItem.adjustSize()
+        self.__textItem.setText(text)
         self.setPreferredSize(self.textSize())
 
+    def applyStyle(self):
+        self.__textItem.setColor(style.registry.color('nodeTitle'))
+
     def textSize(self):
         return QtCore.QSizeF(
-            self.__textItem.textWidth(),
+            self.__textItem.textSize().width() + 2 * self.__textMargin,
             self.__font.pointSizeF() + self.__labelBottomSpacing
             )
 
@@ -87,6 +88,9 @@ class NodeHeader(QtWidgets.QGraphicsWidget):
     def setText(self, text):
         self._titleWidget.setText(text)
 
+    def applyStyle(self):
+        self._titleWidget.applyStyle()
+
 
     # def paint(self, painter, option, widget):
     #     super(NodeHeader, self).paint(painter, option, widget)
@@ -108,7 +112,8 @@ class PortList(QtWidgets.QGraphicsWidget):
 
     def addPort(self, port, alignment, x=0, y=0):
         layout = self.layout()
-        print("addPort : ", x, y)
+        if trace.enabled('node', trace.DEBUG):
+            trace.log('node', trace.DEBUG, 'PortList.addPort', port=port.getName(), x=x, y=y)
         layout.addItem(port.setPos(x, y))
         layout.setAlignment(port, alignment)
         #self.adjustSize()
@@ -126,13 +131,10 @@ class Node(QtWidgets.QGraphicsWidget):
 
     nameChanged = QtCore.Signal(str, str)
 
-    __defaultColor = QtGui.QColor(154, 205, 50, 255)
-    __unselectedColor = QtGui.QColor(25, 25, 25)
-    __selectedColor = QtGui.QColor(255, 0, 0, 255)
-
-    __unselectedPen = QtGui.QPen(__unselectedColor, 1.6)
-    __selectedPen = QtGui.QPen(__selectedColor, 3.6)
-    __linePen = QtGui.QPen(QtGui.QColor(25, 25, 25, 255), 1.25)
+    # Fast layout metrics, matching the margins and spacing of the layouts.
+    __layoutMargin = 5
+    __layoutBottomMargin = 7
+    __layoutSpacing = 7
 
     def __init__(self, graph, name, xSize=80, ySize=20):
         super(Node, self).__init__()
@@ -140,34 +142,58 @@ class Node(QtWidgets.QGraphicsWidget):
         self.height = ySize
         self.__name = name
         self.__graph = graph
-        self.__color = self.__defaultColor
+        self.__inGraph = False
+        # None means the color follows the theme.
+        self.__color = None
+        self.__unselectedColor = None
+        self.__selectedColor = None
+        self.__updatePens()
         self.xSize = xSize
 
+        # The size calls below go through resizeEvent, which reads the ports.
+        self.__ports = []
+        self.__compactPorts = []
+        self.__compactPortsRect = None
+        self.__compactShape = None
+        self.__hoverPortCircle = None
+
         self.setMinimumWidth(xSize)
         self.setMinimumHeight(ySize)
         self.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
         #self.setSizePolicy(QtWidgets.QSizePolicy(QtWidget
 
 
-        layout = QtWidgets.QGraphicsLinearLayout(None, None)
-        layout.setContentsMargins(5, 0, 5, 7)
-        layout.setSpacing(7)
-        layout.setOrientation(QtCore.Qt.Vertical)
-        #self.setLayout(layout)
+        self.__fastLayout = graph.getFastLayout()
+        self.__layoutDirty = False
 
+        if self.__fastLayout:
+            # The header and ports are positioned arithmetically in finalizeLayout,
+            # so none of the layouts below are built.
+            self.__headerItem = NodeTitle(self.__name, self)
+            self.__inputPortsHolder = None
+            self.__ioPortsHolder = None
+            self.__outputPortsHolder = None
+            self.__autoPlacedRows = {'In': 0, 'Out': 0, 'IO': 0}
+            self.__layoutDirty = True
+        else:
+            layout = QtWidgets.QGraphicsLinearLayout(None, None)
+            layout.setContentsMargins(5, 0, 5, 7)
+            layout.setSpacing(7)
+            layout.setOrientation(QtCore.Qt.Vertical)
+            #self.setLayout(layout)
 
-        self.__headerItem = NodeHeader(self.__name, self)
-        layout.addItem(self.__headerItem)
-        layout.setAlignment(self.__headerItem, QtCore.Qt.AlignTop)    #QtCore.Qt.AlignCenter |
 
-        self.__ports = []
-        self.__inputPortsHolder = PortList(self)
-        self.__ioPortsHolder = PortList(self)
-        self.__outputPortsHolder = PortList(self)
+            self.__headerItem = NodeHeader(self.__name, self)
+            layout.addItem(self.__headerItem)
+            layout.setAlignment(self.__headerItem, QtCore.Qt.AlignTop)    #QtCore.Qt.AlignCenter |
 
-        layout.addItem(self.__inputPortsHolder)
-        layout.addItem(self.__ioPortsHolder)
-        layout.addItem(self.__outputPortsHolder)
+            self.__inputPortsHolder = PortList(self)
+            self.__ioPortsHolder = PortList(self)
+            self.__outputPortsHolder = PortList(self)
+
+            layout.addItem(self.__inputPortsHolder)
+            layout.addItem(self.__ioPortsHolder)
+            layout.addItem(self.__outputPortsHolder)
 
         self.setWindowFlags(QtCore.Qt.SubWindow)
         self.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
@@ -191,15 +217,22 @@ class Node(QtWidgets.QGraphicsWidget):
 
     def addGlands(self):
         nodeName = self.getName()
+        compact = self.__graph.getCompactPorts()
         glandName = '.' + nodeName + '.I.' + str(self.nextGlandNum).zfill(2)
-        pi = GlandPort(self, self.__graph, glandName, self.__defaultColor, "Gland", -200, -20)
-        self.addPort(pi, -150, self.nextInGlandPort)
+        if compact:
+            self.addCompactPort(glandName, style.registry.color('nodeDefault'), "Gland", 'Gland', -150, self.nextInGlandPort)
+        else:
+            pi = GlandPort(self, self.__graph, glandName, style.registry.color('nodeDefault'), "Gland", -200, -20)
+            self.addPort(pi, -150, self.nextInGlandPort)
         self.nextGlandNum = self.nextGlandNum+1
         self.nextInGlandPort = self.nextInGlandPort + 20
 
         glandName = '.' + nodeName + '.O.' + str(self.nextGlandNum).zfill(2)
-        po = GlandPort(self, self.__graph, glandName, self.__defaultColor, "Gland", 200, -20)
-        self.addPort(po, self.xSize + 150, self.nextOutGlandPort)
+        if compact:
+            self.addCompactPort(glandName, style.registry.color('nodeDefault'), "Gland", 'Gland', self.xSize + 150, self.nextOutGlandPort)
+        else:
+            po = GlandPort(self, self.__graph, glandName, style.registry.color('nodeDefault'), "Gland", 200, -20)
+            self.addPort(po, self.xSize + 150, self.nextOutGlandPort)
         self.nextGlandNum = self.nextGlandNum + 1
         self.nextOutGlandPort = self.nextOutGlandPort + 20
 
@@ -236,6 +269,8 @@ class Node(QtWidgets.QGraphicsWidget):
             origName = self.__name
             self.__name = name
             self.__headerItem.setText(self.__name)
+            if self.__fastLayout:
+                self.__invalidateLayout()
 
             # Emit an event, so that the graph can update itsself.
             self.nameChanged.emit(origName, name)
@@ -247,28 +282,55 @@ class Node(QtWidgets.QGraphicsWidget):
     # Colors
     # =======
     def getColor(self):
+        if self.__color is None:
+            return style.registry.color('nodeDefault')
         return self.__color
 
     def setColor(self, color):
         self.__color = color
+        self.__updatePens()
         self.update()
 
 
     def getUnselectedColor(self):
+        if self.__unselectedColor is None:
+            return style.registry.color('nodeUnselected')
         return self.__unselectedColor
 
     def setUnselectedColor(self, color):
         self.__unselectedColor = color
-        self.__unselectedPen.setColor(self.__unselectedColor)
+        self.__updatePens()
         self.update()
 
 
     def getSelectedColor(self):
+        if self.__selectedColor is None:
+            return style.registry.color('nodeSelected')
         return self.__selectedColor
 
     def setSelectedColor(self, color):
         self.__selectedColor = color
-        self.__selectedPen.setColor(self.__selectedColor)
+        self.__updatePens()
+        self.update()
+
+
+    def __updatePens(self):
+        # Pens and brushes are shared flyweights, so a color change swaps them rather than mutating them.
+        self.__unselectedPen = style.registry.pen(self.getUnselectedColor(), 1.6)
+        self.__selectedPen = style.registry.pen(self.getSelectedColor(), 3.6)
+        color = self.getColor()
+        self.__brush = style.registry.brush(color)
+        self.__titleBrush = style.registry.brush(color.darker(125))
+
+
+    def applyStyle(self):
+        """Restyles the node, its header and its ports from the style registry."""
+
+        self.__updatePens()
+        self.__headerItem.applyStyle()
+        for port in self.__ports:
+            if isinstance(port, BasePort):
+                port.applyStyle()
         self.update()
 
     # =============
@@ -278,6 +340,15 @@ class Node(QtWidgets.QGraphicsWidget):
         return self.__graph
 
 
+    def isInGraph(self):
+        return self.__inGraph
+
+
+    def _setInGraph(self, inGraph):
+        # Called by the graph when the node is added or removed.
+        self.__inGraph = inGraph
+
+
     def getHeader(self):
         return self.__headerItem
 
@@ -314,21 +385,45 @@ class Node(QtWidgets.QGraphicsWidget):
         super(Node, self).moveBy(x, y)
 
 
+    def itemChange(self, change, value):
+        if change == QtWidgets.QGraphicsItem.ItemPositionHasChanged or \
+                change == QtWidgets.QGraphicsItem.ItemTransformHasChanged:
+            self.__graph._onNodeGeometryChanged(self)
+        return super(Node, self).itemChange(change, value)
+
+
+    def resizeEvent(self, event):
+        super(Node, self).resizeEvent(event)
+        self.__compactShape = None
+        self.__graph._onNodeGeometryChanged(self)
+
+
     # Prior to moving the node, we need to tell the connections to prepare for a geometry change.
     # This method must be called preior to moving a node.
     def prepareConnectionGeometryChange(self):
         for port in self.__ports:
             if port.inCircle():
                 for connection in port.inCircle().getConnections():
-                    connection.prepareGeometryChange()
+                    connection.invalidateGeometry()
             if port.outCircle():
                 for connection in port.outCircle().getConnections():
-                    connection.prepareGeometryChange()
+                    connection.invalidateGeometry()
 
     #########################
     ## Ports
 
-    def addPort(self, port, x, y):
+    def addPort(self, port, x=None, y=None):
+        if self.__fastLayout:
+            if x is None or y is None:
+                x, y = self.__autoPlacePort(port.getName(), port.connectionPointType())
+            port.setPos(x, y)
+            self.__ports.append(port)
+            self.__invalidateLayout()
+            return port
+
+        if x is None or y is None:
+            # The port lists place the ports; a position only matters to the fast layout.
+            x, y = 0, 0
         if isinstance(port, InputPort):
             self.__inputPortsHolder.addPort(port, QtCore.Qt.AlignHCenter | QtCore.Qt.AlignVCenter, x, y)
         elif isinstance(port, OutputPort):
@@ -342,11 +437,180 @@ class Node(QtWidgets.QGraphicsWidget):
         return port
 
 
+    # ============
+    # Fast Layout
+    # ============
+    def hasFastLayout(self):
+        return self.__fastLayout
+
+
+    def __headerHeight(self):
+        return self.__headerItem.textSize().height()
+
+
+    def __autoPlacePort(self, name, connectionPointType):
+        # Ports given without a position are stacked in columns below the header:
+        # inputs on the left, outputs on the right and io ports in between.
+        column = connectionPointType if connectionPointType in ('In', 'Out') else 'IO'
+        row = self.__autoPlacedRows[column]
+        self.__autoPlacedRows[column] = row + 1
+
+        metrics = compact_port.labelMetrics()
+        rowPitch = max(compact_port.CIRCLE_DIAMETER, metrics.height()) + self.__layoutSpacing
+        y = self.__headerHeight() + self.__layoutSpacing + row * rowPitch
+
+        if column == 'In':
+            x = 0
+        elif column == 'Out':
+            portWidth = compact_port.OUT_LABEL_MARGIN + compact_port.labelWidth(name) + compact_port.CIRCLE_DIAMETER
+            x = self.xSize - portWidth
+        else:
+            x = self.xSize * 0.5 - compact_port.CIRCLE_DIAMETER
+        return x, y
+
+
+    def __invalidateLayout(self):
+        self.__layoutDirty = True
+        # Nodes already in the graph are laid out right away; new nodes wait for the graph.
+        if self.__inGraph:
+            self.finalizeLayout()
+
+
+    def finalizeLayout(self):
+        """Applies the fast layout geometry to the node.
+
+        Sizes are computed from the port counts and cached text metrics and applied
+        with a single resize, without going through Qt's layout engine. This is a
+        no-op for nodes which do not use the fast layout or are already up to date.
+
+        """
+
+        if not self.__fastLayout or not self.__layoutDirty:
+            return
+        self.__layoutDirty = False
+
+        titleSize = self.__headerItem.textSize()
+        self.__headerItem.setGeometry(QtCore.QRectF(QtCore.QPointF(self.__layoutMargin, 0), titleSize))
+
+        width = max(self.xSize, titleSize.width() + 2 * self.__layoutMargin)
+
+        rows = max(self.__autoPlacedRows.values())
+        portsHeight = 0
+        if rows > 0:
+            metrics = compact_port.labelMetrics()
+            rowPitch = max(compact_port.CIRCLE_DIAMETER, metrics.height()) + self.__layoutSpacing
+            portsHeight = self.__layoutSpacing + rows * rowPitch
+        height = max(self.height, titleSize.height() + portsHeight + self.__layoutBottomMargin)
+
+        self.setMinimumSize(width, height)
+        self.resize(width, height)
+
+
+    def addCompactPort(self, name, color, dataType, connectionPointType, x=None, y=None):
+        """Adds a port which is painted and hit tested by the node itself.
+
+        Compact ports avoid the per port widget tree of BasePort and are meant for
+        very large graphs. They are returned by getPort and getPorts like any other port.
+
+        Args:
+            name (str): Name of the port.
+            color (QColor): Color of the port circle.
+            dataType (str): Data type of the port.
+            connectionPointType (str): 'In', 'Out' or 'Gland'.
+            x (float): X position of the port in node coordinates. Placed automatically
+                with the fast layout when x or y is None.
+            y (float): Y position of the port in node coordinates.
+
+        Returns:
+            CompactPort: The new port.
+
+        """
+
+        if x is None or y is None:
+            if self.__fastLayout:
+                x, y = self.__autoPlacePort(name, connectionPointType)
+            else:
+                x, y = 0, 0
+
+        port = CompactPort(self, self.__graph, name, color, dataType, connectionPointType, x, y)
+
+        if not self.__compactPorts:
+            self.setAcceptHoverEvents(True)
+
+        self.prepareGeometryChange()
+        portRect = port.boundingRect()
+        if self.__compactPortsRect is None:
+            self.__compactPortsRect = portRect
+        else:
+            self.__compactPortsRect = self.__compactPortsRect.united(portRect)
+        self.__compactShape = None
+
+        self.__compactPorts.append(port)
+        self.__ports.append(port)
+        if self.__fastLayout:
+            self.__invalidateLayout()
+        self.update()
+        return port
+
+
+    def getCompactPorts(self):
+        return self.__compactPorts
+
+
+    def compactPortAt(self, pos):
+        """Hit tests the compact ports at a position in node coordinates.
+
+        Returns:
+            CompactPortCircle: The circle of the port under pos, or None.
+
+        """
+
+        x = pos.x()
+        y = pos.y()
+        for port in self.__compactPorts:
+            circle = port.hitTest(x, y)
+            if circle is not None:
+                return circle
+        return None
+
+
+    def __setHoverPortCircle(self, circle):
+        if circle is self.__hoverPortCircle:
+            return
+        if self.__hoverPortCircle is not None:
+            self.__hoverPortCircle.unhighlight()
+            self.__hoverPortCircle.getPort().unhighlight()
+        self.__hoverPortCircle = circle
+        if circle is not None:
+            circle.highlight()
+            circle.getPort().highlight()
+
+
+    def boundingRect(self):
+        rect = super(Node, self).boundingRect()
+        if self.__compactPortsRect is not None:
+            rect = rect.united(self.__compactPortsRect)
+        return rect
+
+
+    def shape(self):
+        if self.__compactPortsRect is None:
+            return super(Node, self).shape()
+        if self.__compactShape is None:
+            path = QtGui.QPainterPath()
+            path.addRect(self.rect())
+            for port in self.__compactPorts:
+                path.addRect(port.boundingRect())
+            self.__compactShape = path
+        return self.__compactShape
+
+
     def getPort(self, name):
         for port in self.__ports:
-            print("getPort : name : port ", name, port.getName())
             if port.getName() == name:
                 return port
+        if trace.enabled('node', trace.DEBUG):
+            trace.log('node', trace.DEBUG, 'getPort: no such port', node=self.__name, port=name)
         return None
 
 
@@ -355,10 +619,19 @@ class Node(QtWidgets.QGraphicsWidget):
 
 
     def paint(self, painter, option, widget):
+        cachePolicy = self.__graph.getCachePolicy()
+        if cachePolicy is not None:
+            cachePolicy.notePaint(self)
+        if diagnostics.collector is not None:
+            diagnostics.collector.count('Node')
+            if self.__compactPorts:
+                diagnostics.collector.count('PortCircle', len(self.__compactPorts))
+                diagnostics.collector.count('PortLabel', len(self.__compactPorts))
+
         rect = self.windowFrameRect()
-        painter.setBrush(self.__color)
+        painter.setBrush(self.__brush)
 
-        painter.setPen(QtGui.QPen(QtGui.QColor(0, 0, 0, 0), 0))
+        painter.setPen(QtCore.Qt.NoPen)
 
         roundingY = 10
         roundingX = 10
@@ -366,14 +639,17 @@ class Node(QtWidgets.QGraphicsWidget):
         painter.drawRoundedRect(rect, roundingX, roundingY)
 
         # Title BG
-        titleHeight = self.__headerItem.size().height() - 3
+        if self.__fastLayout:
+            titleHeight = self.__headerHeight()
+        else:
+            titleHeight = self.__headerItem.size().height() - 3
 
-        painter.setBrush(self.__color.darker(125))
+        painter.setBrush(self.__titleBrush)
         roundingY = rect.width() * roundingX / titleHeight
         painter.drawRoundedRect(0, 0, rect.width(), titleHeight, roundingX, roundingY, QtCore.Qt.AbsoluteSize)
         painter.drawRect(0, titleHeight * 0.5 + 2, rect.width(), titleHeight * 0.5)
 
-        painter.setBrush(QtGui.QColor(0, 0, 0, 0))
+        painter.setBrush(QtCore.Qt.NoBrush)
         if self.__selected:
             painter.setPen(self.__selectedPen)
         else:
@@ -384,6 +660,9 @@ class Node(QtWidgets.QGraphicsWidget):
 
         painter.drawRoundedRect(rect, roundingX, roundingY, QtCore.Qt.AbsoluteSize)
 
+        if self.__compactPorts:
+            paintCompactPorts(painter, self.__compactPorts)
+
     #########################
     ## Context Menu
     def contextMenuEvent2(self, event):
@@ -408,7 +687,26 @@ class Node(QtWidgets.QGraphicsWidget):
     #########################
     ## Events
 
+    def hoverMoveEvent(self, event):
+        if self.__compactPorts:
+            self.__setHoverPortCircle(self.compactPortAt(event.pos()))
+        super(Node, self).hoverMoveEvent(event)
+
+
+    def hoverLeaveEvent(self, event):
+        if self.__compactPorts:
+            self.__setHoverPortCircle(None)
+        super(Node, self).hoverLeaveEvent(event)
+
+
     def mousePressEvent(self, event):
+        if event.button() == QtCore.Qt.LeftButton and self.__compactPorts:
+            circle = self.compactPortAt(event.pos())
+            if circle is not None:
+                self.__setHoverPortCircle(None)
+                circle.startConnection(self.mapToScene(event.pos()))
+                return
+
         if event.button() == QtCore.Qt.LeftButton:
 
             modifiers = event.modifiers()
@@ -457,6 +755,8 @@ class Node(QtWidgets.QGraphicsWidget):
                 newPos = newPos + newPosOffset
 
             delta = newPos - self._lastDragPoint
+            if not self._nodesMoved:
+                self.__graph.beginMoveSelectedNodes()
             self.__graph.moveSelectedNodes(delta)
             self._lastDragPoint = newPos
             self._nodesMoved = True
@@ -0,0 +1,118 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+
+from qtpy import QtGui, QtCore
+
+from . import style
+
+
+LOD_DETAIL = 0
+LOD_OVERVIEW = 1
+
+
+class OverviewRenderer(object):
+    """Draws the whole graph as rectangles and lines at extreme zoom out.
+
+    While the overview is active the detailed node and connection items are
+    hidden, and the view draws the graph from cached node rects, batched per
+    color, and wire segments with one drawRects call per color and a single
+    drawLines call. Node and wire geometry is updated incrementally as the graph
+    changes; while inactive nothing is tracked and the cache is rebuilt on the
+    next activation.
+
+    """
+
+    def __init__(self, graph):
+        self.__graph = graph
+        self.__active = False
+
+        self.__nodeRects = {}
+        self.__wireLines = {}
+        self.__rectBatches = None
+        self.__lines = None
+
+    def isActive(self):
+        return self.__active
+
+    def clear(self):
+        self.__active = False
+        self.__nodeRects.clear()
+        self.__wireLines.clear()
+        self.__rectBatches = None
+        self.__lines = None
+
+    # ===========
+    # Activation
+    # ===========
+    def activate(self, nodes, connections):
+        self.__active = True
+        self.__nodeRects.clear()
+        self.__wireLines.clear()
+        for node in nodes:
+            self.updateNode(node)
+        for connection in connections:
+            self.updateConnection(connection)
+
+    def deactivate(self):
+        self.__active = False
+        self.__nodeRects.clear()
+        self.__wireLines.clear()
+        self.__rectBatches = None
+        self.__lines = None
+
+    # ========
+    # Updates
+    # ========
+    def updateNode(self, node):
+        rect = node.mapRectToScene(node.rect())
+        self.__nodeRects[node] = (rect, node.getColor().rgba())
+        self.__rectBatches = None
+
+    def removeNode(self, node):
+        if self.__nodeRects.pop(node, None) is not None:
+            self.__rectBatches = None
+
+    def updateConnection(self, connection):
+        points = connection.scenePolyline()
+        self.__wireLines[connection] = [QtCore.QLineF(a, b) for a, b in zip(points[:-1], points[1:])]
+        self.__lines = None
+
+    def removeConnection(self, connection):
+        if self.__wireLines.pop(connection, None) is not None:
+            self.__lines = None
+
+    # =========
+    # Painting
+    # =========
+    def paint(self, painter):
+        if self.__rectBatches is None:
+            batches = {}
+            for nodeRect, rgba in self.__nodeRects.values():
+                batch = batches.get(rgba)
+                if batch is None:
+                    batches[rgba] = [nodeRect]
+                else:
+                    batch.append(nodeRect)
+            self.__rectBatches = batches
+
+        if self.__lines is None:
+            lines = []
+            for wireLines in self.__wireLines.values():
+                lines.extend(wireLines)
+            self.__lines = lines
+
+        painter.save()
+
+        if self.__lines:
+            # A cosmetic pen keeps the wires one pixel wide at any zoom.
+            painter.setPen(style.registry.pen('nodeUnselected', 0))
+            painter.drawLines(self.__lines)
+
+        painter.setPen(QtCore.Qt.NoPen)
+        for rgba, rects in self.__rectBatches.items():
+            painter.setBrush(style.registry.brush(QtGui.QColor.fromRgba(rgba)))
+            painter.drawRects(rects)
+
+        painter.restore()
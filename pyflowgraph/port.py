@@ -5,31 +5,28 @@
 
 import json
 
-from PySide2.QtCore import QPointF, QPoint, Qt
-from PySide2.QtWidgets import QMenu
-from qtpy import QtGui, QtWidgets, QtCore
+from qtpy.QtCore import QPointF, QPoint, Qt
+from qtpy.QtWidgets import QMenu
+from qtpy import QtWidgets, QtCore
+
+from . import diagnostics
+from . import style
+from . import trace
+from .static_text import StaticTextItem
 
 
 class PortLabel(QtWidgets.QGraphicsWidget):
-    __font = QtGui.QFont('Decorative', 12)
-    __smallFont = QtGui.QFont('Decorative', 8)
-    __fontMetrics = QtGui.QFontMetrics(__font)
+    __font = style.registry.font('Decorative', 12)
+    __smallFont = style.registry.font('Decorative', 8)
 
     def __init__(self, port, text, hOffset, color, highlightColor):
         super(PortLabel, self).__init__(port)
         self.__port = port
         self.__text = text
-        self.__textItem = QtWidgets.QGraphicsTextItem(text, self)
         self._labelColor = color
         self.__highlightColor = highlightColor
-        self.__textItem.setDefaultTextColor(self._labelColor)
-        self.__textItem.setFont(self.__font)
-        self.__textItem.transform().translate(0, self.__font.pointSizeF() * -0.5)
-        option = self.__textItem.document().defaultTextOption()
-        option.setWrapMode(QtGui.QTextOption.NoWrap)
-        self.__textItem.document().setDefaultTextOption(option)
-        self.__textItem.document().setDocumentMargin(0)
-        self.__textItem.adjustSize()
+        self.__textItem = StaticTextItem(text, self.__font, self._labelColor, self.__highlightColor, self,
+                                         paintKind='PortLabel')
 
         self.setPreferredSize(self.textSize())
         self.setSizePolicy(QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Fixed))
@@ -43,20 +40,29 @@ class PortLabel(QtWidgets.QGraphicsWidget):
         return self.__text
 
 
+    def setText(self, text):
+        self.__text = text
+        self.__textItem.setText(text)
+        self.setPreferredSize(self.textSize())
+
+
     def setHOffset(self, hOffset):
         self.transform().translate(hOffset, 0)
 
 
     def setColor(self, color):
-        self.__textItem.setDefaultTextColor(color)
-        self.update()
+        self.__textItem.setColor(color)
+
+
+    def applyStyle(self):
+        self._labelColor = style.registry.color('portLabel')
+        self.__highlightColor = style.registry.color('portLabelHighlight')
+        self.__textItem.setColor(self._labelColor)
+        self.__textItem.setHighlightColor(self.__highlightColor)
 
 
     def textSize(self):
-        return QtCore.QSizeF(
-            self.__fontMetrics.width(self.__text),
-            self.__fontMetrics.height()
-            )
+        return self.__textItem.textSize()
 
 
     def getPort(self):
@@ -64,11 +70,11 @@ class PortLabel(QtWidgets.QGraphicsWidget):
 
 
     def highlight(self):
-        self.setColor(self.__highlightColor)
+        self.__textItem.highlight()
 
 
     def unhighlight(self):
-        self.setColor(self._labelColor)
+        self.__textItem.unhighlight()
 
 
     def hoverEnterEvent(self, event):
@@ -82,7 +88,7 @@ class PortLabel(QtWidgets.QGraphicsWidget):
 
 
     def mousePressEvent(self, event):
-        print("port press")
+        trace.log('port', trace.DEBUG, 'PortLabel press', port=self.__text)
         self.__mousDownPos = self.mapToScene(event.pos())
 
 
@@ -106,6 +112,15 @@ class PortLabel(QtWidgets.QGraphicsWidget):
     #     painter.drawRect(self.windowFrameRect())
 
 
+class PortCircleShape(QtWidgets.QGraphicsRectItem):
+    # The square drawn for a PortCircle; only overridden to count its paints.
+
+    def paint(self, painter, option, widget):
+        if diagnostics.collector is not None:
+            diagnostics.collector.count('PortCircle')
+        super(PortCircleShape, self).paint(painter, option, widget)
+
+
 class PortCircle(QtWidgets.QGraphicsWidget):
 
     __radius = 6                         #was 4.5
@@ -127,12 +142,8 @@ class PortCircle(QtWidgets.QGraphicsWidget):
 
         self.transform().translate(self.__radius * hOffset, 0)
 
-        self.__defaultPen = QtGui.QPen(QtGui.QColor(25, 25, 25), 1.0)
-        self.__hoverPen = QtGui.QPen(QtGui.QColor(255, 255, 100), 1.5)
-        self.__movePen = QtGui.QPen(QtGui.QColor(255, 0, 0), 1.5)
-
-        self._ellipseItem = QtWidgets.QGraphicsRectItem(self)
-        self._ellipseItem.setPen(self.__defaultPen)
+        self._ellipseItem = PortCircleShape(self)
+        self.applyStyle()
         self._ellipseItem.setPos(size.width()/2 - self.__radius/4 + 1, size.height()/2)
         self._ellipseItem.setRect(
             -self.__radius,
@@ -161,9 +172,18 @@ class PortCircle(QtWidgets.QGraphicsWidget):
         return self._ellipseItem.mapToScene(0, 0)
 
 
+    def applyStyle(self):
+        """Fetches the pens of the port circle from the style registry."""
+
+        self.__defaultPen = style.registry.pen('portCircle', 1.0)
+        self.__hoverPen = style.registry.pen('portCircleHover', 1.5)
+        self.__movePen = style.registry.pen('portCircleMove', 1.5)
+        self._ellipseItem.setPen(self.__defaultPen)
+
+
     def setColor(self, color):
         self._color = color
-        self._ellipseItem.setBrush(QtGui.QBrush(self._color))
+        self._ellipseItem.setBrush(style.registry.brush(self._color))
 
 
     def setDefaultPen(self, pen):
@@ -176,7 +196,7 @@ class PortCircle(QtWidgets.QGraphicsWidget):
 
 
     def highlight(self):
-        self._ellipseItem.setBrush(QtGui.QBrush(self._color.lighter()))
+        self._ellipseItem.setBrush(style.registry.brush(self._color.lighter()))
         # make the port bigger to highlight it can accept the connection.
         self._ellipseItem.setRect(
             -self.__radius * 1.3,
@@ -186,7 +206,7 @@ class PortCircle(QtWidgets.QGraphicsWidget):
             )
 
     def highlight2(self):
-        self._ellipseItem.setBrush(QtGui.QBrush(QtGui.QColor(255,0,0)))
+        self._ellipseItem.setBrush(style.registry.brush('portCircleMove'))
         # make the port bigger to highlight it can accept the connection.
         self._ellipseItem.setRect(
             -self.__radius * 1.3,
@@ -195,7 +215,7 @@ class PortCircle(QtWidgets.QGraphicsWidget):
             self.__diameter * 1.3,
             )
     def unhighlight(self):
-        self._ellipseItem.setBrush(QtGui.QBrush(self._color))
+        self._ellipseItem.setBrush(style.registry.brush(self._color))
         self._ellipseItem.setRect(
             -self.__radius,
             -self.__radius,
@@ -314,11 +334,11 @@ class PortCircle(QtWidgets.QGraphicsWidget):
         if action == listConn:
             print("===Connections===")
             for c in self.__connections:
-                nodeFrom = c._Connection__srcPortCircle._PortCircle__port._node.getName()
-                nodeTo = c._Connection__dstPortCircle._PortCircle__port._node.getName()
-                termFrom = c._Connection__srcPortCircle._PortCircle__port._name
-                termTo = c._Connection__dstPortCircle._PortCircle__port._name
-                if c._Connection__srcPortCircle is self or c._Connection__dstPortCircle is self:
+                nodeFrom = c.getSrcPort().getNode().getName()
+                nodeTo = c.getDstPort().getNode().getName()
+                termFrom = c.getSrcPort().getName()
+                termTo = c.getDstPort().getName()
+                if c.getSrcPortCircle() is self or c.getDstPortCircle() is self:
                     print(nodeFrom, termFrom, nodeTo, termTo)
             print("=================")
 
@@ -396,12 +416,12 @@ class ItemHolder(QtWidgets.QGraphicsWidget):
 
 class BasePort(QtWidgets.QGraphicsWidget):
 
-    _labelColor = QtGui.QColor(25, 25, 25)
-    _labelHighlightColor = QtGui.QColor(225, 225, 225, 255)
-
     def __init__(self, parent, graph, name, color, dataType, connectionPointType, x=0, y=0):
         super(BasePort, self).__init__(parent)
 
+        self._labelColor = style.registry.color('portLabel')
+        self._labelHighlightColor = style.registry.color('portLabelHighlight')
+
         self._node = parent
         self._graph = graph
         self._name = name
@@ -465,6 +485,15 @@ class BasePort(QtWidgets.QGraphicsWidget):
         self._color = color
 
 
+    def applyStyle(self):
+        if self._inCircle is not None:
+            self._inCircle.applyStyle()
+        if self._outCircle is not None:
+            self._outCircle.applyStyle()
+        if self._labelItem is not None:
+            self._labelItem.applyStyle()
+
+
     def inCircle(self):
         return self._inCircle
 
@@ -0,0 +1,236 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+
+from qtpy import QtGui, QtWidgets, QtCore
+
+from .connection import Connection
+from .static_text import StaticTextItem
+from .wire_layer import WireLayer
+
+
+STAGE_NODES = 0
+STAGE_WIRES = 1
+STAGE_LABELS = 2
+
+
+class ProgressiveRenderer(object):
+    """Renders the visible part of a graph over several event loop ticks.
+
+    A frame is rendered into an offscreen image: the background first, then the
+    visible items in three stages, nodes, wires and labels. Each tick paints
+    items until the time budget is used up and then returns to the event loop,
+    so input is handled between slices. The view shows the frame in progress
+    once its nodes are painted, and until then the last frame, moved to match
+    the current view transform.
+
+    A pan or zoom cancels the frame in progress and starts a new one. Changes of
+    the scene content are rendered once the current frame is complete.
+
+    """
+
+    def __init__(self, graph, budgetMs=8):
+        self.__graph = graph
+        self.__budgetMs = budgetMs
+
+        self.__timer = QtCore.QTimer()
+        self.__timer.setInterval(0)
+        self.__timer.timeout.connect(self.__step)
+
+        self.__scene = None
+        self.__key = None
+        self.__dirty = False
+
+        self.__image = None
+        self.__transform = None
+        self.__stages = None
+        self.__stage = STAGE_NODES
+        self.__index = 0
+        self.__complete = False
+
+        self.__staleImage = None
+        self.__staleTransform = None
+
+    def getBudget(self):
+        return self.__budgetMs
+
+    def setBudget(self, budgetMs):
+        """Sets the time spent painting per event loop tick.
+
+        Args:
+            budgetMs (int): Milliseconds per tick.
+
+        """
+
+        self.__budgetMs = budgetMs
+
+    def isComplete(self):
+        return self.__complete
+
+    def setScene(self, scene):
+        if self.__scene is not None:
+            self.__scene.changed.disconnect(self.__onSceneChanged)
+        self.__scene = scene
+        if scene is not None:
+            scene.changed.connect(self.__onSceneChanged)
+        self.cancel()
+
+    def cancel(self):
+        """Drops the frame in progress; the next paint starts a new frame."""
+
+        self.__timer.stop()
+        if self.__image is not None and (self.__stage > STAGE_NODES or self.__complete):
+            self.__staleImage = self.__image
+            self.__staleTransform = self.__transform
+        self.__key = None
+        self.__image = None
+        self.__stages = None
+        self.__stage = STAGE_NODES
+        self.__complete = False
+
+    def clear(self):
+        self.cancel()
+        self.__staleImage = None
+        self.__staleTransform = None
+        if self.__scene is not None:
+            self.__scene.changed.disconnect(self.__onSceneChanged)
+            self.__scene = None
+
+    def __onSceneChanged(self, regions):
+        if self.__complete:
+            self.__key = None
+            self.__graph.viewport().update()
+        else:
+            self.__dirty = True
+
+    # =======
+    # Frames
+    # =======
+    def __viewKey(self):
+        graph = self.__graph
+        transform = graph.viewportTransform()
+        size = graph.viewport().size()
+        return (
+            transform.m11(), transform.m12(), transform.m21(), transform.m22(),
+            transform.dx(), transform.dy(), size.width(), size.height()
+            )
+
+    def __begin(self, key):
+        self.cancel()
+
+        graph = self.__graph
+        viewport = graph.viewport()
+        ratio = viewport.devicePixelRatioF()
+        size = viewport.size()
+
+        image = QtGui.QImage(int(size.width() * ratio), int(size.height() * ratio),
+                             QtGui.QImage.Format_ARGB32_Premultiplied)
+        image.setDevicePixelRatio(ratio)
+
+        transform = graph.viewportTransform()
+        sceneRect = graph.mapToScene(viewport.rect()).boundingRect()
+
+        painter = QtGui.QPainter(image)
+        painter.setRenderHints(graph.renderHints())
+        painter.setWorldTransform(transform)
+        graph.drawBackground(painter, sceneRect)
+        painter.end()
+
+        nodes = []
+        wires = []
+        labels = []
+        items = graph.scene().items(sceneRect, QtCore.Qt.IntersectsItemBoundingRect, QtCore.Qt.AscendingOrder)
+        for item in items:
+            if not item.isVisible() or item.flags() & QtWidgets.QGraphicsItem.ItemHasNoContents:
+                continue
+            if isinstance(item, (Connection, WireLayer)):
+                wires.append(item)
+            elif isinstance(item, StaticTextItem):
+                labels.append(item)
+            else:
+                nodes.append(item)
+
+        self.__key = key
+        self.__dirty = False
+        self.__image = image
+        self.__transform = transform
+        self.__stages = (nodes, wires, labels)
+        self.__stage = STAGE_NODES
+        self.__index = 0
+        self.__complete = False
+        self.__timer.start()
+
+    def __paintItem(self, painter, item):
+        painter.setWorldTransform(item.sceneTransform() * self.__transform)
+        painter.setOpacity(item.effectiveOpacity())
+
+        option = QtWidgets.QStyleOptionGraphicsItem()
+        option.exposedRect = item.boundingRect()
+        option.rect = option.exposedRect.toAlignedRect()
+        if item.isSelected():
+            option.state |= QtWidgets.QStyle.State_Selected
+        if item.isEnabled():
+            option.state |= QtWidgets.QStyle.State_Enabled
+
+        painter.save()
+        item.paint(painter, option, self.__graph.viewport())
+        painter.restore()
+
+    def __step(self):
+        if self.__stages is None:
+            self.__timer.stop()
+            return
+
+        timer = QtCore.QElapsedTimer()
+        timer.start()
+
+        painter = QtGui.QPainter(self.__image)
+        painter.setRenderHints(self.__graph.renderHints())
+        while self.__stage <= STAGE_LABELS:
+            items = self.__stages[self.__stage]
+            while self.__index < len(items):
+                self.__paintItem(painter, items[self.__index])
+                self.__index += 1
+                if timer.elapsed() >= self.__budgetMs:
+                    break
+            if self.__index < len(items):
+                break
+            self.__stage += 1
+            self.__index = 0
+        painter.end()
+
+        if self.__stage > STAGE_LABELS:
+            self.__timer.stop()
+            self.__stages = None
+            self.__complete = True
+            if self.__dirty:
+                self.__key = None
+        self.__graph.viewport().update()
+
+    # =========
+    # Painting
+    # =========
+    def paint(self, painter):
+        """Paints the current frame onto the viewport, starting a new frame if the view moved.
+
+        Args:
+            painter (QPainter): Painter on the viewport.
+
+        """
+
+        key = self.__viewKey()
+        if key != self.__key:
+            self.__begin(key)
+
+        if self.__stage > STAGE_NODES or self.__complete:
+            painter.drawImage(0, 0, self.__image)
+            return
+
+        painter.fillRect(self.__graph.viewport().rect(), self.__graph._backgroundColor)
+        if self.__staleImage is not None:
+            (inverted, invertible) = self.__staleTransform.inverted()
+            if invertible:
+                painter.setWorldTransform(inverted * self.__graph.viewportTransform())
+                painter.drawImage(0, 0, self.__staleImage)
+                painter.resetTransform()
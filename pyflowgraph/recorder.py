@@ -0,0 +1,183 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+
+import json
+import time
+
+from qtpy import QtCore
+
+from .node import Node
+from .port import PortCircle
+from .connection import Connection
+
+
+RECORDING_VERSION = 1
+
+MOUSE_EVENTS = {
+    QtCore.QEvent.MouseButtonPress: 'press',
+    QtCore.QEvent.MouseButtonRelease: 'release',
+    QtCore.QEvent.MouseButtonDblClick: 'doubleClick',
+    QtCore.QEvent.MouseMove: 'move',
+    }
+
+# A gesture runs from a press to the release of all buttons, and is named by
+# what the press hit: a node ('drag'), a port ('wire'), a connection
+# ('connection'), or empty space ('selection', or 'pan' with the middle button).
+GESTURES = ('drag', 'wire', 'connection', 'selection', 'pan', 'hover', 'zoom', 'key', 'other')
+
+
+def enumValue(value):
+    """Gets the int of a Qt enum or flag, which PySide6 enums do not convert to with int()."""
+
+    return int(getattr(value, 'value', value))
+
+
+class InteractionRecorder(QtCore.QObject):
+    """Records the mouse, wheel and key events of a GraphView with timestamps.
+
+    Events are recorded in viewport coordinates, with the view's scale, scene
+    center and viewport size at the start of the recording, so a replay can
+    restore the same view of the same graph and send the events to the same
+    items. Each mouse event is tagged with the gesture it belongs to, which
+    lets a replay report latencies per kind of interaction.
+
+    """
+
+    def __init__(self, graph):
+        super(InteractionRecorder, self).__init__()
+        self.__graph = graph
+        self.__recording = False
+        self.__start = 0.0
+        self.__header = None
+        self.__events = []
+        self.__gesture = 'hover'
+        self.__overriddenKey = None
+
+    def isRecording(self):
+        return self.__recording
+
+    def start(self):
+        """Starts a new recording, dropping the events of the previous one."""
+
+        if self.__recording:
+            return
+
+        graph = self.__graph
+        viewport = graph.viewport()
+        center = graph.mapToScene(viewport.rect().center())
+        self.__header = {
+            'version': RECORDING_VERSION,
+            'viewportSize': [viewport.width(), viewport.height()],
+            'scale': graph.transform().m11(),
+            'center': [center.x(), center.y()],
+            }
+        self.__events = []
+        self.__gesture = 'hover'
+        self.__overriddenKey = None
+        self.__start = time.perf_counter()
+        self.__recording = True
+
+        viewport.installEventFilter(self)
+        graph.installEventFilter(self)
+
+    def stop(self):
+        if not self.__recording:
+            return
+        self.__recording = False
+        self.__graph.viewport().removeEventFilter(self)
+        self.__graph.removeEventFilter(self)
+
+    def getEvents(self):
+        return list(self.__events)
+
+    def getRecording(self):
+        """Gets the recording as saved by save.
+
+        Returns:
+            dict: The view state at the start in 'viewportSize', 'scale' and 'center', and the 'events'.
+
+        """
+
+        recording = dict(self.__header or {'version': RECORDING_VERSION})
+        recording['events'] = list(self.__events)
+        return recording
+
+    def save(self, fileName):
+        with open(fileName, 'w') as outFile:
+            json.dump(self.getRecording(), outFile, indent=1)
+
+    @staticmethod
+    def load(fileName):
+        with open(fileName, 'r') as inFile:
+            recording = json.load(inFile)
+        if recording.get('version') != RECORDING_VERSION:
+            raise ValueError("Unsupported recording version: " + str(recording.get('version')))
+        return recording
+
+    # =======
+    # Events
+    # =======
+    def __gestureAt(self, event):
+        if event.button() == QtCore.Qt.MiddleButton:
+            return 'pan'
+
+        scenePos = self.__graph.mapToScene(event.pos())
+        item = self.__graph.itemAt(event.pos())
+        while item is not None:
+            if isinstance(item, PortCircle):
+                return 'wire'
+            if isinstance(item, Node):
+                if item.getCompactPorts() and item.compactPortAt(item.mapFromScene(scenePos)) is not None:
+                    return 'wire'
+                return 'drag'
+            if isinstance(item, Connection):
+                return 'connection'
+            item = item.parentItem()
+
+        if event.button() == QtCore.Qt.LeftButton:
+            return 'selection'
+        return 'other'
+
+    def __record(self, eventType, **values):
+        values['t'] = time.perf_counter() - self.__start
+        values['type'] = eventType
+        self.__events.append(values)
+
+    def eventFilter(self, watched, event):
+        eventType = event.type()
+        if watched is self.__graph.viewport():
+            if eventType in MOUSE_EVENTS:
+                kind = MOUSE_EVENTS[eventType]
+                if kind == 'press' and event.buttons() == event.button():
+                    self.__gesture = self.__gestureAt(event)
+                self.__record(kind, x=event.pos().x(), y=event.pos().y(), button=enumValue(event.button()),
+                              buttons=enumValue(event.buttons()), modifiers=enumValue(event.modifiers()),
+                              gesture=self.__gesture)
+                if kind == 'release' and event.buttons() == QtCore.Qt.NoButton:
+                    self.__gesture = 'hover'
+
+            elif eventType == QtCore.QEvent.Wheel:
+                self.__record('wheel', x=event.pos().x(), y=event.pos().y(), delta=event.angleDelta().y(),
+                              buttons=enumValue(event.buttons()), modifiers=enumValue(event.modifiers()), gesture='zoom')
+
+        elif watched is self.__graph:
+            # A key bound to a shortcut only reaches the view as a shortcut override.
+            if eventType == QtCore.QEvent.ShortcutOverride:
+                self.__overriddenKey = event.key()
+                self.__recordKey('keyPress', event)
+            elif eventType == QtCore.QEvent.KeyPress:
+                if event.key() == self.__overriddenKey:
+                    self.__overriddenKey = None
+                else:
+                    self.__recordKey('keyPress', event)
+            elif eventType == QtCore.QEvent.KeyRelease:
+                self.__recordKey('keyRelease', event)
+
+        return False
+
+    def __recordKey(self, kind, event):
+        if event.isAutoRepeat() and kind == 'keyRelease':
+            return
+        self.__record(kind, key=event.key(), text=event.text(), modifiers=enumValue(event.modifiers()), gesture='key')
@@ -0,0 +1,133 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+
+import math
+import time
+
+from qtpy import QtWidgets, QtCore
+
+
+class SceneIndexPolicy(object):
+    """Manages the item index of a graph's scene.
+
+    While a batch is open, e.g. when many nodes are built, deleted or dragged,
+    the scene runs without an index, so adding, removing and moving items does
+    not update a BSP tree. When the last batch closes the BSP index is rebuilt
+    once, with a depth chosen from the scene's item count, and the time the
+    rebuild took is recorded.
+
+    Batches nest; only the outermost one switches the index.
+
+    """
+
+    __leafItems = 16
+    __minDepth = 4
+    __maxDepth = 18
+    __maxTimings = 100
+
+    def __init__(self, graph):
+        self.__graph = graph
+        self.__enabled = False
+        self.__depth = 0
+        self.__timings = []
+
+    def isEnabled(self):
+        return self.__enabled
+
+    def setEnabled(self, enabled):
+        """Sets whether the policy manages the scene index.
+
+        Args:
+            enabled (Boolean): True to switch the index for batches, False to leave Qt's default index.
+
+        """
+
+        if enabled == self.__enabled:
+            return
+        self.__enabled = enabled
+        if enabled:
+            if self.__depth == 0:
+                self.rebuild()
+        else:
+            scene = self.__graph.scene()
+            scene.setItemIndexMethod(QtWidgets.QGraphicsScene.BspTreeIndex)
+            scene.setBspTreeDepth(0)
+
+    def isInBatch(self):
+        return self.__depth > 0
+
+    def reset(self):
+        """Applies the policy to a new scene."""
+
+        self.__depth = 0
+        if self.__enabled:
+            self.rebuild()
+
+    # ========
+    # Batches
+    # ========
+    def beginBatch(self):
+        self.__depth += 1
+        if self.__depth == 1 and self.__enabled:
+            self.__graph.scene().setItemIndexMethod(QtWidgets.QGraphicsScene.NoIndex)
+
+    def endBatch(self):
+        if self.__depth == 0:
+            return
+        self.__depth -= 1
+        if self.__depth == 0 and self.__enabled:
+            self.rebuild()
+
+    # ======
+    # Index
+    # ======
+    @classmethod
+    def depthForItemCount(cls, count):
+        """Gets the BSP tree depth giving leaves of about 16 items.
+
+        Args:
+            count (int): Number of items in the scene.
+
+        Returns:
+            int: The depth, clamped to a sensible range.
+
+        """
+
+        if count <= cls.__leafItems:
+            return cls.__minDepth
+        depth = int(math.ceil(math.log(float(count) / cls.__leafItems, 2)))
+        return max(cls.__minDepth, min(cls.__maxDepth, depth))
+
+    def rebuild(self):
+        """Rebuilds the BSP index of the scene and records how long it took."""
+
+        scene = self.__graph.scene()
+        # The ports and labels are most of the items, so the scene is counted; the rebuild visits them all anyway.
+        count = len(scene.items())
+        depth = self.depthForItemCount(count)
+
+        start = time.time()
+        scene.setItemIndexMethod(QtWidgets.QGraphicsScene.BspTreeIndex)
+        scene.setBspTreeDepth(depth)
+        # The tree is built lazily; a query forces it to be built now.
+        scene.items(QtCore.QRectF(0, 0, 1, 1))
+        seconds = time.time() - start
+
+        self.__timings.append({'items': count, 'depth': depth, 'seconds': seconds})
+        if len(self.__timings) > self.__maxTimings:
+            del self.__timings[0]
+
+    def getTimings(self):
+        """Gets the recorded index rebuilds, oldest first.
+
+        Returns:
+            list: Dicts with the 'items' count, the BSP 'depth' and the rebuild time in 'seconds'.
+
+        """
+
+        return list(self.__timings)
+
+    def clearTimings(self):
+        del self.__timings[:]
@@ -3,17 +3,20 @@
 # Copyright 2015-2017 Eric Thivierge
 #
 
-from qtpy import QtGui, QtWidgets, QtCore
+from qtpy import QtWidgets, QtCore
+
+from . import style
 
 
 class SelectionRect(QtWidgets.QGraphicsWidget):
-    __backgroundColor = QtGui.QColor(100, 100, 100, 50)
-    __pen =  QtGui.QPen(QtGui.QColor(25, 25, 25), 1.0,  QtCore.Qt.DashLine)
 
     def __init__(self, graph, mouseDownPos):
         super(SelectionRect, self).__init__()
         self.setZValue(-1)
 
+        self.__brush = style.registry.brush('selectionRect')
+        self.__pen = style.registry.pen('selectionRectOutline', 1.0, QtCore.Qt.DashLine)
+
         self.__graph = graph
         self.__graph.scene().addItem(self)
         self.__mouseDownPos = mouseDownPos
@@ -35,7 +38,7 @@ class SelectionRect(QtWidgets.QGraphicsWidget):
 
     def paint(self, painter, option, widget):
         rect = self.windowFrameRect()
-        painter.setBrush(self.__backgroundColor)
+        painter.setBrush(self.__brush)
         painter.setPen(self.__pen)
         painter.drawRect(rect)
 
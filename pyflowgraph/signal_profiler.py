@@ -0,0 +1,148 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+
+import time
+
+
+def payloadSize(args):
+    """Gets the size of a signal payload: the items of its containers plus its other arguments."""
+
+    size = 0
+    for arg in args:
+        if isinstance(arg, (list, set, tuple, dict)):
+            size += len(arg)
+        else:
+            size += 1
+    return size
+
+
+class SignalStats(object):
+
+    __slots__ = ('emissions', 'seconds', 'maxSeconds', 'payload', 'maxPayload')
+
+    def __init__(self):
+        self.emissions = 0
+        self.seconds = 0.0
+        self.maxSeconds = 0.0
+        self.payload = 0
+        self.maxPayload = 0
+
+    def add(self, seconds, payload):
+        self.emissions += 1
+        self.seconds += seconds
+        if seconds > self.maxSeconds:
+            self.maxSeconds = seconds
+        self.payload += payload
+        if payload > self.maxPayload:
+            self.maxPayload = payload
+
+    def toDict(self):
+        return {
+            'emissions': self.emissions,
+            'seconds': self.seconds,
+            'meanMs': self.seconds * 1000.0 / self.emissions if self.emissions else 0.0,
+            'maxMs': self.maxSeconds * 1000.0,
+            'meanPayload': float(self.payload) / self.emissions if self.emissions else 0.0,
+            'maxPayload': self.maxPayload,
+            }
+
+
+class SignalProfiler(object):
+    """Times the emissions of a GraphView's signals.
+
+    The graph sends its signals through the profiler while profiling is
+    enabled. For each signal it records the emission count, the payload size,
+    i.e. the number of nodes or connections carried, and the time spent in
+    the connected slots, which for the usual direct connections is the time
+    emit takes.
+
+    To see which consumer of a signal is slow, connect it through connect:
+    the time spent in that slot is then also recorded on its own, under
+    'signal -> slot'.
+
+    """
+
+    def __init__(self, graph):
+        self.__graph = graph
+        self.__stats = {}
+        self.__slots = {}
+
+    def emit(self, name, args):
+        signal = getattr(self.__graph, name)
+        start = time.perf_counter()
+        signal.emit(*args)
+        seconds = time.perf_counter() - start
+
+        stats = self.__stats.get(name)
+        if stats is None:
+            stats = self.__stats[name] = SignalStats()
+        stats.add(seconds, payloadSize(args))
+
+    # ======
+    # Slots
+    # ======
+    def connect(self, name, slot, slotName=None):
+        """Connects a slot to a signal of the graph, timing each call of the slot.
+
+        Args:
+            name (str): Name of the graph's signal, e.g. 'selectionMoved'.
+            slot (callable): The slot.
+            slotName (str): Name the slot is reported under; the slot's qualified name by default.
+
+        """
+
+        if slotName is None:
+            slotName = getattr(slot, '__qualname__', None) or getattr(slot, '__name__', repr(slot))
+        key = name + ' -> ' + slotName
+
+        def timedSlot(*args):
+            start = time.perf_counter()
+            try:
+                return slot(*args)
+            finally:
+                stats = self.__stats.get(key)
+                if stats is None:
+                    stats = self.__stats[key] = SignalStats()
+                stats.add(time.perf_counter() - start, payloadSize(args))
+
+        getattr(self.__graph, name).connect(timedSlot)
+        self.__slots[(name, slot)] = timedSlot
+
+    def disconnect(self, name, slot):
+        timedSlot = self.__slots.pop((name, slot), None)
+        if timedSlot is not None:
+            getattr(self.__graph, name).disconnect(timedSlot)
+
+    def close(self):
+        for (name, slot) in list(self.__slots):
+            self.disconnect(name, slot)
+
+    # ======
+    # Stats
+    # ======
+    def getStats(self):
+        """Gets the statistics of each signal, and of each slot connected through connect.
+
+        Returns:
+            dict: Signal name, or 'signal -> slot', to a dict with the 'emissions' count, the total
+                'seconds', 'meanMs', 'maxMs', 'meanPayload' and 'maxPayload'.
+
+        """
+
+        return dict((name, stats.toDict()) for name, stats in self.__stats.items())
+
+    def clear(self):
+        self.__stats.clear()
+
+    def summary(self):
+        """Gets the statistics as a table, the most expensive signals first."""
+
+        stats = sorted(self.getStats().items(), key=lambda entry: -entry[1]['seconds'])
+        lines = ['%-48s %9s %10s %9s %9s %9s' % ('signal', 'emits', 'total ms', 'mean ms', 'max ms', 'payload')]
+        for name, entry in stats:
+            lines.append('%-48s %9d %10.2f %9.3f %9.3f %9.1f' % (name, entry['emissions'], entry['seconds'] * 1000.0,
+                                                                 entry['meanMs'], entry['maxMs'],
+                                                                 entry['meanPayload']))
+        return '\n'.join(lines)
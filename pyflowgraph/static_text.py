@@ -0,0 +1,142 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+
+from qtpy import QtGui, QtWidgets, QtCore
+
+from . import diagnostics
+
+
+# Glyph layouts and metrics are computed once per distinct (text, font) pair
+# and shared by every label showing that text.
+_staticTexts = {}
+_textSizes = {}
+_fontMetrics = {}
+
+
+def fontMetrics(font):
+    key = font.key()
+    metrics = _fontMetrics.get(key)
+    if metrics is None:
+        metrics = QtGui.QFontMetricsF(font)
+        _fontMetrics[key] = metrics
+    return metrics
+
+
+def staticText(text, font):
+    """Gets the shared, prepared QStaticText for a string in a font."""
+
+    key = (text, font.key())
+    st = _staticTexts.get(key)
+    if st is None:
+        st = QtGui.QStaticText(text)
+        st.setTextFormat(QtCore.Qt.PlainText)
+        st.prepare(QtGui.QTransform(), font)
+        _staticTexts[key] = st
+    return st
+
+
+def textSize(text, font):
+    """Gets the size of a single line of plain text in a font.
+
+    Returns:
+        QSizeF: Advance width and line height of the text.
+
+    """
+
+    key = (text, font.key())
+    size = _textSizes.get(key)
+    if size is None:
+        metrics = fontMetrics(font)
+        size = QtCore.QSizeF(metrics.width(text), metrics.height())
+        _textSizes[key] = size
+    return size
+
+
+def clearCache():
+    _staticTexts.clear()
+    _textSizes.clear()
+    _fontMetrics.clear()
+
+
+class StaticTextItem(QtWidgets.QGraphicsItem):
+    """Single line plain text label drawn from a cached QStaticText.
+
+    This is a light replacement for QGraphicsTextItem, which creates a full
+    QTextDocument per label.
+
+    """
+
+    def __init__(self, text, font, color, highlightColor=None, parent=None, paintKind=None):
+        super(StaticTextItem, self).__init__(parent)
+
+        # Name under which the paint diagnostics count this item, if any.
+        self.__paintKind = paintKind
+
+        self.__text = text
+        self.__font = font
+        self.__color = color
+        self.__highlightColor = highlightColor if highlightColor is not None else color
+        self.__highlighted = False
+        self.__staticText = staticText(text, font)
+        self.__size = textSize(text, font)
+
+    def text(self):
+        return self.__text
+
+    def setText(self, text):
+        if text == self.__text:
+            return
+        self.prepareGeometryChange()
+        self.__text = text
+        self.__staticText = staticText(text, self.__font)
+        self.__size = textSize(text, self.__font)
+        self.update()
+
+    def font(self):
+        return self.__font
+
+    def setFont(self, font):
+        self.prepareGeometryChange()
+        self.__font = font
+        self.__staticText = staticText(self.__text, font)
+        self.__size = textSize(self.__text, font)
+        self.update()
+
+    def color(self):
+        return self.__color
+
+    def setColor(self, color):
+        self.__color = color
+        self.update()
+
+    def setHighlightColor(self, color):
+        self.__highlightColor = color
+        self.update()
+
+    def textSize(self):
+        return self.__size
+
+    def highlight(self):
+        if not self.__highlighted:
+            self.__highlighted = True
+            self.update()
+
+    def unhighlight(self):
+        if self.__highlighted:
+            self.__highlighted = False
+            self.update()
+
+    def isHighlighted(self):
+        return self.__highlighted
+
+    def boundingRect(self):
+        return QtCore.QRectF(0, 0, self.__size.width(), self.__size.height())
+
+    def paint(self, painter, option, widget):
+        if self.__paintKind is not None and diagnostics.collector is not None:
+            diagnostics.collector.count(self.__paintKind)
+        painter.setFont(self.__font)
+        painter.setPen(self.__highlightColor if self.__highlighted else self.__color)
+        painter.drawStaticText(0, 0, self.__staticText)
@@ -0,0 +1,133 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+
+from qtpy import QtGui, QtCore
+
+
+DEFAULT_THEME = {
+    'background': QtGui.QColor(50, 50, 50),
+    'gridFine': QtGui.QColor(25, 44, 44, 255),
+    'gridCoarse': QtGui.QColor(25, 40, 240, 255),
+
+    'nodeDefault': QtGui.QColor(154, 205, 50, 255),
+    'nodeUnselected': QtGui.QColor(25, 25, 25),
+    'nodeSelected': QtGui.QColor(255, 0, 0, 255),
+    'nodeTitle': QtGui.QColor(25, 25, 25),
+
+    'portCircle': QtGui.QColor(25, 25, 25),
+    'portCircleHover': QtGui.QColor(255, 255, 100),
+    'portCircleMove': QtGui.QColor(255, 0, 0),
+    'portLabel': QtGui.QColor(25, 25, 25),
+    'portLabelHighlight': QtGui.QColor(225, 225, 225, 255),
+
+    'connectionLabel': QtGui.QColor(255, 255, 255),
+
+    'selectionRect': QtGui.QColor(100, 100, 100, 50),
+    'selectionRectOutline': QtGui.QColor(25, 25, 25),
+
+    'minimapViewRect': QtGui.QColor(225, 225, 225, 200),
+    }
+
+
+class StyleRegistry(object):
+    """Hands out shared pens, brushes and fonts.
+
+    Pens are interned by (color, width, style, dash pattern), brushes by color
+    and fonts by their description, so every wire and terminal with the same
+    look shares one object. The returned objects are shared and must be treated
+    as immutable; to change the look of an item ask the registry for a new one.
+
+    Colors can be given as a QColor or as the name of a theme role. Switching the
+    theme changes the role colors; items pick them up in their applyStyle methods.
+    Role colors are handed out as copies, so callers may change them freely.
+
+    """
+
+    def __init__(self, theme=None):
+        self.__theme = dict(DEFAULT_THEME)
+        if theme is not None:
+            self.__theme.update(theme)
+        self.__pens = {}
+        self.__brushes = {}
+        self.__fonts = {}
+
+    # ======
+    # Theme
+    # ======
+    def getTheme(self):
+        return dict((role, QtGui.QColor(color)) for role, color in self.__theme.items())
+
+    def setTheme(self, theme):
+        """Sets the theme role colors.
+
+        Args:
+            theme (dict): Role name to QColor. Roles not given keep the default.
+
+        """
+
+        self.__theme = dict(DEFAULT_THEME)
+        self.__theme.update(theme)
+
+    def color(self, role):
+        if isinstance(role, QtGui.QColor):
+            return role
+        return QtGui.QColor(self.__theme[role])
+
+    # ===========
+    # Flyweights
+    # ===========
+    def pen(self, color, width=1.0, style=QtCore.Qt.SolidLine, dashPattern=None):
+        color = self.color(color)
+        if dashPattern is not None:
+            dashPattern = tuple(dashPattern)
+        key = (color.rgba(), float(width), style, dashPattern)
+        pen = self.__pens.get(key)
+        if pen is None:
+            pen = QtGui.QPen(color, width, style)
+            if dashPattern is not None:
+                pen.setDashPattern(list(dashPattern))
+            self.__pens[key] = pen
+        return pen
+
+    def brush(self, color):
+        color = self.color(color)
+        key = color.rgba()
+        brush = self.__brushes.get(key)
+        if brush is None:
+            brush = QtGui.QBrush(color)
+            self.__brushes[key] = brush
+        return brush
+
+    def font(self, family, pointSize, letterSpacing=None):
+        key = (family, float(pointSize), letterSpacing)
+        font = self.__fonts.get(key)
+        if font is None:
+            font = QtGui.QFont(family, pointSize)
+            if letterSpacing is not None:
+                font.setLetterSpacing(QtGui.QFont.PercentageSpacing, letterSpacing)
+            self.__fonts[key] = font
+        return font
+
+    def clear(self):
+        self.__pens.clear()
+        self.__brushes.clear()
+        self.__fonts.clear()
+
+    def stats(self):
+        """Gets the number of interned objects.
+
+        Returns:
+            dict: Counts of 'pens', 'brushes' and 'fonts'.
+
+        """
+
+        return {
+            'pens': len(self.__pens),
+            'brushes': len(self.__brushes),
+            'fonts': len(self.__fonts),
+            }
+
+
+registry = StyleRegistry()
@@ -0,0 +1,194 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+
+import functools
+import os
+import sys
+import time
+
+
+# Tracing of graph operations by category and level. Every category is off by
+# default. Call sites guard anything costing more than a call with enabled, so
+# a disabled category costs a dict lookup and nothing is formatted:
+#
+#     if trace.enabled('io', trace.DEBUG):
+#         trace.log('io', trace.DEBUG, 'loaded', nodes=len(nodes))
+#
+#     with trace.span('io', 'loadNodes', fileName=fileName):
+#         ...
+#
+# Categories are enabled with setLevel, or for a session with the
+# PYFLOWGRAPH_TRACE environment variable, e.g. PYFLOWGRAPH_TRACE=io=debug,graph=info
+# or PYFLOWGRAPH_TRACE=all=debug.
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+OFF = 100
+
+LEVEL_NAMES = {DEBUG: 'debug', INFO: 'info', WARNING: 'warning', ERROR: 'error', OFF: 'off'}
+
+CATEGORIES = (
+    'graph',        # Node and connection management, selection, deletion.
+    'io',           # saveNodes, saveNodesCopy and loadNodes.
+    'node',         # Node and port list internals.
+    'port',         # Port and port circle interaction.
+    'connection',   # Wire creation and editing.
+    )
+
+_levels = dict.fromkeys(CATEGORIES, OFF)
+
+
+def _writeRecord(record):
+    fields = ' '.join('%s=%r' % (key, value) for key, value in sorted(record['fields'].items()))
+    sys.stderr.write('[%.6f] %s.%s %s %s\n' % (record['time'], record['category'],
+                                               LEVEL_NAMES.get(record['level'], record['level']),
+                                               record['message'], fields))
+
+
+_sink = _writeRecord
+
+
+# ==============
+# Configuration
+# ==============
+def setLevel(category, level):
+    """Sets the lowest level traced for a category.
+
+    Args:
+        category (str): One of CATEGORIES, or 'all'.
+        level (int): DEBUG, INFO, WARNING, ERROR, or OFF to stop tracing the category.
+
+    """
+
+    if category == 'all':
+        for name in CATEGORIES:
+            _levels[name] = level
+    elif category in _levels:
+        _levels[category] = level
+    else:
+        raise ValueError("Unknown trace category: " + str(category))
+
+
+def getLevel(category):
+    return _levels[category]
+
+
+def setSink(sink):
+    """Sets the function receiving the trace records.
+
+    Args:
+        sink (callable): Called with a dict holding the record's 'time', 'category', 'level',
+            'message' and 'fields'; None restores the default, which writes to stderr.
+
+    """
+
+    global _sink
+    _sink = sink if sink is not None else _writeRecord
+
+
+def configure(spec):
+    """Sets the levels from a spec like 'io=debug,graph=info'; a category without a level gets debug."""
+
+    levels = dict((name, level) for level, name in LEVEL_NAMES.items())
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        category, _, levelName = entry.partition('=')
+        level = levels.get(levelName.strip().lower() or 'debug')
+        if level is None:
+            raise ValueError("Unknown trace level: " + levelName)
+        setLevel(category.strip(), level)
+
+
+# ========
+# Records
+# ========
+def enabled(category, level):
+    return level >= _levels[category]
+
+
+def log(category, level, message, **fields):
+    if level < _levels[category]:
+        return
+    _sink({'time': time.time(), 'category': category, 'level': level, 'message': message, 'fields': fields})
+
+
+class _Span(object):
+
+    __slots__ = ('category', 'level', 'name', 'fields', 'start')
+
+    def __init__(self, category, level, name, fields):
+        self.category = category
+        self.level = level
+        self.name = name
+        self.fields = fields
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, excValue, excTraceback):
+        self.fields['ms'] = (time.perf_counter() - self.start) * 1000.0
+        if excType is not None:
+            self.fields['error'] = excType.__name__
+        log(self.category, self.level, self.name, **self.fields)
+        return False
+
+
+class _NullSpan(object):
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, excTraceback):
+        return False
+
+
+_nullSpan = _NullSpan()
+
+
+def span(category, name, level=INFO, **fields):
+    """Times a block, and traces its duration in milliseconds as the 'ms' field when it ends.
+
+    Returns:
+        The context manager; a shared one doing nothing if the category is not traced at level.
+
+    """
+
+    if level < _levels[category]:
+        return _nullSpan
+    return _Span(category, level, name, fields)
+
+
+def traced(category, level=INFO):
+    """Decorates a function so each call is traced as a span named after the function.
+
+    Meant for bulk operations; a disabled category costs an extra call and a dict lookup.
+
+    """
+
+    def decorate(function):
+        name = function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if level < _levels[category]:
+                return function(*args, **kwargs)
+            with _Span(category, level, name, {}):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+if os.environ.get('PYFLOWGRAPH_TRACE'):
+    configure(os.environ['PYFLOWGRAPH_TRACE'])
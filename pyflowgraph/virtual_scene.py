@@ -0,0 +1,238 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+
+import math
+
+from qtpy import QtCore
+
+from .graph_bounds import GraphBounds
+from .node import Node
+
+
+class SceneVirtualizer(object):
+    """Keeps only the nodes and connections near the visible area in the scene.
+
+    Every node and connection of the graph is registered with its scene rect in
+    a uniform grid. Items intersecting the visible rect, grown by a margin, are
+    added to the scene; the others are taken out of it. The items themselves
+    stay alive as the graph's handles, so names, selection, ports and
+    connections keep working for nodes which are not in the scene, and an item
+    is put back into the scene as is when the view comes near it.
+
+    The resident region is only recomputed once the visible rect leaves it, so
+    small pans do not touch the scene.
+
+    This bounds the work that grows with the scene, the BSP index and the items
+    visited by painting, itemAt and rubber band selection, by what is near the
+    view. It does not reduce memory: items are not pooled or rebuilt, so every
+    node keeps its ports, labels and layouts alive outside of the scene. Compact
+    ports are the way to reduce the items, and memory, per node.
+
+    """
+
+    __cellSize = 512.0
+    __labelMargin = 60.0
+
+    def __init__(self, graph, margin=0.5):
+        self.__graph = graph
+        self.__margin = margin
+
+        self.__rects = {}
+        self.__cells = {}
+        self.__grid = {}
+        self.__resident = set()
+        self.__region = None
+        self.__updatePending = False
+
+        self.__materialized = 0
+        self.__released = 0
+
+    def getMargin(self):
+        return self.__margin
+
+    def setMargin(self, margin):
+        """Sets how far around the visible rect items are kept in the scene.
+
+        Args:
+            margin (float): Margin as a fraction of the visible rect size on each side.
+
+        """
+
+        self.__margin = margin
+        self.__region = None
+        self.__scheduleUpdate()
+
+    # ======
+    # Items
+    # ======
+    def __itemRect(self, item):
+        if isinstance(item, Node):
+            return GraphBounds.toRectF(GraphBounds.nodeSceneRect(item))
+
+        points = item.scenePolyline()
+        xs = [point.x() for point in points]
+        ys = [point.y() for point in points]
+        m = self.__labelMargin
+        return QtCore.QRectF(min(xs) - m, min(ys) - m, max(xs) - min(xs) + 2 * m, max(ys) - min(ys) + 2 * m)
+
+    def __cellRange(self, rect):
+        size = self.__cellSize
+        return (
+            int(math.floor(rect.left() / size)), int(math.floor(rect.right() / size)),
+            int(math.floor(rect.top() / size)), int(math.floor(rect.bottom() / size))
+            )
+
+    def __index(self, item, rect):
+        (x0, x1, y0, y1) = self.__cellRange(rect)
+        cells = []
+        grid = self.__grid
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                items = grid.get((cx, cy))
+                if items is None:
+                    grid[(cx, cy)] = set([item])
+                else:
+                    items.add(item)
+                cells.append((cx, cy))
+        self.__rects[item] = rect
+        self.__cells[item] = cells
+
+    def __unindex(self, item):
+        grid = self.__grid
+        for cell in self.__cells.pop(item, ()):
+            items = grid.get(cell)
+            if items is not None:
+                items.discard(item)
+                if not items:
+                    del grid[cell]
+        self.__rects.pop(item, None)
+
+    def __setResident(self, item, resident):
+        if resident == (item in self.__resident):
+            return
+        if resident:
+            if isinstance(item, Node):
+                item.finalizeLayout()
+            self.__graph.scene().addItem(item)
+            self.__resident.add(item)
+            self.__materialized += 1
+        else:
+            self.__graph.scene().removeItem(item)
+            self.__resident.discard(item)
+            self.__released += 1
+
+    def addItem(self, item):
+        rect = self.__itemRect(item)
+        self.__index(item, rect)
+        if self.__region is None or self.__region.intersects(rect):
+            self.__setResident(item, True)
+
+    def updateItem(self, item):
+        if item not in self.__rects:
+            return
+        self.__unindex(item)
+        rect = self.__itemRect(item)
+        self.__index(item, rect)
+        if self.__region is not None:
+            self.__setResident(item, self.__region.intersects(rect))
+
+    def removeItem(self, item):
+        if item not in self.__rects:
+            return
+        self.__unindex(item)
+        self.__setResident(item, False)
+
+    def isResident(self, item):
+        return item in self.__resident
+
+    def clear(self):
+        """Forgets all items, e.g. after the graph switched to a new scene."""
+
+        self.__rects.clear()
+        self.__cells.clear()
+        self.__grid.clear()
+        self.__resident.clear()
+        self.__region = None
+
+    def release(self):
+        """Puts all items back into the scene, e.g. when virtualization is turned off."""
+
+        for item in list(self.__rects):
+            self.__setResident(item, True)
+        self.clear()
+
+    # =======
+    # Region
+    # =======
+    def __visibleRect(self):
+        graph = self.__graph
+        return graph.mapToScene(graph.viewport().rect()).boundingRect()
+
+    def __scheduleUpdate(self):
+        if not self.__updatePending:
+            self.__updatePending = True
+            QtCore.QTimer.singleShot(0, self.update)
+
+    def check(self):
+        """Schedules an update if the visible rect is no longer covered by the resident region.
+
+        Cheap enough to be called on every paint.
+
+        """
+
+        if self.__region is None or not self.__region.contains(self.__visibleRect()):
+            self.__scheduleUpdate()
+
+    def update(self):
+        """Adds the items near the visible rect to the scene and removes the others."""
+
+        self.__updatePending = False
+
+        visible = self.__visibleRect()
+        mx = visible.width() * self.__margin
+        my = visible.height() * self.__margin
+        region = visible.adjusted(-mx, -my, mx, my)
+
+        (x0, x1, y0, y1) = self.__cellRange(region)
+        wanted = set()
+        grid = self.__grid
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(grid):
+            candidates = self.__rects.keys()
+        else:
+            candidates = set()
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    items = grid.get((cx, cy))
+                    if items is not None:
+                        candidates.update(items)
+        rects = self.__rects
+        for item in candidates:
+            if region.intersects(rects[item]):
+                wanted.add(item)
+
+        for item in self.__resident - wanted:
+            self.__setResident(item, False)
+        for item in wanted - self.__resident:
+            self.__setResident(item, True)
+
+        self.__region = region
+
+    def getResidentCount(self):
+        return len(self.__resident)
+
+    def stats(self):
+        """Gets the virtualization counters.
+
+        Returns:
+            dict: totalItems, residentItems, materialized and released.
+
+        """
+
+        return {
+            'totalItems': len(self.__rects),
+            'residentItems': len(self.__resident),
+            'materialized': self.__materialized,
+            'released': self.__released,
+            }
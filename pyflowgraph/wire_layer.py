@@ -0,0 +1,375 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+
+import math
+from array import array
+
+from qtpy import QtGui, QtWidgets, QtCore
+
+from . import diagnostics
+from .connection import labelPositions
+from .graph_bounds import GraphBounds
+
+
+class WireLayer(QtWidgets.QGraphicsItem):
+    """A single scene item drawing all the connections of a graph.
+
+    Each connection owns a slot holding the points of its polyline in a flat
+    array of doubles, found through a table of offsets and point counts; a
+    slot moves to the end of the array when its polyline outgrows it. Visible
+    segments are found through a uniform grid and drawn with one drawLines
+    call per pen; since pens come from the style registry, wires of the same
+    color share a batch. Hover and pick testing use the same grid. The Connection objects stay the public handles: they are not
+    added to the scene and notify the layer when their end points move.
+
+    """
+
+    __cellSize = 256.0
+    __pickTolerance = 4.0
+    __labelMargin = 60.0
+    __labelLod = 0.5
+
+    def __init__(self, graph):
+        super(WireLayer, self).__init__()
+
+        self.__graph = graph
+
+        self.__slots = {}
+        self.__handles = []
+        self.__points = array('d')
+        self.__offsets = []
+        self.__counts = []
+        self.__capacities = []
+        self.__cells = []
+        self.__freeSlots = []
+        self.__grid = {}
+        self.__bounds = GraphBounds()
+
+        self.__dirty = set()
+        self.__flushPending = False
+        self.__pendingUpdate = None
+        self.__boundingRect = QtCore.QRectF()
+        self.__hoverSlot = None
+
+        self.setZValue(-1)
+        self.setAcceptedMouseButtons(QtCore.Qt.NoButton)
+        self.setFlag(QtWidgets.QGraphicsItem.ItemUsesExtendedStyleOption, True)
+
+    # ============
+    # Connections
+    # ============
+    def addConnection(self, connection):
+        if connection in self.__slots:
+            return
+
+        if self.__freeSlots:
+            slot = self.__freeSlots.pop()
+            self.__handles[slot] = connection
+        else:
+            slot = len(self.__handles)
+            self.__handles.append(connection)
+            self.__offsets.append(len(self.__points))
+            self.__counts.append(4)
+            self.__capacities.append(4)
+            self.__points.extend((0.0,) * 8)
+            self.__cells.append(())
+
+        self.__slots[connection] = slot
+        connection.setWireLayer(self)
+        self.invalidate(connection)
+
+    def removeConnection(self, connection):
+        slot = self.__slots.pop(connection, None)
+        if slot is None:
+            return
+
+        connection.setWireLayer(None)
+        self.__dirty.discard(connection)
+        self.__markChanged(self.__slotRect(slot))
+        self.__unindex(slot)
+        self.__bounds.removeKey(connection)
+        self.__handles[slot] = None
+        self.__freeSlots.append(slot)
+        if self.__hoverSlot == slot:
+            self.__hoverSlot = None
+        self.__scheduleFlush()
+
+    def getConnections(self):
+        return self.__slots.keys()
+
+    def invalidate(self, connection):
+        """Marks the geometry of a connection as stale; it is recomputed lazily."""
+
+        if connection in self.__slots:
+            self.__dirty.add(connection)
+            self.__scheduleFlush()
+
+    # =========
+    # Geometry
+    # =========
+    def __slotRect(self, slot):
+        p = self.__points
+        i = self.__offsets[slot]
+        end = i + 2 * self.__counts[slot]
+        xs = p[i:end:2]
+        ys = p[i + 1:end:2]
+        return QtCore.QRectF(min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys))
+
+    def __slotLines(self, slot):
+        p = self.__points
+        i = self.__offsets[slot]
+        QLineF = QtCore.QLineF
+        return [QLineF(p[j], p[j + 1], p[j + 2], p[j + 3]) for j in range(i, i + 2 * self.__counts[slot] - 2, 2)]
+
+    def __unindex(self, slot):
+        grid = self.__grid
+        for cell in self.__cells[slot]:
+            slots = grid.get(cell)
+            if slots is not None:
+                slots.discard(slot)
+                if not slots:
+                    del grid[cell]
+        self.__cells[slot] = ()
+
+    def __index(self, slot):
+        p = self.__points
+        i = self.__offsets[slot]
+        size = self.__cellSize
+        cells = set()
+        for j in range(i, i + 2 * self.__counts[slot] - 2, 2):
+            x0 = int(math.floor(min(p[j], p[j + 2]) / size))
+            x1 = int(math.floor(max(p[j], p[j + 2]) / size))
+            y0 = int(math.floor(min(p[j + 1], p[j + 3]) / size))
+            y1 = int(math.floor(max(p[j + 1], p[j + 3]) / size))
+            # The segments are axis aligned, so this only walks the cells they cross.
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    cells.add((cx, cy))
+
+        grid = self.__grid
+        for cell in cells:
+            slots = grid.get(cell)
+            if slots is None:
+                grid[cell] = set([slot])
+            else:
+                slots.add(slot)
+        self.__cells[slot] = tuple(cells)
+
+    def __markChanged(self, rect):
+        if self.__pendingUpdate is None:
+            self.__pendingUpdate = rect
+        else:
+            self.__pendingUpdate = self.__pendingUpdate.united(rect)
+
+    def __flushGeometry(self):
+        if not self.__dirty:
+            return
+
+        p = self.__points
+        for connection in self.__dirty:
+            slot = self.__slots[connection]
+            self.__markChanged(self.__slotRect(slot))
+            self.__unindex(slot)
+
+            points = connection.scenePolyline()
+            count = len(points)
+            if count > self.__capacities[slot]:
+                # The old range is left unused; the slot keeps the larger capacity when reused.
+                self.__offsets[slot] = len(p)
+                self.__capacities[slot] = count
+                p.extend((0.0,) * (2 * count))
+            self.__counts[slot] = count
+
+            i = self.__offsets[slot]
+            for point in points:
+                p[i] = point.x()
+                p[i + 1] = point.y()
+                i += 2
+
+            self.__index(slot)
+            rect = self.__slotRect(slot)
+            self.__bounds.setRect(connection, (rect.left(), rect.top(), rect.right(), rect.bottom()))
+            self.__markChanged(rect)
+        self.__dirty.clear()
+
+    def __scheduleFlush(self):
+        if not self.__flushPending:
+            self.__flushPending = True
+            QtCore.QTimer.singleShot(0, self.flush)
+
+    def flush(self):
+        """Applies pending geometry changes and repaints the affected area."""
+
+        self.__flushPending = False
+        self.__flushGeometry()
+
+        bounds = self.__bounds.rect()
+        if bounds is None:
+            bounds = QtCore.QRectF()
+        else:
+            m = self.__labelMargin
+            bounds = bounds.adjusted(-m, -m, m, m)
+        if bounds != self.__boundingRect:
+            self.prepareGeometryChange()
+            self.__boundingRect = bounds
+
+        if self.__pendingUpdate is not None:
+            m = self.__labelMargin
+            self.update(self.__pendingUpdate.adjusted(-m, -m, m, m))
+            self.__pendingUpdate = None
+
+    def boundingRect(self):
+        return self.__boundingRect
+
+    def shape(self):
+        # The layer never takes part in item picking; wires are picked with connectionAt.
+        return QtGui.QPainterPath()
+
+    # ========
+    # Picking
+    # ========
+    def __slotsInRect(self, rect):
+        size = self.__cellSize
+        x0 = int(math.floor(rect.left() / size))
+        x1 = int(math.floor(rect.right() / size))
+        y0 = int(math.floor(rect.top() / size))
+        y1 = int(math.floor(rect.bottom() / size))
+
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self.__grid):
+            return set(slot for slot in self.__slots.values())
+
+        grid = self.__grid
+        found = set()
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                slots = grid.get((cx, cy))
+                if slots is not None:
+                    found.update(slots)
+        return found
+
+    def __slotAt(self, scenePos, tolerance):
+        self.__flushGeometry()
+
+        x = scenePos.x()
+        y = scenePos.y()
+        size = self.__cellSize
+        slots = self.__grid.get((int(math.floor(x / size)), int(math.floor(y / size))))
+        if not slots:
+            return None
+
+        p = self.__points
+        best = None
+        bestDist = tolerance
+        for slot in slots:
+            i = self.__offsets[slot]
+            for j in range(i, i + 2 * self.__counts[slot] - 2, 2):
+                ax = p[j]
+                ay = p[j + 1]
+                bx = p[j + 2]
+                by = p[j + 3]
+                # Distance to an axis aligned segment.
+                dx = max(min(ax, bx) - x, 0.0, x - max(ax, bx))
+                dy = max(min(ay, by) - y, 0.0, y - max(ay, by))
+                dist = max(dx, dy)
+                if dist <= bestDist:
+                    best = slot
+                    bestDist = dist
+        return best
+
+    def connectionAt(self, scenePos, tolerance=None):
+        """Gets the connection passing near a scene position.
+
+        Args:
+            scenePos (QPointF): Position in scene coordinates.
+            tolerance (float): Pick distance in scene units.
+
+        Returns:
+            Connection: The nearest connection within tolerance, or None.
+
+        """
+
+        if tolerance is None:
+            tolerance = self.__pickTolerance
+        slot = self.__slotAt(scenePos, tolerance)
+        if slot is None:
+            return None
+        return self.__handles[slot]
+
+    def setHoverPos(self, scenePos):
+        """Updates the hovered wire, e.g. from the view's mouse move events."""
+
+        slot = None
+        if scenePos is not None:
+            tolerance = self.__pickTolerance / max(self.__graph.transform().m11(), 0.01)
+            slot = self.__slotAt(scenePos, tolerance)
+
+        if slot != self.__hoverSlot:
+            if self.__hoverSlot is not None:
+                self.update(self.__slotRect(self.__hoverSlot).adjusted(-2, -2, 2, 2))
+            self.__hoverSlot = slot
+            if slot is not None:
+                self.update(self.__slotRect(slot).adjusted(-2, -2, 2, 2))
+
+    def getHoverConnection(self):
+        if self.__hoverSlot is None:
+            return None
+        return self.__handles[self.__hoverSlot]
+
+    # =========
+    # Painting
+    # =========
+    def paint(self, painter, option, widget):
+        self.__flushGeometry()
+
+        exposed = option.exposedRect.adjusted(-self.__labelMargin, -self.__labelMargin,
+                                              self.__labelMargin, self.__labelMargin)
+        visible = self.__slotsInRect(exposed)
+        if not visible:
+            return
+        if diagnostics.collector is not None:
+            diagnostics.collector.count('Connection', len(visible))
+
+        handles = self.__handles
+
+        batches = {}
+        for slot in visible:
+            if slot == self.__hoverSlot:
+                continue
+            pen = handles[slot].getPen()
+            batch = batches.get(id(pen))
+            if batch is None:
+                batch = (pen, [])
+                batches[id(pen)] = batch
+            batch[1].extend(self.__slotLines(slot))
+
+        painter.setBrush(QtCore.Qt.NoBrush)
+        for pen, lines in batches.values():
+            painter.setPen(pen)
+            painter.drawLines(lines)
+
+        if self.__hoverSlot is not None and self.__hoverSlot in visible:
+            painter.setPen(handles[self.__hoverSlot].getHoverPen())
+            painter.drawLines(self.__slotLines(self.__hoverSlot))
+
+        lod = QtWidgets.QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        if lod < self.__labelLod:
+            return
+
+        p = self.__points
+        labelPen = None
+        for slot in visible:
+            connection = handles[slot]
+            if labelPen is None:
+                labelPen = connection.getLabelPen()
+                painter.setPen(labelPen)
+            # Only the first and last segments place the labels.
+            i = self.__offsets[slot]
+            j = i + 2 * self.__counts[slot] - 4
+            ends = [QtCore.QPointF(p[i], p[i + 1]), QtCore.QPointF(p[i + 2], p[i + 3])]
+            if j > i:
+                ends.extend((QtCore.QPointF(p[j], p[j + 1]), QtCore.QPointF(p[j + 2], p[j + 3])))
+            for point, (text, font) in zip(labelPositions(ends), connection.getLabels()):
+                painter.setFont(font)
+                painter.drawText(point, text)
@@ -0,0 +1,526 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+
+import bisect
+import collections
+import heapq
+import math
+import queue
+import threading
+
+from qtpy import QtCore
+
+from .graph_bounds import GraphBounds
+
+
+# ========
+# Routing
+# ========
+HEADING_RIGHT = 0
+HEADING_LEFT = 1
+HEADING_DOWN = 2
+HEADING_UP = 3
+REVERSE_HEADING = (HEADING_LEFT, HEADING_RIGHT, HEADING_UP, HEADING_DOWN)
+
+
+def simplifyRoute(points):
+    """Removes the points lying on a straight line between their neighbors."""
+
+    result = []
+    for point in points:
+        if result and point == result[-1]:
+            continue
+        if len(result) >= 2:
+            (ax, ay), (bx, by) = result[-2], result[-1]
+            if (ax == bx == point[0]) or (ay == by == point[1]):
+                result[-1] = point
+                continue
+        result.append(point)
+    return result
+
+
+def routeOrthogonal(start, end, startSide, endSide, obstacles, region, clearance=10.0, stub=20.0):
+    """Finds the orthogonal route with the fewest bends between two ports, around obstacle rects.
+
+    The route leaves the source and enters the target horizontally, through
+    a stub of the given length, and never turns back on itself, so the stubs
+    are always part of it. In between it follows a sparse visibility
+    grid, made of the lines through the stub ends and along the obstacles
+    grown by the clearance, and is the shortest of the routes with the fewest
+    bends on that grid.
+
+    Args:
+        start (tuple): (x, y) of the source port.
+        end (tuple): (x, y) of the target port.
+        startSide (int): 1 if the wire leaves the source to the right, -1 to the left.
+        endSide (int): 1 if the wire enters the target from the right, -1 from the left.
+        obstacles (list): (left, top, right, bottom) rects to go around.
+        region (tuple): (left, top, right, bottom) rect the route stays in.
+        clearance (float): Distance kept from the obstacles.
+        stub (float): Length of the horizontal segments at the ports.
+
+    Returns:
+        list: The (x, y) points of the route from start to end, or None if there is none in region.
+
+    """
+
+    a = (start[0] + startSide * stub, start[1])
+    b = (end[0] + endSide * stub, end[1])
+
+    def inside(point, rect):
+        return rect[0] < point[0] < rect[2] and rect[1] < point[1] < rect[3]
+
+    # Nodes packed closer than the clearance would hide the stub ends, those are not avoided.
+    rects = []
+    for left, top, right, bottom in obstacles:
+        rect = (left - clearance, top - clearance, right + clearance, bottom + clearance)
+        if not inside(a, rect) and not inside(b, rect):
+            rects.append(rect)
+
+    left, top, right, bottom = region
+    xs = set([a[0], b[0], (a[0] + b[0]) * 0.5, left, right])
+    ys = set([a[1], b[1], (a[1] + b[1]) * 0.5, top, bottom])
+    for rect in rects:
+        xs.update((rect[0], rect[2]))
+        ys.update((rect[1], rect[3]))
+    xs = sorted(x for x in xs if left <= x <= right)
+    ys = sorted(y for y in ys if top <= y <= bottom)
+    nx = len(xs)
+    ny = len(ys)
+    midXs = [(xs[i] + xs[i + 1]) * 0.5 for i in range(nx - 1)]
+    midYs = [(ys[j] + ys[j + 1]) * 0.5 for j in range(ny - 1)]
+
+    # Mark the grid points and segments strictly inside an obstacle.
+    freePoint = [[True] * nx for j in range(ny)]
+    freeH = [[True] * (nx - 1) for j in range(ny)]
+    freeV = [[True] * (ny - 1) for i in range(nx)]
+    for rectLeft, rectTop, rectRight, rectBottom in rects:
+        i0, i1 = bisect.bisect_right(xs, rectLeft), bisect.bisect_left(xs, rectRight)
+        j0, j1 = bisect.bisect_right(ys, rectTop), bisect.bisect_left(ys, rectBottom)
+        h0, h1 = bisect.bisect_right(midXs, rectLeft), bisect.bisect_left(midXs, rectRight)
+        v0, v1 = bisect.bisect_right(midYs, rectTop), bisect.bisect_left(midYs, rectBottom)
+        for j in range(j0, j1):
+            pointRow = freePoint[j]
+            for i in range(i0, i1):
+                pointRow[i] = False
+            segmentRow = freeH[j]
+            for i in range(h0, h1):
+                segmentRow[i] = False
+        for i in range(i0, i1):
+            segmentColumn = freeV[i]
+            for j in range(v0, v1):
+                segmentColumn[j] = False
+
+    # Dijkstra over (point, heading) states; a bend costs more than any straight run in the region.
+    # Headings are +x, -x, +y and -y, and the route never turns back on itself, so the stubs are kept.
+    bendCost = 4.0 * ((right - left) + (bottom - top)) + 1.0
+    source = (xs.index(a[0]), ys.index(a[1]), HEADING_RIGHT if startSide > 0 else HEADING_LEFT)
+    targetI, targetJ = xs.index(b[0]), ys.index(b[1])
+    targetHeading = HEADING_LEFT if endSide > 0 else HEADING_RIGHT
+    costs = {source: 0.0}
+    previous = {}
+    heap = [(0.0, source)]
+    found = None
+    while heap:
+        cost, state = heapq.heappop(heap)
+        if cost > costs.get(state, math.inf):
+            continue
+        i, j, heading = state
+        if i == targetI and j == targetJ:
+            # The wire enters the target through its stub.
+            if heading == targetHeading:
+                found = state
+                break
+            turned = (i, j, targetHeading)
+            if heading != REVERSE_HEADING[targetHeading] and cost + bendCost < costs.get(turned, math.inf):
+                costs[turned] = cost + bendCost
+                previous[turned] = state
+                heapq.heappush(heap, (cost + bendCost, turned))
+
+        neighbors = []
+        if i + 1 < nx and freeH[j][i] and freePoint[j][i + 1]:
+            neighbors.append((i + 1, j, HEADING_RIGHT, xs[i + 1] - xs[i]))
+        if i > 0 and freeH[j][i - 1] and freePoint[j][i - 1]:
+            neighbors.append((i - 1, j, HEADING_LEFT, xs[i] - xs[i - 1]))
+        if j + 1 < ny and freeV[i][j] and freePoint[j + 1][i]:
+            neighbors.append((i, j + 1, HEADING_DOWN, ys[j + 1] - ys[j]))
+        if j > 0 and freeV[i][j - 1] and freePoint[j - 1][i]:
+            neighbors.append((i, j - 1, HEADING_UP, ys[j] - ys[j - 1]))
+
+        for ni, nj, newHeading, length in neighbors:
+            if newHeading == REVERSE_HEADING[heading]:
+                continue
+            newCost = cost + length
+            if newHeading != heading:
+                newCost += bendCost
+            newState = (ni, nj, newHeading)
+            if newCost < costs.get(newState, math.inf):
+                costs[newState] = newCost
+                previous[newState] = state
+                heapq.heappush(heap, (newCost, newState))
+
+    if found is None:
+        return None
+
+    path = []
+    state = found
+    while state is not None:
+        path.append((xs[state[0]], ys[state[1]]))
+        state = previous.get(state)
+    path.reverse()
+    return simplifyRoute([tuple(start)] + path + [tuple(end)])
+
+
+class WireRouter(object):
+    """Routes the connections of a GraphView around the nodes.
+
+    Each connection gets an orthogonal route with the fewest bends around
+    the nodes near it, see routeOrthogonal. Only the nodes in the corridor of
+    a connection, the rect spanned by its end points grown by a margin, are
+    considered, and its route stays within the corridor. Nodes and corridors
+    are registered in uniform grids, so moving a node only re-routes the
+    connections whose corridors it leaves or enters, besides its own.
+
+    Routes are cached by their end points and the rects of the nodes in
+    their corridor, so moving a node back, or undoing a move, does not route
+    again.
+
+    Routing runs in a worker thread. It only gets plain coordinates, and the
+    routes are applied to the connections on the main thread once they are
+    ready; until then a connection is drawn with its default path. Without
+    the worker, routes are computed when the pending changes are flushed.
+
+    Connections without a route in their corridor, or with more than
+    maxObstacles nodes in it, keep their default path.
+
+    Args:
+        graph (GraphView): The graph.
+        clearance (float): Distance kept between the wires and the nodes.
+        stub (float): Length of the horizontal segments at the ports.
+        margin (float): Margin around the end points making up the corridor of a connection.
+        maxObstacles (int): Largest number of nodes routed around.
+        asynchronous (Boolean): True to route in a worker thread.
+        cacheSize (int): Number of routes kept in the cache.
+
+    """
+
+    __cellSize = 512.0
+    __flushInterval = 30
+    __pollInterval = 15
+
+    def __init__(self, graph, clearance=10.0, stub=20.0, margin=80.0, maxObstacles=40, asynchronous=True,
+                 cacheSize=4096):
+        self.__graph = graph
+        self.clearance = clearance
+        self.stub = stub
+        self.margin = margin
+        self.maxObstacles = maxObstacles
+        self.__asynchronous = asynchronous
+        self.__cacheSize = cacheSize
+
+        self.__nodeRects = {}
+        self.__nodeCells = {}
+        self.__nodeGrid = {}
+        self.__corridors = {}
+        self.__corridorCells = {}
+        self.__corridorGrid = {}
+
+        self.__routes = {}
+        self.__versions = {}
+        self.__dirty = set()
+        self.__cache = collections.OrderedDict()
+        self.__stats = {'routed': 0, 'cacheHits': 0, 'skipped': 0}
+
+        self.__jobs = queue.Queue()
+        self.__results = queue.Queue()
+        self.__pending = 0
+        self.__worker = None
+
+        self.__flushTimer = QtCore.QTimer(graph)
+        self.__flushTimer.setSingleShot(True)
+        self.__flushTimer.setInterval(self.__flushInterval)
+        self.__flushTimer.timeout.connect(self.flush)
+
+        self.__resultTimer = QtCore.QTimer(graph)
+        self.__resultTimer.setInterval(self.__pollInterval)
+        self.__resultTimer.timeout.connect(self.applyResults)
+
+    def isAsynchronous(self):
+        return self.__asynchronous
+
+    def close(self):
+        """Stops the worker and the timers; the router is not used afterwards."""
+
+        self.__flushTimer.stop()
+        self.__resultTimer.stop()
+        if self.__worker is not None:
+            self.__jobs.put(None)
+            self.__worker = None
+        self.clear()
+
+    def clear(self):
+        self.__nodeRects.clear()
+        self.__nodeCells.clear()
+        self.__nodeGrid.clear()
+        self.__corridors.clear()
+        self.__corridorCells.clear()
+        self.__corridorGrid.clear()
+        self.__routes.clear()
+        # Results still coming from the worker are dropped, as their connections are unknown.
+        self.__versions.clear()
+        self.__dirty.clear()
+
+    # ======
+    # Grids
+    # ======
+    def __cellKeys(self, rect):
+        size = self.__cellSize
+        left, top, right, bottom = rect
+        return [(i, j)
+                for i in range(int(math.floor(left / size)), int(math.floor(right / size)) + 1)
+                for j in range(int(math.floor(top / size)), int(math.floor(bottom / size)) + 1)]
+
+    @staticmethod
+    def __intersects(a, b):
+        return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+    def __setNodeRect(self, node, rect):
+        for cell in self.__nodeCells.pop(node, ()):
+            members = self.__nodeGrid[cell]
+            members.discard(node)
+            if not members:
+                del self.__nodeGrid[cell]
+        self.__nodeRects.pop(node, None)
+        if rect is None:
+            return
+
+        self.__nodeRects[node] = rect
+        cells = self.__cellKeys(rect)
+        self.__nodeCells[node] = cells
+        for cell in cells:
+            self.__nodeGrid.setdefault(cell, set()).add(node)
+
+    def __setCorridor(self, connection, rect):
+        for cell in self.__corridorCells.pop(connection, ()):
+            members = self.__corridorGrid[cell]
+            members.discard(connection)
+            if not members:
+                del self.__corridorGrid[cell]
+        self.__corridors.pop(connection, None)
+        if rect is None:
+            return
+
+        self.__corridors[connection] = rect
+        cells = self.__cellKeys(rect)
+        self.__corridorCells[connection] = cells
+        for cell in cells:
+            self.__corridorGrid.setdefault(cell, set()).add(connection)
+
+    def __nodesIn(self, rect):
+        nodes = set()
+        for cell in self.__cellKeys(rect):
+            nodes.update(self.__nodeGrid.get(cell, ()))
+        return [node for node in nodes if self.__intersects(self.__nodeRects[node], rect)]
+
+    def __invalidateCorridors(self, rect):
+        for cell in self.__cellKeys(rect):
+            for connection in self.__corridorGrid.get(cell, ()):
+                if self.__intersects(self.__corridors[connection], rect):
+                    self.__dirty.add(connection)
+
+    # =======
+    # Graph
+    # =======
+    def addNode(self, node):
+        rect = GraphBounds.nodeSceneRect(node)
+        self.__setNodeRect(node, rect)
+        self.__invalidateCorridors(rect)
+        self.__scheduleFlush()
+
+    def removeNode(self, node):
+        rect = self.__nodeRects.get(node)
+        self.__setNodeRect(node, None)
+        if rect is not None:
+            self.__invalidateCorridors(rect)
+            self.__scheduleFlush()
+
+    def nodeMoved(self, node, connections):
+        """Re-routes the connections of a node, and those whose corridors it left or entered.
+
+        Args:
+            node (Node): The node whose position or size changed.
+            connections (iterable): The connections of the node.
+
+        """
+
+        # Only addNode and removeNode make a node an obstacle.
+        oldRect = self.__nodeRects.get(node)
+        if oldRect is None:
+            return
+        rect = GraphBounds.nodeSceneRect(node)
+        if rect == oldRect:
+            return
+        self.__setNodeRect(node, rect)
+        self.__invalidateCorridors(oldRect)
+        self.__invalidateCorridors(rect)
+        self.__dirty.update(connections)
+        self.__scheduleFlush()
+
+    def addConnection(self, connection):
+        self.__dirty.add(connection)
+        self.__scheduleFlush()
+
+    def removeConnection(self, connection):
+        self.__setCorridor(connection, None)
+        self.__routes.pop(connection, None)
+        self.__versions.pop(connection, None)
+        self.__dirty.discard(connection)
+
+    # =======
+    # Routes
+    # =======
+    def getRoute(self, connection, srcPoint, dstPoint):
+        """Gets the route of a connection, if it was routed for the current position of its ports.
+
+        Args:
+            connection (Connection): The connection.
+            srcPoint (QPointF): Scene position of the source port.
+            dstPoint (QPointF): Scene position of the target port.
+
+        Returns:
+            list: The QPointF scene points of the route, or None if the connection has no route yet.
+
+        """
+
+        route = self.__routes.get(connection)
+        if route is None:
+            return None
+        src, dst, points = route
+        if points is None or src != (srcPoint.x(), srcPoint.y()) or dst != (dstPoint.x(), dstPoint.y()):
+            return None
+        return list(points)
+
+    def getStats(self):
+        """Gets the number of routes computed, taken from the cache, and skipped as too crowded."""
+
+        stats = dict(self.__stats)
+        stats['cached'] = len(self.__cache)
+        stats['pending'] = self.__pending
+        return stats
+
+    def __scheduleFlush(self):
+        if self.__dirty and not self.__flushTimer.isActive():
+            self.__flushTimer.start()
+
+    def __portSide(self, circle, point):
+        node = circle.getPort().getNode()
+        rect = self.__nodeRects.get(node)
+        if rect is None:
+            rect = GraphBounds.nodeSceneRect(node)
+        return 1 if point[0] >= (rect[0] + rect[2]) * 0.5 else -1
+
+    def flush(self):
+        """Routes the connections changed since the last flush, or hands them to the worker."""
+
+        self.__flushTimer.stop()
+        dirty = self.__dirty
+        self.__dirty = set()
+
+        for connection in dirty:
+            srcCircle = connection.getSrcPortCircle()
+            dstCircle = connection.getDstPortCircle()
+            srcPoint = srcCircle.centerInSceneCoords()
+            dstPoint = dstCircle.centerInSceneCoords()
+            src = (srcPoint.x(), srcPoint.y())
+            dst = (dstPoint.x(), dstPoint.y())
+            srcSide = self.__portSide(srcCircle, src)
+            dstSide = self.__portSide(dstCircle, dst)
+
+            extent = self.stub + self.margin
+            region = (min(src[0], dst[0]) - extent, min(src[1], dst[1]) - self.margin,
+                      max(src[0], dst[0]) + extent, max(src[1], dst[1]) + self.margin)
+            self.__setCorridor(connection, region)
+            version = self.__versions[connection] = self.__versions.get(connection, 0) + 1
+
+            obstacles = sorted(self.__nodeRects[node] for node in self.__nodesIn(region))
+            if len(obstacles) > self.maxObstacles:
+                self.__stats['skipped'] += 1
+                self.__setRoute(connection, src, dst, None)
+                continue
+
+            key = (src, dst, srcSide, dstSide, tuple(obstacles))
+            if key in self.__cache:
+                self.__cache.move_to_end(key)
+                self.__stats['cacheHits'] += 1
+                self.__setRoute(connection, src, dst, self.__cache[key])
+                continue
+
+            args = (src, dst, srcSide, dstSide, obstacles, region, self.clearance, self.stub)
+            if self.__asynchronous:
+                self.__startWorker()
+                self.__jobs.put((connection, version, key, args))
+                self.__pending += 1
+                if not self.__resultTimer.isActive():
+                    self.__resultTimer.start()
+            else:
+                self.__store(key, routeOrthogonal(*args))
+                self.__setRoute(connection, src, dst, self.__cache[key])
+
+    def applyResults(self):
+        """Applies the routes the worker finished; called by a timer while routes are pending."""
+
+        while True:
+            try:
+                connection, version, key, points = self.__results.get_nowait()
+            except queue.Empty:
+                break
+            self.__pending -= 1
+            if key is None:
+                continue
+            self.__store(key, points)
+            if self.__versions.get(connection) == version:
+                self.__setRoute(connection, key[0], key[1], self.__cache[key])
+
+        if self.__pending <= 0:
+            self.__pending = 0
+            self.__resultTimer.stop()
+
+    def __store(self, key, points):
+        self.__stats['routed'] += 1
+        if points is not None:
+            points = tuple(QtCore.QPointF(x, y) for x, y in points)
+        self.__cache[key] = points
+        self.__cache.move_to_end(key)
+        while len(self.__cache) > self.__cacheSize:
+            self.__cache.popitem(last=False)
+
+    def __setRoute(self, connection, src, dst, points):
+        old = self.__routes.get(connection)
+        self.__routes[connection] = (src, dst, points)
+        if (old[2] if old is not None else None) != points:
+            self.__graph._onConnectionGeometryChanged(connection)
+
+    # =======
+    # Worker
+    # =======
+    def __startWorker(self):
+        if self.__worker is None:
+            self.__worker = threading.Thread(target=self.__work, args=(self.__jobs, self.__results),
+                                             name='WireRouter')
+            self.__worker.daemon = True
+            self.__worker.start()
+
+    def __work(self, jobs, results):
+        # Runs in the worker thread, which only reads the versions.
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            connection, version, key, args = job
+            if self.__versions.get(connection) != version:
+                # Superseded by a newer job, e.g. while a node is dragged.
+                results.put((connection, version, None, None))
+                continue
+            results.put((connection, version, key, routeOrthogonal(*args)))
@@ -0,0 +1,292 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+"""Headless benchmark of the main graph operations across graph sizes.
+
+Builds graphs like bigGraph.py does, but on the offscreen Qt platform and
+without opening a window, and times node creation, port creation,
+connectPorts, a full scene paint into a QImage, a rubber band selection, a
+1k node drag, saveNodes, loadNodes and deleting 1k nodes. The results are
+written as JSON with the graph sizes attached.
+
+Usage:
+    python tests/benchmark.py --sizes 1000 10000 100000 --output bench.json
+
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+# Add the pyflowgraph module to the current environment if it does not already exist
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")))
+
+from qtpy import QtGui, QtWidgets, QtCore
+import qtpy
+
+from pyflowgraph.graph_view import GraphView
+from pyflowgraph.graph_view_widget import GraphViewWidget
+from pyflowgraph.node import Node
+from pyflowgraph.port import InputPort, OutputPort
+
+
+DEFAULT_SIZES = [1000, 5000, 20000, 50000, 100000, 200000]
+
+VIEW_SIZE = QtCore.QSize(1280, 800)
+PAINT_SIZE = QtCore.QSize(2048, 2048)
+
+NODE_SPACING_X = 200
+NODE_SPACING_Y = 100
+
+DRAG_NODES = 1000
+DRAG_STEPS = 20
+DELETE_NODES = 1000
+RUBBER_BAND_STEPS = 10
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silences the debug prints of the graph while an operation is timed."""
+
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull):
+            yield
+
+
+class Timer(object):
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextlib.contextmanager
+    def time(self, name):
+        start = time.perf_counter()
+        yield
+        self.timings[name] = time.perf_counter() - start
+
+
+def createGraph(options):
+    """Creates the widget and graph shared by all runs; the graph is reset between runs."""
+
+    widget = GraphViewWidget()
+    graph = GraphView(parent=widget)
+    graph.setFastLayout(options.fast_layout)
+    graph.setCompactPorts(options.compact_ports)
+    widget.setGraphView(graph)
+    widget.resize(VIEW_SIZE)
+    widget.show()
+    if options.wire_layer:
+        graph.setWireLayerEnabled(True)
+    return widget, graph
+
+
+def nodePos(index, count):
+    columns = int(math.ceil(math.sqrt(count)))
+    return QtCore.QPointF((index % columns) * NODE_SPACING_X, (index // columns) * NODE_SPACING_Y)
+
+
+def buildGraph(graph, count, timer):
+    """Builds a grid of nodes, each wired to the next one in its row."""
+
+    columns = int(math.ceil(math.sqrt(count)))
+    inColor = QtGui.QColor(128, 170, 170, 255)
+    outColor = QtGui.QColor(32, 255, 32, 255)
+
+    with quiet():
+        with timer.time('createNodes'):
+            nodes = [Node(graph, 'node' + str(i)) for i in range(count)]
+
+        with timer.time('createPorts'):
+            if graph.getCompactPorts():
+                for node in nodes:
+                    node.addCompactPort('InPort', inColor, 'MyDataX', 'In')
+                    node.addCompactPort('OutPort', outColor, 'MyDataX', 'Out')
+            else:
+                for node in nodes:
+                    node.addPort(InputPort(node, graph, 'InPort', inColor, 'MyDataX'))
+                    node.addPort(OutputPort(node, graph, 'OutPort', outColor, 'MyDataX'))
+
+        with timer.time('addNodes'):
+            for i, node in enumerate(nodes):
+                graph.addNode(node)
+                node.setPos(nodePos(i, count))
+
+        connections = 0
+        with timer.time('connectPorts'):
+            for i in range(count - 1):
+                if (i + 1) % columns != 0:
+                    graph.connectPorts(nodes[i], 'OutPort', nodes[i + 1], 'InPort')
+                    connections += 1
+
+    return nodes, connections
+
+
+def timePaint(graph, timer):
+    """Paints the whole scene into an image."""
+
+    QtWidgets.QApplication.processEvents()
+    image = QtGui.QImage(PAINT_SIZE, QtGui.QImage.Format_ARGB32_Premultiplied)
+    image.fill(0)
+    with timer.time('paintScene'):
+        painter = QtGui.QPainter(image)
+        painter.setRenderHints(graph.renderHints())
+        graph.scene().render(painter, QtCore.QRectF(image.rect()), graph.scene().itemsBoundingRect())
+        painter.end()
+
+
+def sendMouseEvent(graph, eventType, viewPos, button, buttons):
+    event = QtGui.QMouseEvent(eventType, QtCore.QPointF(viewPos), button, buttons, QtCore.Qt.NoModifier)
+    if eventType == QtCore.QEvent.MouseButtonPress:
+        graph.mousePressEvent(event)
+    elif eventType == QtCore.QEvent.MouseMove:
+        graph.mouseMoveEvent(event)
+    else:
+        graph.mouseReleaseEvent(event)
+
+
+def timeRubberBand(graph, timer):
+    """Drags a selection rect over the view, through the view's mouse handlers."""
+
+    graph.setTransform(QtGui.QTransform())
+    graph.panTo(QtCore.QPointF(VIEW_SIZE.width() * 0.5 - 50, VIEW_SIZE.height() * 0.5 - 50))
+    QtWidgets.QApplication.processEvents()
+
+    viewport = graph.viewport().rect()
+    start = graph.mapFromScene(QtCore.QPointF(-25, -25))
+    end = viewport.bottomRight()
+    with quiet():
+        with timer.time('rubberBandSelect'):
+            sendMouseEvent(graph, QtCore.QEvent.MouseButtonPress, start, QtCore.Qt.LeftButton, QtCore.Qt.LeftButton)
+            for step in range(1, RUBBER_BAND_STEPS + 1):
+                pos = start + (end - start) * step / RUBBER_BAND_STEPS
+                sendMouseEvent(graph, QtCore.QEvent.MouseMove, pos, QtCore.Qt.NoButton, QtCore.Qt.LeftButton)
+            sendMouseEvent(graph, QtCore.QEvent.MouseButtonRelease, end, QtCore.Qt.LeftButton, QtCore.Qt.NoButton)
+    graph.clearSelection()
+
+
+def selectNodes(graph, nodes):
+    graph.clearSelection(emitSignal=False)
+    for node in nodes:
+        graph.selectNode(node, emitSignal=False)
+
+
+def timeDrag(graph, nodes, timer):
+    """Moves 1k selected nodes in steps, as a node drag does."""
+
+    selectNodes(graph, nodes[:DRAG_NODES])
+    delta = QtCore.QPointF(5, 5)
+    with timer.time('dragNodes'):
+        for step in range(DRAG_STEPS):
+            graph.moveSelectedNodes(delta)
+        graph.endMoveSelectedNodes(delta * DRAG_STEPS)
+        QtWidgets.QApplication.processEvents()
+    graph.clearSelection()
+
+
+def timeSaveLoad(graph, fileName, timer):
+    with quiet():
+        with timer.time('saveNodes'):
+            graph.saveNodes(graph.getNodes(), fileName)
+
+        graph.reset()
+        with timer.time('loadNodes'):
+            graph.loadNodes(fileName, QtCore.QPointF(0, 0))
+
+
+def timeDelete(graph, timer):
+    nodes = list(graph.getNodes().values())[:DELETE_NODES]
+    selectNodes(graph, nodes)
+    with quiet():
+        with timer.time('deleteNodes'):
+            graph.deleteSelectedNodes()
+
+
+def runSize(graph, count, workDir):
+    """Runs all timed operations on a graph of count nodes.
+
+    Returns:
+        dict: The graph sizes and the timings in seconds.
+
+    """
+
+    graph.reset()
+    timer = Timer()
+
+    nodes, connections = buildGraph(graph, count, timer)
+    ports = sum(len(node.getPorts()) for node in nodes)
+
+    timePaint(graph, timer)
+    timeRubberBand(graph, timer)
+    timeDrag(graph, nodes, timer)
+    timeSaveLoad(graph, os.path.join(workDir, 'graph%d.json' % count), timer)
+    timeDelete(graph, timer)
+
+    graph.reset()
+    QtWidgets.QApplication.processEvents()
+
+    return {
+        'nodes': count,
+        'ports': ports,
+        'connections': connections,
+        'timings': timer.timings,
+        }
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Node counts of the graphs to benchmark.')
+    parser.add_argument('--output', help='JSON file to write the results to; printed if omitted.')
+    parser.add_argument('--fast-layout', action='store_true', help='Use the fixed-geometry node layout.')
+    parser.add_argument('--compact-ports', action='store_true', help='Use compact ports.')
+    parser.add_argument('--wire-layer', action='store_true', help='Draw connections with a wire layer.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parseArgs(argv)
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+    widget, graph = createGraph(options)
+    app.processEvents()
+
+    runs = []
+    workDir = tempfile.mkdtemp(prefix='pyflowgraph-bench-')
+    for count in options.sizes:
+        sys.stderr.write('benchmarking %d nodes\n' % count)
+        runs.append(runSize(graph, count, workDir))
+
+    results = {
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'qtApi': qtpy.API_NAME,
+        'qtVersion': qtpy.QT_VERSION,
+        'platform': platform.platform(),
+        'options': {
+            'fastLayout': options.fast_layout,
+            'compactPorts': options.compact_ports,
+            'wireLayer': options.wire_layer,
+            },
+        'runs': runs,
+        }
+
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if options.output:
+        with open(options.output, 'w') as outFile:
+            outFile.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,508 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+"""Deterministic synthetic wiring graphs for benchmarks, profiling and fuzzing.
+
+A GraphGenerator turns a seed and target node, port and wire counts into a
+GraphDescription: cabinets with many terminals, devices with a few ports,
+nodes chained through glands (as added by Node.addGlands), fan-out and fan-in
+buses, long cables between clusters and local point to point wiring, laid out
+in clusters. The same description can be built into a GraphView or written in
+the format of GraphView.saveNodes, for loadNodes.
+
+Usage:
+    python tests/graph_generator.py --nodes 10000 --seed 1 --output graph.json
+    python tests/graph_generator.py --nodes 2000 --show
+
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+
+# Add the pyflowgraph module to the current environment if it does not already exist
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")))
+
+from qtpy import QtGui
+
+
+DATA_TYPES = ('Power', 'Signal', 'Data')
+
+PORT_COLORS = {
+    'Power': (1.0, 0.3137, 0.3137, 1.0),
+    'Signal': (0.502, 0.6667, 0.6667, 1.0),
+    'Data': (0.1255, 1.0, 0.1255, 1.0),
+    }
+GLAND_DATA_TYPE = 'Gland'
+
+# Matches the default node color of the style registry.
+NODE_COLOR = (0.6039, 0.8039, 0.1961, 1.0)
+
+DEVICE_WIDTH = 120
+CABINET_WIDTH = 240
+PORT_SPACING = 20
+HEADER_HEIGHT = 30
+
+CLUSTER_SPACING = 5000.0
+CLUSTER_SPREAD = 800.0
+CLUSTER_NODES = 200
+GRID_SNAP = 20.0
+
+# Node.addGlands places the glands from this offset, one pair per row.
+GLAND_FIRST_ROW = 40
+GLAND_OFFSET_X = 150
+
+
+class PortSpec(object):
+
+    __slots__ = ('node', 'name', 'kind', 'dataType', 'x', 'y', 'wires')
+
+    def __init__(self, node, name, kind, dataType, x, y):
+        self.node = node
+        self.name = name
+        self.kind = kind
+        self.dataType = dataType
+        self.x = x
+        self.y = y
+        self.wires = []
+
+
+class NodeSpec(object):
+
+    __slots__ = ('name', 'role', 'cluster', 'x', 'y', 'width', 'height', 'ports', 'glands')
+
+    def __init__(self, name, role, cluster):
+        self.name = name
+        self.role = role
+        self.cluster = cluster
+        self.x = 0.0
+        self.y = 0.0
+        self.width = DEVICE_WIDTH
+        self.height = HEADER_HEIGHT
+        self.ports = []
+        self.glands = []
+
+    def addPort(self, name, kind, dataType):
+        rows = sum(1 for port in self.ports if port.kind == kind)
+        x = 0 if kind == 'In' else self.width
+        port = PortSpec(self, name, kind, dataType, x, HEADER_HEIGHT + rows * PORT_SPACING)
+        self.ports.append(port)
+        self.height = max(self.height, HEADER_HEIGHT + (rows + 1) * PORT_SPACING)
+        return port
+
+    def addGlandPair(self):
+        """Adds the in and out gland Node.addGlands would add next, with its names and positions."""
+
+        index = len(self.glands)
+        y = GLAND_FIRST_ROW + (index // 2) * PORT_SPACING
+        number = index + 1
+        glandIn = PortSpec(self, '.' + self.name + '.I.' + str(number).zfill(2), 'Gland', GLAND_DATA_TYPE,
+                           -GLAND_OFFSET_X, y)
+        glandOut = PortSpec(self, '.' + self.name + '.O.' + str(number + 1).zfill(2), 'Gland', GLAND_DATA_TYPE,
+                            self.width + GLAND_OFFSET_X, y)
+        self.glands.extend((glandIn, glandOut))
+        return glandIn, glandOut
+
+    def allPorts(self):
+        return self.ports + self.glands
+
+
+class GraphDescription(object):
+    """Nodes, ports and wires of a generated graph, independent of Qt."""
+
+    def __init__(self, seed):
+        self.seed = seed
+        self.nodes = []
+        self.wires = []
+
+    def portCount(self):
+        return sum(len(node.ports) + len(node.glands) for node in self.nodes)
+
+    def addWire(self, srcPort, dstPort, kind):
+        wire = (srcPort, dstPort, kind)
+        self.wires.append(wire)
+        srcPort.wires.append(wire)
+        return wire
+
+    def stats(self):
+        kinds = {}
+        for wire in self.wires:
+            kinds[wire[2]] = kinds.get(wire[2], 0) + 1
+        return {
+            'seed': self.seed,
+            'nodes': len(self.nodes),
+            'ports': self.portCount(),
+            'wires': len(self.wires),
+            'wireKinds': kinds,
+            }
+
+    # =======
+    # Output
+    # =======
+    def build(self, graph):
+        """Builds the graph into a GraphView.
+
+        Ports are added as compact ports if the graph has them enabled, and
+        glands are added with Node.addGlands.
+
+        Returns:
+            dict: Node name to the created Node.
+
+        """
+
+        from pyflowgraph.node import Node
+        from pyflowgraph.port import InputPort, OutputPort
+
+        compact = graph.getCompactPorts()
+        colors = dict((dataType, QtGui.QColor.fromRgbF(*rgba)) for dataType, rgba in PORT_COLORS.items())
+
+        created = {}
+        graph.beginBatch()
+        try:
+            for spec in self.nodes:
+                node = Node(graph, spec.name, xSize=spec.width, ySize=spec.height)
+                for port in spec.ports:
+                    color = colors[port.dataType]
+                    if compact:
+                        node.addCompactPort(port.name, color, port.dataType, port.kind)
+                    elif port.kind == 'In':
+                        node.addPort(InputPort(node, graph, port.name, color, port.dataType))
+                    else:
+                        node.addPort(OutputPort(node, graph, port.name, color, port.dataType))
+                for i in range(len(spec.glands) // 2):
+                    node.addGlands()
+                graph.addNode(node)
+                node.setPos(spec.x, spec.y)
+                created[spec.name] = node
+
+            for srcPort, dstPort, kind in self.wires:
+                graph.connectPorts(created[srcPort.node.name], srcPort.name, created[dstPort.node.name], dstPort.name)
+        finally:
+            graph.endBatch()
+
+        return created
+
+    def toSaveFormat(self):
+        """Gets the graph in the format written by GraphView.saveNodes.
+
+        Each wire is listed once, with the other wires of its source port.
+
+        Returns:
+            dict: The document, ready for json.dump.
+
+        """
+
+        def colorFields(rgba):
+            return {
+                'colorR': str(rgba[0]),
+                'colorG': str(rgba[1]),
+                'colorB': str(rgba[2]),
+                'colorT': str(rgba[3]),
+                }
+
+        nodes = []
+        for spec in self.nodes:
+            nodeD = {
+                'width': str(spec.width),
+                'height': str(spec.height),
+                'x': spec.x,
+                'y': spec.y,
+                'name': spec.name,
+                'ports': [],
+                }
+            nodeD.update(colorFields(NODE_COLOR))
+
+            for port in spec.allPorts():
+                portD = {
+                    'x': str(port.x),
+                    'y': str(port.y),
+                    'connectionPointType': port.kind,
+                    'dataType': port.dataType,
+                    'name': port.name,
+                    'connections': [],
+                    }
+                portD.update(colorFields(NODE_COLOR if port.kind == 'Gland' else PORT_COLORS[port.dataType]))
+                for srcPort, dstPort, kind in port.wires:
+                    portD['connections'].append({
+                        'nodeFrom': srcPort.node.name,
+                        'nodeTo': dstPort.node.name,
+                        'termFrom': srcPort.name,
+                        'termTo': dstPort.name,
+                        'srcPortCircle': '',
+                        'dstPortCircle': '',
+                        'node': [],
+                        })
+                nodeD['ports'].append(portD)
+            nodes.append(nodeD)
+
+        return {'nodes': nodes}
+
+    def save(self, fileName):
+        with open(fileName, 'w') as outFile:
+            json.dump(self.toSaveFormat(), outFile, indent=6)
+
+
+class GraphGenerator(object):
+    """Generates wiring graphs from a seed and target sizes.
+
+    The same arguments always produce the same graph. Node, port and wire
+    counts are targets: the node count is exact, ports and wires land within a
+    few percent of theirs.
+
+    Args:
+        seed (int): Seed of the random generator.
+        nodes (int): Number of nodes.
+        ports (int): Target number of ports, including glands; 4 per node by default.
+        wires (int): Target number of wires; 1.5 per node by default.
+        cabinetFraction (float): Share of nodes which are cabinets with many terminals.
+        glandFraction (float): Share of nodes chained through glands.
+        busFraction (float): Share of the wires in fan-out and fan-in buses.
+        longCableFraction (float): Share of the wires running between clusters.
+        clusterSize (int): Average number of nodes per cluster.
+
+    """
+
+    def __init__(self, seed=0, nodes=1000, ports=None, wires=None, cabinetFraction=0.05, glandFraction=0.1,
+                 busFraction=0.2, longCableFraction=0.05, clusterSize=CLUSTER_NODES):
+        self.seed = seed
+        self.nodeCount = max(2, int(nodes))
+        self.portCount = int(ports) if ports is not None else self.nodeCount * 4
+        self.wireCount = int(wires) if wires is not None else int(self.nodeCount * 1.5)
+        self.cabinetFraction = cabinetFraction
+        self.glandFraction = glandFraction
+        self.busFraction = busFraction
+        self.longCableFraction = longCableFraction
+        self.clusterSize = max(1, int(clusterSize))
+
+    def generate(self):
+        rng = random.Random(self.seed)
+        description = GraphDescription(self.seed)
+
+        clusterCount = max(1, int(round(float(self.nodeCount) / self.clusterSize)))
+        cabinetCount = max(1, int(round(self.nodeCount * self.cabinetFraction)))
+        glandCount = int(round(self.nodeCount * self.glandFraction))
+        if cabinetCount + glandCount > self.nodeCount:
+            glandCount = max(0, self.nodeCount - cabinetCount)
+
+        # Roles and clusters.
+        roles = ['cabinet'] * cabinetCount + ['gland'] * glandCount
+        roles += ['device'] * (self.nodeCount - len(roles))
+        for i, role in enumerate(roles):
+            node = NodeSpec('%s%d' % (role, i), role, i % clusterCount)
+            if role == 'cabinet':
+                node.width = CABINET_WIDTH
+            description.nodes.append(node)
+
+        glandChains = self.__makeGlandChains(rng, description)
+        self.__addPorts(rng, description, len(glandChains))
+        self.__layout(rng, description, clusterCount)
+        self.__wire(rng, description, glandChains, clusterCount)
+        return description
+
+    # ======
+    # Ports
+    # ======
+    def __makeGlandChains(self, rng, description):
+        glandNodes = [node for node in description.nodes if node.role == 'gland']
+        chains = []
+        i = 0
+        while i < len(glandNodes):
+            length = rng.randint(3, 8)
+            chain = glandNodes[i:i + length]
+            if len(chain) > 1:
+                chains.append(chain)
+            i += length
+        return chains
+
+    def __addPorts(self, rng, description, chainCount):
+        # Every chained node gets one or two gland pairs; the rest of the budget goes
+        # to terminals, about twenty times as many on a cabinet as on a device.
+        glandPorts = 0
+        for node in description.nodes:
+            if node.role == 'gland':
+                for i in range(rng.randint(1, 2)):
+                    node.addGlandPair()
+                    glandPorts += 2
+
+        terminalNodes = [node for node in description.nodes if node.role != 'gland']
+        weights = [20.0 if node.role == 'cabinet' else 1.0 for node in terminalNodes]
+        budget = max(self.portCount - glandPorts, 2 * len(terminalNodes))
+        totalWeight = sum(weights)
+
+        for node, weight in zip(terminalNodes, weights):
+            share = budget * weight / totalWeight
+            count = max(2, int(round(share * rng.uniform(0.75, 1.25))))
+            inputs = max(1, count // 2)
+            outputs = max(1, count - inputs)
+            if node.role == 'cabinet':
+                dataType = rng.choice(DATA_TYPES)
+                for i in range(inputs):
+                    node.addPort('X1:%03d' % (i + 1), 'In', dataType if rng.random() < 0.8 else rng.choice(DATA_TYPES))
+                for i in range(outputs):
+                    node.addPort('X2:%03d' % (i + 1), 'Out', dataType if rng.random() < 0.8 else rng.choice(DATA_TYPES))
+            else:
+                for i in range(inputs):
+                    node.addPort('In%d' % (i + 1), 'In', rng.choice(DATA_TYPES))
+                for i in range(outputs):
+                    node.addPort('Out%d' % (i + 1), 'Out', rng.choice(DATA_TYPES))
+
+    # =======
+    # Layout
+    # =======
+    def __layout(self, rng, description, clusterCount):
+        columns = int(math.ceil(math.sqrt(clusterCount)))
+        for node in description.nodes:
+            centerX = (node.cluster % columns) * CLUSTER_SPACING
+            centerY = (node.cluster // columns) * CLUSTER_SPACING
+            x = rng.gauss(centerX, CLUSTER_SPREAD)
+            y = rng.gauss(centerY, CLUSTER_SPREAD)
+            node.x = math.floor(x / GRID_SNAP) * GRID_SNAP
+            node.y = math.floor(y / GRID_SNAP) * GRID_SNAP
+
+    # =======
+    # Wiring
+    # =======
+    def __wire(self, rng, description, glandChains, clusterCount):
+        # Ports by (cluster, kind, data type); free ports are used first.
+        free = {}
+        used = {}
+        for node in description.nodes:
+            for port in node.ports:
+                free.setdefault((node.cluster, port.kind, port.dataType), []).append(port)
+        for ports in free.values():
+            rng.shuffle(ports)
+
+        def takePort(cluster, kind, dataType):
+            key = (cluster, kind, dataType)
+            ports = free.get(key)
+            if ports:
+                port = ports.pop()
+                used.setdefault(key, []).append(port)
+                return port
+            ports = used.get(key)
+            if ports:
+                return rng.choice(ports)
+            return None
+
+        def remaining():
+            return self.wireCount - len(description.wires)
+
+        # Cables running through glands from one node of a chain to the next.
+        for chain in glandChains:
+            for a, b in zip(chain[:-1], chain[1:]):
+                pairs = min(len(a.glands), len(b.glands)) // 2
+                for i in range(pairs):
+                    if remaining() <= 0:
+                        return
+                    description.addWire(a.glands[2 * i + 1], b.glands[2 * i], 'gland')
+
+        busWires = int(self.wireCount * self.busFraction)
+        longWires = int(self.wireCount * self.longCableFraction)
+
+        # Fan-out and fan-in buses inside a cluster.
+        made = 0
+        attempts = 0
+        while made < busWires and remaining() > 0 and attempts < busWires * 4:
+            attempts += 1
+            cluster = rng.randrange(clusterCount)
+            dataType = rng.choice(DATA_TYPES)
+            width = rng.randint(4, 16)
+            if rng.random() < 0.5:
+                src = takePort(cluster, 'Out', dataType)
+                if src is None:
+                    continue
+                for i in range(min(width, remaining(), busWires - made)):
+                    dst = takePort(cluster, 'In', dataType)
+                    if dst is None or dst.node is src.node:
+                        continue
+                    description.addWire(src, dst, 'fanOut')
+                    made += 1
+            else:
+                dst = takePort(cluster, 'In', dataType)
+                if dst is None:
+                    continue
+                for i in range(min(width, remaining(), busWires - made)):
+                    src = takePort(cluster, 'Out', dataType)
+                    if src is None or src.node is dst.node:
+                        continue
+                    description.addWire(src, dst, 'fanIn')
+                    made += 1
+
+        # Long cables between clusters.
+        made = 0
+        attempts = 0
+        while clusterCount > 1 and made < longWires and remaining() > 0 and attempts < longWires * 4:
+            attempts += 1
+            dataType = rng.choice(DATA_TYPES)
+            srcCluster = rng.randrange(clusterCount)
+            dstCluster = rng.randrange(clusterCount)
+            if srcCluster == dstCluster:
+                continue
+            src = takePort(srcCluster, 'Out', dataType)
+            dst = takePort(dstCluster, 'In', dataType)
+            if src is None or dst is None:
+                continue
+            description.addWire(src, dst, 'longCable')
+            made += 1
+
+        # Local point to point wiring for the rest.
+        attempts = 0
+        while remaining() > 0 and attempts < self.wireCount * 4:
+            attempts += 1
+            cluster = rng.randrange(clusterCount)
+            dataType = rng.choice(DATA_TYPES)
+            src = takePort(cluster, 'Out', dataType)
+            dst = takePort(cluster, 'In', dataType)
+            if src is None or dst is None or src.node is dst.node:
+                continue
+            description.addWire(src, dst, 'local')
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--nodes', type=int, default=1000)
+    parser.add_argument('--ports', type=int, help='Target port count, 4 per node by default.')
+    parser.add_argument('--wires', type=int, help='Target wire count, 1.5 per node by default.')
+    parser.add_argument('--output', help='Writes the graph in the saveNodes format to this file.')
+    parser.add_argument('--show', action='store_true', help='Opens the graph in a GraphView.')
+    parser.add_argument('--fast-layout', action='store_true', help='Use the fixed-geometry node layout.')
+    parser.add_argument('--compact-ports', action='store_true', help='Use compact ports.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parseArgs(argv)
+
+    generator = GraphGenerator(seed=options.seed, nodes=options.nodes, ports=options.ports, wires=options.wires)
+    description = generator.generate()
+    sys.stderr.write(json.dumps(description.stats(), sort_keys=True) + '\n')
+
+    if options.output:
+        description.save(options.output)
+
+    if options.show:
+        from qtpy import QtWidgets
+        from pyflowgraph.graph_view import GraphView
+        from pyflowgraph.graph_view_widget import GraphViewWidget
+
+        app = QtWidgets.QApplication(sys.argv[:1])
+        widget = GraphViewWidget()
+        graph = GraphView(parent=widget)
+        graph.setFastLayout(options.fast_layout)
+        graph.setCompactPorts(options.compact_ports)
+        description.build(graph)
+        widget.setGraphView(graph)
+        widget.show()
+        graph.frameAllNodes()
+        return app.exec_()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
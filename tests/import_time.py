@@ -0,0 +1,128 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+"""Measures how long importing the package takes, and what it pulls in.
+
+Imports a module of the package in fresh interpreters with -X importtime and
+reports the median wall time, the median cumulative import time of the
+package, the modules with the largest self time, and which Qt bindings and
+compatibility packages ended up loaded.
+
+Usage:
+    python tests/import_time.py
+    python tests/import_time.py --module pyflowgraph.graph_view --runs 20 --output imports.json
+
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+
+# Modules worth knowing about when they are loaded by the import.
+WATCHED_MODULES = ('PySide2', 'PySide6', 'PyQt5', 'PyQt6', 'qtpy', 'future', 'past', 'six', 'dicttoxml', 'numpy')
+
+SNIPPET = '''
+import sys, json
+import %s
+print(json.dumps(sorted(name for name in %r if name in sys.modules)))
+'''
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) * 0.5
+
+
+def parseImportTimes(text):
+    """Parses the -X importtime report.
+
+    Returns:
+        dict: Module name to its (self, cumulative) import time in microseconds.
+
+    """
+
+    times = {}
+    for line in text.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        times[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+    return times
+
+
+def importOnce(module):
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', SNIPPET % (module, WATCHED_MODULES)],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, env=env,
+                             cwd=ROOT)
+    seconds = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError("Importing %s failed:\n%s" % (module, process.stderr))
+
+    loaded = json.loads(process.stdout.strip().splitlines()[-1])
+    return seconds, parseImportTimes(process.stderr), loaded
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--module', default='pyflowgraph.graph_view_widget', help='Module to import.')
+    parser.add_argument('--runs', type=int, default=10, help='Number of fresh interpreters to import in.')
+    parser.add_argument('--top', type=int, default=15, help='Number of slowest modules to list.')
+    parser.add_argument('--output', help='JSON file to write the results to.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parseArgs(argv)
+
+    wallTimes = []
+    packageTimes = []
+    selfTimes = {}
+    loaded = []
+    for run in range(options.runs):
+        seconds, times, loaded = importOnce(options.module)
+        wallTimes.append(seconds)
+        packageTimes.append(times.get('pyflowgraph', (0, 0))[1] / 1e6)
+        for name, (selfTime, cumulative) in times.items():
+            selfTimes.setdefault(name, []).append(selfTime / 1e6)
+
+    slowest = sorted(((median(values), name) for name, values in selfTimes.items()), reverse=True)[:options.top]
+    results = {
+        'module': options.module,
+        'runs': options.runs,
+        'wallSeconds': median(wallTimes),
+        'packageSeconds': median(packageTimes),
+        'slowest': [{'module': name, 'selfSeconds': seconds} for seconds, name in slowest],
+        'loaded': loaded,
+        }
+
+    print('import %s: %.1f ms wall, %.1f ms in pyflowgraph (median of %d)' % (
+        options.module, results['wallSeconds'] * 1000.0, results['packageSeconds'] * 1000.0, options.runs))
+    print('loaded: %s' % (', '.join(loaded) or 'none of the watched modules'))
+    for seconds, name in slowest:
+        print('    %-40s %8.2f ms' % (name, seconds * 1000.0))
+
+    if options.output:
+        with open(options.output, 'w') as outFile:
+            json.dump(results, outFile, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,260 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+"""Reports what nodes, ports and connections cost in memory, and what leaks.
+
+For each graph size, nodes, then their ports, then the connections between
+them are added on the offscreen Qt platform. Each phase is measured with
+tracemalloc, broken down by the class allocating it, and with the process
+resident size. The marginal cost of a node, a port and a connection is the
+slope of the bytes over the sizes. Afterwards connections and nodes are
+removed and the graph is reset, and any item object still alive is
+reported as leaked.
+
+Usage:
+    python tests/memory_report.py --sizes 500 1000 2000 --output memory.json
+
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+# Add the pyflowgraph module to the current environment if it does not already exist
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")))
+
+from qtpy import QtGui, QtWidgets, QtCore
+
+from pyflowgraph import memory
+from pyflowgraph.connection import Connection
+from pyflowgraph.node import Node
+from pyflowgraph.port import InputPort, OutputPort
+
+from benchmark import quiet, createGraph, nodePos
+
+
+DEFAULT_SIZES = [250, 500, 1000, 2000]
+
+PHASES = ('nodes', 'ports', 'connections')
+
+
+def slope(xs, ys):
+    """Gets the least squares slope of ys over xs, or None with fewer than two sizes."""
+
+    n = len(xs)
+    if n < 2:
+        return None
+    meanX = float(sum(xs)) / n
+    meanY = float(sum(ys)) / n
+    denominator = sum((x - meanX) ** 2 for x in xs)
+    if denominator == 0:
+        return None
+    return sum((x - meanX) * (y - meanY) for x, y in zip(xs, ys)) / denominator
+
+
+def settle():
+    """Runs the pending events, deletes the objects scheduled for deletion and collects cycles.
+
+    Called before measuring, so a phase does not see the teardown of the previous one.
+
+    """
+
+    QtWidgets.QApplication.processEvents()
+    QtCore.QCoreApplication.sendPostedEvents(None, QtCore.QEvent.DeferredDelete)
+    gc.collect()
+
+
+def measurePhase(tracker, operation):
+    """Runs an operation and measures what it allocated.
+
+    Returns:
+        dict: Python heap bytes 'byClass' and in 'total', and the 'rss' growth in bytes, or None.
+
+    """
+
+    settle()
+    rssBefore = memory.residentBytes()
+    before = tracker.snapshot()
+    operation()
+    settle()
+    after = tracker.snapshot()
+    rssAfter = memory.residentBytes()
+
+    byClass = tracker.bytesByClass(before, after)
+    return {
+        'byClass': byClass,
+        'total': sum(byClass.values()),
+        'rss': None if rssBefore is None or rssAfter is None else rssAfter - rssBefore,
+        }
+
+
+def runSize(graph, tracker, count):
+    """Builds a graph of count nodes in phases and measures each phase.
+
+    Returns:
+        dict: The item counts of each phase and their measurements, plus the scene and live item counts.
+
+    """
+
+    graph.reset()
+    settle()
+    inColor = QtGui.QColor(128, 170, 170, 255)
+    outColor = QtGui.QColor(32, 255, 32, 255)
+    nodes = []
+
+    def addNodes():
+        for i in range(count):
+            node = Node(graph, 'node' + str(i))
+            graph.addNode(node)
+            node.setPos(nodePos(i, count))
+            nodes.append(node)
+
+    def addPorts():
+        for node in nodes:
+            node.addPort(InputPort(node, graph, 'InPort', inColor, 'MyDataX'))
+            node.addPort(OutputPort(node, graph, 'OutPort', outColor, 'MyDataX'))
+
+    def connectPorts():
+        for i in range(count - 1):
+            graph.connectPorts(nodes[i], 'OutPort', nodes[i + 1], 'InPort')
+
+    result = {'nodes': count, 'ports': count * 2, 'connections': count - 1}
+    with quiet():
+        result['phases'] = {
+            'nodes': measurePhase(tracker, addNodes),
+            'ports': measurePhase(tracker, addPorts),
+            'connections': measurePhase(tracker, connectPorts),
+            }
+    result['sceneItems'] = memory.sceneItemCounts(graph)
+    result['liveItems'] = memory.liveItems()
+    return result
+
+
+def checkLeaks(graph):
+    """Removes what the last run built in steps and looks for leaked items after each.
+
+    Returns:
+        dict: Per step, the leaked object count by class name.
+
+    """
+
+    def describe(leaks):
+        counts = {}
+        for obj in leaks:
+            name = type(obj).__name__
+            counts[name] = counts.get(name, 0) + 1
+        return counts
+
+    steps = {}
+    with quiet():
+        connections = [item for item in graph.scene().items() if isinstance(item, Connection)]
+        for connection in connections[:len(connections) // 2]:
+            graph.removeConnection(connection)
+        del connections
+        settle()
+        steps['removeConnection'] = describe(memory.findLeaks(graph))
+
+        nodes = list(graph.getNodes().values())
+        for node in nodes[:len(nodes) // 2]:
+            node.disconnectAllPorts()
+            graph.removeNode(node)
+        del nodes
+        settle()
+        steps['removeNode'] = describe(memory.findLeaks(graph))
+
+        graph.reset()
+        settle()
+        steps['reset'] = describe(memory.findLeaks(graph))
+    return steps
+
+
+def marginalCosts(runs):
+    """Gets the bytes each node, port and connection adds, from the slope over the sizes."""
+
+    costs = {}
+    for phase in PHASES:
+        counts = [run[phase] for run in runs]
+        python = slope(counts, [run['phases'][phase]['total'] for run in runs])
+        rssValues = [run['phases'][phase]['rss'] for run in runs]
+        rss = None if None in rssValues else slope(counts, rssValues)
+
+        largest = runs[-1]
+        byClass = dict((name, float(size) / largest[phase])
+                       for name, size in largest['phases'][phase]['byClass'].items())
+        costs[phase] = {'pythonBytes': python, 'rssBytes': rss, 'pythonBytesByClass': byClass}
+    return costs
+
+
+def formatCost(value):
+    # A slope which is not positive is noise, e.g. memory returned by an earlier teardown, not a cost.
+    if value is None:
+        return '-'
+    if value <= 0:
+        return 'unreliable (slope <= 0)'
+    return '%.0f bytes' % value
+
+
+def formatReport(costs, leaks):
+    lines = []
+    for phase in PHASES:
+        cost = costs[phase]
+        item = phase[:-1]
+        rss = formatCost(cost['rssBytes'])
+        python = formatCost(cost['pythonBytes'])
+        lines.append('per %s: python heap %s, resident %s' % (item, python, rss))
+        for name, size in sorted(cost['pythonBytesByClass'].items(), key=lambda entry: -entry[1]):
+            lines.append('    %-20s %10.0f' % (name, size))
+
+    for step in ('removeConnection', 'removeNode', 'reset'):
+        counts = leaks[step]
+        if counts:
+            lines.append('leaked after %s: %s' % (step, ', '.join('%d %s' % (n, name)
+                                                              for name, n in sorted(counts.items()))))
+        else:
+            lines.append('leaked after %s: none' % step)
+    return '\n'.join(lines)
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Node counts of the graphs to measure.')
+    parser.add_argument('--output', help='JSON file to write the full report to.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parseArgs(argv)
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+    widget, graph = createGraph(argparse.Namespace(fast_layout=False, compact_ports=False, wire_layer=False))
+    app.processEvents()
+
+    tracker = memory.MemoryTracker()
+    tracker.start()
+    runs = []
+    try:
+        for count in sorted(options.sizes):
+            sys.stderr.write('measuring %d nodes\n' % count)
+            runs.append(runSize(graph, tracker, count))
+        leaks = checkLeaks(graph)
+    finally:
+        tracker.stop()
+
+    costs = marginalCosts(runs)
+    print(formatReport(costs, leaks))
+
+    if options.output:
+        with open(options.output, 'w') as outFile:
+            json.dump({'runs': runs, 'marginal': costs, 'leaks': leaks}, outFile, indent=2, sort_keys=True)
+
+    return 1 if any(leaks.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,333 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+"""Performance regression check against a stored baseline.
+
+Builds a generated graph on the offscreen Qt platform and times the hot
+paths a number of times each: GraphView.connectPorts, Connection.paint,
+saveNodes and loadNodes, and a full scene paint. Each metric's mean and 95%
+confidence interval is compared with the baseline file. A metric regresses
+when its whole interval lies above the baseline mean plus the metric's
+tolerance, so a noisy run does not fail the check but a real slowdown does.
+
+Exits with 1 if any metric regressed or has no baseline, 0 otherwise. The
+committed baseline holds the tolerances only: record the reference numbers
+on the reference machine with --update-baseline before using the check as a
+gate. --allow-missing-baseline reports metrics without a baseline without
+failing, e.g. when a new metric is added.
+
+Usage:
+    python tests/perf_check.py --update-baseline
+    python tests/perf_check.py
+    python tests/perf_check.py --repeats 10 --allow-missing-baseline
+
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+# Add the pyflowgraph module to the current environment if it does not already exist
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")))
+
+from qtpy import QtGui, QtWidgets, QtCore
+import qtpy
+
+from pyflowgraph.connection import Connection
+
+from benchmark import quiet, createGraph, PAINT_SIZE
+from graph_generator import GraphGenerator
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'perf_baseline.json')
+
+DEFAULT_TOLERANCE = 0.1
+
+# Two sided 95% Student t values by degrees of freedom; 1.96 past the table.
+T_95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262,
+    10: 2.228, 12: 2.179, 15: 2.131, 20: 2.086, 25: 2.060, 30: 2.042,
+    }
+
+
+def tValue(degrees):
+    if degrees <= 0:
+        return float('inf')
+    if degrees > 30:
+        return 1.96
+    # Between table rows, the smaller row gives the wider, safer interval.
+    return T_95[max(d for d in T_95 if d <= degrees)]
+
+
+def summarize(samples):
+    """Gets the mean of the samples and the half width of its 95% confidence interval.
+
+    Returns:
+        dict: 'mean', 'stdev', 'halfWidth' and the sample count 'n'.
+
+    """
+
+    n = len(samples)
+    mean = sum(samples) / n
+    if n > 1:
+        stdev = math.sqrt(sum((s - mean) ** 2 for s in samples) / (n - 1))
+        halfWidth = tValue(n - 1) * stdev / math.sqrt(n)
+    else:
+        stdev = 0.0
+        halfWidth = float('inf')
+    return {'mean': mean, 'stdev': stdev, 'halfWidth': halfWidth, 'n': n}
+
+
+# =========
+# Workload
+# =========
+class Workload(object):
+    """The timed operations, each run on a graph built from the same generated description."""
+
+    def __init__(self, graph, nodes, seed, workDir):
+        self.graph = graph
+        self.description = GraphGenerator(seed=seed, nodes=nodes).generate()
+        self.fileName = os.path.join(workDir, 'perf%d_%d.json' % (nodes, seed))
+        self.description.save(self.fileName)
+
+    def __build(self, connect=True):
+        self.graph.reset()
+        QtWidgets.QApplication.processEvents()
+        if connect:
+            return self.description.build(self.graph)
+
+        # The nodes alone, for timing the wiring.
+        wires = self.description.wires
+        self.description.wires = []
+        try:
+            return self.description.build(self.graph)
+        finally:
+            self.description.wires = wires
+
+    def connectPorts(self):
+        created = self.__build(connect=False)
+        graph = self.graph
+        wires = [(created[src.node.name], src.name, created[dst.node.name], dst.name)
+                 for src, dst, kind in self.description.wires]
+
+        start = time.perf_counter()
+        for srcNode, srcName, dstNode, dstName in wires:
+            graph.connectPorts(srcNode, srcName, dstNode, dstName)
+        return time.perf_counter() - start
+
+    def paintConnections(self):
+        self.__build()
+        connections = [item for item in self.graph.scene().items() if isinstance(item, Connection)]
+        image = QtGui.QImage(PAINT_SIZE, QtGui.QImage.Format_ARGB32_Premultiplied)
+        option = QtWidgets.QStyleOptionGraphicsItem()
+
+        painter = QtGui.QPainter(image)
+        painter.setRenderHints(self.graph.renderHints())
+        start = time.perf_counter()
+        for connection in connections:
+            connection.paint(painter, option, None)
+        seconds = time.perf_counter() - start
+        painter.end()
+        return seconds
+
+    def paintScene(self):
+        self.__build()
+        scene = self.graph.scene()
+        image = QtGui.QImage(PAINT_SIZE, QtGui.QImage.Format_ARGB32_Premultiplied)
+        image.fill(0)
+
+        start = time.perf_counter()
+        painter = QtGui.QPainter(image)
+        painter.setRenderHints(self.graph.renderHints())
+        scene.render(painter, QtCore.QRectF(image.rect()), scene.itemsBoundingRect())
+        painter.end()
+        return time.perf_counter() - start
+
+    def saveNodes(self):
+        self.__build()
+        fileName = self.fileName + '.saved'
+        start = time.perf_counter()
+        self.graph.saveNodes(self.graph.getNodes(), fileName)
+        return time.perf_counter() - start
+
+    def loadNodes(self):
+        self.graph.reset()
+        QtWidgets.QApplication.processEvents()
+        start = time.perf_counter()
+        self.graph.loadNodes(self.fileName, QtCore.QPointF(0, 0))
+        return time.perf_counter() - start
+
+    def metrics(self):
+        return [
+            ('connectPorts', self.connectPorts),
+            ('paintConnections', self.paintConnections),
+            ('paintScene', self.paintScene),
+            ('saveNodes', self.saveNodes),
+            ('loadNodes', self.loadNodes),
+            ]
+
+
+def measure(workload, repeats, only=None):
+    """Runs each metric of the workload repeats times, after one warm up run.
+
+    Returns:
+        dict: Metric name to its summary, see summarize.
+
+    """
+
+    results = {}
+    for name, operation in workload.metrics():
+        if only and name not in only:
+            continue
+        sys.stderr.write('timing %s\n' % name)
+        with quiet():
+            operation()
+            samples = [operation() for i in range(repeats)]
+        results[name] = summarize(samples)
+        results[name]['samples'] = samples
+    workload.graph.reset()
+    return results
+
+
+# =========
+# Baseline
+# =========
+def loadBaseline(fileName):
+    if not os.path.exists(fileName):
+        return {'tolerances': {}, 'metrics': {}}
+    with open(fileName, 'r') as inFile:
+        baseline = json.load(inFile)
+    baseline.setdefault('tolerances', {})
+    baseline.setdefault('metrics', {})
+    return baseline
+
+
+def saveBaseline(fileName, baseline, results, options):
+    baseline['workload'] = {'nodes': options.nodes, 'seed': options.seed, 'repeats': options.repeats}
+    baseline['environment'] = {
+        'python': platform.python_version(),
+        'qtApi': qtpy.API_NAME,
+        'qtVersion': qtpy.QT_VERSION,
+        'platform': platform.platform(),
+        }
+    for name, summary in results.items():
+        baseline['metrics'][name] = {
+            'mean': summary['mean'],
+            'stdev': summary['stdev'],
+            'n': summary['n'],
+            }
+        baseline['tolerances'].setdefault(name, DEFAULT_TOLERANCE)
+    with open(fileName, 'w') as outFile:
+        json.dump(baseline, outFile, indent=2, sort_keys=True)
+        outFile.write('\n')
+
+
+def compare(baseline, results):
+    """Compares the measured metrics with the baseline.
+
+    Returns:
+        list: (name, status, mean, low, high, limit) per metric, status being
+            'ok', 'regressed', 'improved' or 'no baseline'.
+
+    """
+
+    rows = []
+    for name in sorted(results):
+        summary = results[name]
+        low = summary['mean'] - summary['halfWidth']
+        high = summary['mean'] + summary['halfWidth']
+        reference = baseline['metrics'].get(name)
+        if reference is None:
+            rows.append((name, 'no baseline', summary['mean'], low, high, None))
+            continue
+
+        tolerance = baseline['tolerances'].get(name, DEFAULT_TOLERANCE)
+        limit = reference['mean'] * (1.0 + tolerance)
+        if low > limit:
+            status = 'regressed'
+        elif high < reference['mean'] * (1.0 - tolerance):
+            status = 'improved'
+        else:
+            status = 'ok'
+        rows.append((name, status, summary['mean'], low, high, limit))
+    return rows
+
+
+def formatReport(rows):
+    lines = ['%-18s %-12s %10s %21s %10s' % ('metric', 'status', 'mean ms', '95% CI ms', 'limit ms')]
+    for name, status, mean, low, high, limit in rows:
+        limitText = '-' if limit is None else '%.2f' % (limit * 1000.0)
+        lines.append('%-18s %-12s %10.2f %10.2f..%-10.2f %10s' % (name, status, mean * 1000.0, low * 1000.0,
+                                                                 high * 1000.0, limitText))
+    return '\n'.join(lines)
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline file to compare with.')
+    parser.add_argument('--nodes', type=int, default=2000, help='Node count of the generated graph.')
+    parser.add_argument('--seed', type=int, default=1, help='Seed of the generated graph.')
+    parser.add_argument('--repeats', type=int, default=7, help='Timed runs per metric.')
+    parser.add_argument('--metrics', nargs='+', help='Only time these metrics.')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='Store the measured means as the new baseline instead of comparing.')
+    parser.add_argument('--allow-missing-baseline', action='store_true',
+                        help='Do not fail on metrics missing from the baseline.')
+    parser.add_argument('--output', help='JSON file to write the measurements and comparison to.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parseArgs(argv)
+    if options.repeats < 2:
+        sys.stderr.write('at least 2 repeats are needed for a confidence interval\n')
+        return 2
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+    widget, graph = createGraph(argparse.Namespace(fast_layout=False, compact_ports=False, wire_layer=False))
+    app.processEvents()
+
+    baseline = loadBaseline(options.baseline)
+    workload = baseline.get('workload')
+    if workload and not options.update_baseline:
+        if (workload.get('nodes'), workload.get('seed')) != (options.nodes, options.seed):
+            sys.stderr.write('warning: the baseline was measured on %s nodes with seed %s\n' %
+                             (workload.get('nodes'), workload.get('seed')))
+
+    workload = Workload(graph, options.nodes, options.seed, tempfile.mkdtemp(prefix='pyflowgraph-perf-'))
+    results = measure(workload, options.repeats, options.metrics)
+
+    if options.update_baseline:
+        saveBaseline(options.baseline, baseline, results, options)
+        sys.stderr.write('baseline written to %s\n' % options.baseline)
+        return 0
+
+    rows = compare(baseline, results)
+    print(formatReport(rows))
+
+    if options.output:
+        with open(options.output, 'w') as outFile:
+            json.dump({'results': results, 'comparison': rows}, outFile, indent=2, sort_keys=True)
+
+    result = 0
+    regressed = [row[0] for row in rows if row[1] == 'regressed']
+    if regressed:
+        sys.stderr.write('regressed: %s\n' % ', '.join(regressed))
+        result = 1
+    missing = [row[0] for row in rows if row[1] == 'no baseline']
+    if missing and not options.allow_missing_baseline:
+        sys.stderr.write('no baseline for: %s; record one with --update-baseline\n' % ', '.join(missing))
+        result = 1
+    return result
+
+
+if __name__ == '__main__':
+    sys.exit(main())
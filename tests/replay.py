@@ -0,0 +1,258 @@
+
+#
+# Copyright 2015-2017 Eric Thivierge
+#
+"""Records interactions with a graph and replays them to measure handler latency.
+
+'record' opens a graph file in a window and records the mouse, wheel and key
+events of the view until the window is closed. 'replay' loads the same graph
+on the offscreen platform, restores the recorded view, feeds the events back
+and reports p50/p95/p99 handler latency per gesture: node drags, rubber band
+selection, wire creation, panning and zooming.
+
+Presses, releases, double clicks and keys go through QTest. Moves and wheel
+events are sent as QMouseEvent and QWheelEvent, since QTest cannot move the
+mouse with buttons held on every Qt version nor send wheel events.
+
+Usage:
+    python tests/replay.py record graph.json session.json
+    python tests/replay.py replay graph.json session.json --output latency.json
+
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+# Add the pyflowgraph module to the current environment if it does not already exist
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")))
+
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sortedValues, p):
+    """Gets the nearest rank percentile of sorted values."""
+
+    rank = int(math.ceil(p / 100.0 * len(sortedValues)))
+    return sortedValues[max(rank, 1) - 1]
+
+
+def summarize(latencies):
+    """Gets the latency percentiles in milliseconds, per key of latencies.
+
+    Args:
+        latencies (dict): Key to a list of latencies in seconds.
+
+    Returns:
+        dict: Key to a dict with the event 'count', 'p50', 'p95', 'p99' and 'max'.
+
+    """
+
+    summary = {}
+    for key, values in latencies.items():
+        values = sorted(values)
+        stats = {'count': len(values), 'max': values[-1] * 1000.0}
+        for p in PERCENTILES:
+            stats['p%d' % p] = percentile(values, p) * 1000.0
+        summary[key] = stats
+    return summary
+
+
+def formatSummary(summary):
+    lines = ['%-24s %7s %9s %9s %9s %9s' % ('gesture', 'events', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms')]
+    for key in sorted(summary):
+        stats = summary[key]
+        lines.append('%-24s %7d %9.2f %9.2f %9.2f %9.2f' % (key, stats['count'], stats['p50'], stats['p95'],
+                                                          stats['p99'], stats['max']))
+    return '\n'.join(lines)
+
+
+def openGraph(fileName, size):
+    """Creates a widget and graph and loads a graph file into it."""
+
+    from qtpy import QtCore
+    from pyflowgraph.graph_view import GraphView
+    from pyflowgraph.graph_view_widget import GraphViewWidget
+
+    widget = GraphViewWidget()
+    graph = GraphView(parent=widget)
+    widget.setGraphView(graph)
+    widget.resize(size[0], size[1])
+    widget.show()
+    graph.loadNodes(fileName, QtCore.QPointF(0, 0))
+    return widget, graph
+
+
+# ======
+# Record
+# ======
+def record(options):
+    from qtpy import QtWidgets
+    from pyflowgraph.recorder import InteractionRecorder
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    widget, graph = openGraph(options.graph, (1280, 800))
+    graph.frameAllNodes()
+
+    recorder = InteractionRecorder(graph)
+    app.processEvents()
+    recorder.start()
+    result = app.exec_()
+    recorder.stop()
+
+    recorder.save(options.recording)
+    sys.stderr.write('%d events written to %s\n' % (len(recorder.getEvents()), options.recording))
+    return result
+
+
+# ======
+# Replay
+# ======
+class Replayer(object):
+    """Sends recorded events to a GraphView and times each handler."""
+
+    def __init__(self, graph, recording):
+        from qtpy import QtCore
+
+        self.graph = graph
+        self.recording = recording
+        self.latencies = {}
+
+        center = recording['center']
+        graph.resetTransform()
+        graph.scale(recording['scale'], recording['scale'])
+        graph.panTo(QtCore.QPointF(center[0], center[1]))
+
+    def run(self, realtime=False):
+        from qtpy import QtWidgets
+
+        start = time.perf_counter()
+        for event in self.recording['events']:
+            if realtime:
+                while time.perf_counter() - start < event['t']:
+                    QtWidgets.QApplication.processEvents()
+            else:
+                QtWidgets.QApplication.processEvents()
+
+            seconds = self.send(event)
+            key = event['gesture'] + '/' + event['type']
+            self.latencies.setdefault(key, []).append(seconds)
+            self.latencies.setdefault(event['gesture'], []).append(seconds)
+        QtWidgets.QApplication.processEvents()
+
+    def send(self, event):
+        from qtpy import QtGui, QtCore
+        from qtpy.QtTest import QTest
+
+        graph = self.graph
+        viewport = graph.viewport()
+        eventType = event['type']
+        modifiers = QtCore.Qt.KeyboardModifiers(event['modifiers'])
+
+        if eventType in ('keyPress', 'keyRelease'):
+            key = QtCore.Qt.Key(event['key'])
+            start = time.perf_counter()
+            if eventType == 'keyPress':
+                QTest.keyPress(graph, key, modifiers)
+            else:
+                QTest.keyRelease(graph, key, modifiers)
+            return time.perf_counter() - start
+
+        pos = QtCore.QPoint(event['x'], event['y'])
+        buttons = QtCore.Qt.MouseButtons(event['buttons'])
+
+        if eventType == 'wheel':
+            qevent = QtGui.QWheelEvent(QtCore.QPointF(pos), QtCore.QPointF(viewport.mapToGlobal(pos)),
+                                       QtCore.QPoint(), QtCore.QPoint(0, event['delta']), buttons, modifiers,
+                                       QtCore.Qt.NoScrollPhase, False)
+            start = time.perf_counter()
+            QtCore.QCoreApplication.sendEvent(viewport, qevent)
+            return time.perf_counter() - start
+
+        button = QtCore.Qt.MouseButton(event['button'])
+        if eventType == 'move':
+            qevent = QtGui.QMouseEvent(QtCore.QEvent.MouseMove, QtCore.QPointF(pos),
+                                       QtCore.QPointF(viewport.mapToGlobal(pos)), QtCore.Qt.NoButton, buttons,
+                                       modifiers)
+            start = time.perf_counter()
+            QtCore.QCoreApplication.sendEvent(viewport, qevent)
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        if eventType == 'press':
+            QTest.mousePress(viewport, button, modifiers, pos)
+        elif eventType == 'release':
+            QTest.mouseRelease(viewport, button, modifiers, pos)
+        elif eventType == 'doubleClick':
+            QTest.mouseDClick(viewport, button, modifiers, pos)
+        return time.perf_counter() - start
+
+
+def replay(options):
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    from qtpy import QtWidgets
+    from pyflowgraph.recorder import InteractionRecorder
+
+    recording = InteractionRecorder.load(options.recording)
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    widget, graph = openGraph(options.graph, (1280, 800))
+    # Size the widget so the viewport matches the recorded one.
+    viewport = graph.viewport()
+    size = recording['viewportSize']
+    widget.resize(widget.width() + size[0] - viewport.width(), widget.height() + size[1] - viewport.height())
+    widget.activateWindow()
+    app.processEvents()
+
+    if options.signals:
+        graph.setSignalProfilingEnabled(True)
+
+    replayer = Replayer(graph, recording)
+    replayer.run(realtime=options.realtime)
+
+    summary = summarize(replayer.latencies)
+    print(formatSummary(summary))
+    if options.signals:
+        print('')
+        print(graph.getSignalProfiler().summary())
+    if options.output:
+        with open(options.output, 'w') as outFile:
+            json.dump({'graph': options.graph, 'recording': options.recording, 'latency': summary}, outFile,
+                      indent=2, sort_keys=True)
+    return 0
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    recordParser = commands.add_parser('record', help='Record interactions with a graph file.')
+    recordParser.add_argument('graph', help='Graph file, as written by saveNodes.')
+    recordParser.add_argument('recording', help='File to write the recorded events to.')
+
+    replayParser = commands.add_parser('replay', help='Replay recorded interactions offscreen.')
+    replayParser.add_argument('graph', help='Graph file the interactions were recorded on.')
+    replayParser.add_argument('recording', help='Recorded events.')
+    replayParser.add_argument('--realtime', action='store_true',
+                              help='Keep the recorded timing between events, letting timers run.')
+    replayParser.add_argument('--signals', action='store_true',
+                              help="Also profile the graph's signal emissions and print them.")
+    replayParser.add_argument('--output', help='JSON file to write the latency percentiles to.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parseArgs(argv)
+    if options.command == 'record':
+        return record(options)
+    return replay(options)
+
+
+if __name__ == '__main__':
+    sys.exit(main())